@@ -0,0 +1,55 @@
+"""Add indexes for hot repository queries
+
+Revision ID: 2f6d8e0b5a37
+Revises: 7e0c4b9d2a18
+Create Date: 2026-10-17 13:15:27.640951
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6d8e0b5a37'
+down_revision: Union[str, Sequence[str], None] = '7e0c4b9d2a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в большие таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        # Очередь видео: выдача по порядку и аренда конкретным администратором
+        op.create_index('ix_videos_created_at', 'videos', ['created_at'], postgresql_concurrently=True)
+        op.create_index('ix_videos_claimed_by_created_at', 'videos', ['claimed_by', 'created_at'], postgresql_concurrently=True)
+        # FK без индекса превращает каскадное удаление пользователя в полный скан
+        op.create_index('ix_videos_user_id', 'videos', ['user_id'], postgresql_concurrently=True)
+
+        op.create_index('ix_video_history_user_id_status', 'video_history', ['user_id', 'status'], postgresql_concurrently=True)
+        op.create_index('ix_video_history_admin_tg_id', 'video_history', ['admin_tg_id'], postgresql_concurrently=True)
+
+        # Самая старая ожидающая выплата и счетчик ожидающих — по частичному индексу
+        op.create_index(
+            'ix_payouts_pending_created_at', 'payouts', ['created_at'],
+            postgresql_where=sa.text("status = 'PENDING'"), postgresql_concurrently=True,
+        )
+        op.create_index('ix_payouts_user_id_status', 'payouts', ['user_id', 'status'], postgresql_concurrently=True)
+
+        # Поиск по username без учета регистра
+        op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username)')], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_username_lower', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_payouts_user_id_status', table_name='payouts', postgresql_concurrently=True)
+        op.drop_index('ix_payouts_pending_created_at', table_name='payouts', postgresql_concurrently=True)
+        op.drop_index('ix_video_history_admin_tg_id', table_name='video_history', postgresql_concurrently=True)
+        op.drop_index('ix_video_history_user_id_status', table_name='video_history', postgresql_concurrently=True)
+        op.drop_index('ix_videos_user_id', table_name='videos', postgresql_concurrently=True)
+        op.drop_index('ix_videos_claimed_by_created_at', table_name='videos', postgresql_concurrently=True)
+        op.drop_index('ix_videos_created_at', table_name='videos', postgresql_concurrently=True)
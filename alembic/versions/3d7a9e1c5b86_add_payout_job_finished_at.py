@@ -0,0 +1,28 @@
+"""Add finished_at to payout_jobs
+
+Revision ID: 3d7a9e1c5b86
+Revises: f19b6d2e8c40
+Create Date: 2026-10-17 18:12:40.581934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a9e1c5b86'
+down_revision: Union[str, Sequence[str], None] = 'f19b6d2e8c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payout_jobs', sa.Column('finished_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('payout_jobs', 'finished_at')
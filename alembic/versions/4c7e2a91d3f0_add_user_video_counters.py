@@ -0,0 +1,48 @@
+"""Add denormalized video counters to User
+
+Revision ID: 4c7e2a91d3f0
+Revises: 1b2878fcf04f
+Create Date: 2026-10-17 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c7e2a91d3f0'
+down_revision: Union[str, Sequence[str], None] = '1b2878fcf04f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('videos_on_review', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('videos_accepted', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('videos_rejected', sa.Integer(), server_default='0', nullable=False))
+
+    # Заполняем счетчики по уже накопленным данным
+    op.execute(
+        """
+        UPDATE users SET
+            videos_on_review = (SELECT count(*) FROM videos WHERE videos.user_id = users.id),
+            videos_accepted = (
+                SELECT count(*) FROM video_history
+                WHERE video_history.user_id = users.id AND video_history.status = 'ACCEPTED'
+            ),
+            videos_rejected = (
+                SELECT count(*) FROM video_history
+                WHERE video_history.user_id = users.id AND video_history.status = 'REJECTED'
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'videos_rejected')
+    op.drop_column('users', 'videos_accepted')
+    op.drop_column('users', 'videos_on_review')
@@ -0,0 +1,47 @@
+"""Add payout_jobs queue table
+
+Revision ID: 5a9d27c8e143
+Revises: b4e19a7c3d65
+Create Date: 2026-10-17 15:21:40.917352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9d27c8e143'
+down_revision: Union[str, Sequence[str], None] = 'b4e19a7c3d65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('payout_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payout_id', sa.Integer(), nullable=False),
+    sa.Column('admin_tg_id', sa.BigInteger(), nullable=False),
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='payout_job_status_enum'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['payout_id'], ['payouts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('payout_id')
+    )
+    op.create_index('ix_payout_jobs_status_run_after', 'payout_jobs', ['status', 'run_after'], unique=False)
+    op.create_index('ix_payout_jobs_chat_id_message_id', 'payout_jobs', ['chat_id', 'message_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payout_jobs_chat_id_message_id', table_name='payout_jobs')
+    op.drop_index('ix_payout_jobs_status_run_after', table_name='payout_jobs')
+    op.drop_table('payout_jobs')
+    sa.Enum(name='payout_job_status_enum').drop(op.get_bind(), checkfirst=True)
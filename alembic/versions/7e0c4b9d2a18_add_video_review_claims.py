@@ -0,0 +1,30 @@
+"""Add review claim columns to videos
+
+Revision ID: 7e0c4b9d2a18
+Revises: d5b83f1a6c02
+Create Date: 2026-10-17 12:30:52.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e0c4b9d2a18'
+down_revision: Union[str, Sequence[str], None] = 'd5b83f1a6c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('videos', sa.Column('claimed_by', sa.BigInteger(), nullable=True))
+    op.add_column('videos', sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('videos', 'claim_expires_at')
+    op.drop_column('videos', 'claimed_by')
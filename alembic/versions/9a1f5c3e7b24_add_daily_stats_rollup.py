@@ -0,0 +1,63 @@
+"""Add daily_stats rollup table
+
+Revision ID: 9a1f5c3e7b24
+Revises: 4c7e2a91d3f0
+Create Date: 2026-10-17 11:03:18.771092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1f5c3e7b24'
+down_revision: Union[str, Sequence[str], None] = '4c7e2a91d3f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('admin_tg_id', sa.BigInteger(), nullable=False),
+        sa.Column('new_users', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('videos_accepted', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('videos_rejected', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('payouts_confirmed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('paid_amount', sa.Float(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('day', 'admin_tg_id'),
+    )
+
+    # Переносим накопленную историю в дневные агрегаты.
+    # У записей video_history processed_at не заполняется, поэтому берем created_at.
+    op.execute(
+        """
+        INSERT INTO daily_stats (day, admin_tg_id, new_users, videos_accepted, videos_rejected, payouts_confirmed, paid_amount)
+        SELECT day, admin_tg_id, sum(new_users), sum(videos_accepted), sum(videos_rejected), sum(payouts_confirmed), sum(paid_amount)
+        FROM (
+            SELECT CAST(registered_at AS DATE) AS day, 0 AS admin_tg_id, 1 AS new_users,
+                   0 AS videos_accepted, 0 AS videos_rejected, 0 AS payouts_confirmed, 0.0 AS paid_amount
+            FROM users
+            UNION ALL
+            SELECT CAST(COALESCE(processed_at, created_at) AS DATE), admin_tg_id, 0,
+                   CASE WHEN status = 'ACCEPTED' THEN 1 ELSE 0 END,
+                   CASE WHEN status = 'REJECTED' THEN 1 ELSE 0 END,
+                   0, 0.0
+            FROM video_history
+            UNION ALL
+            SELECT CAST(COALESCE(processed_at, created_at) AS DATE), COALESCE(admin_tg_id, 0), 0, 0, 0, 1, amount
+            FROM payouts
+            WHERE status = 'PAID'
+        ) AS events
+        GROUP BY day, admin_tg_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_stats')
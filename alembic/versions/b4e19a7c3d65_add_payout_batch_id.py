@@ -0,0 +1,30 @@
+"""Add batch_id to payouts
+
+Revision ID: b4e19a7c3d65
+Revises: 2f6d8e0b5a37
+Create Date: 2026-10-17 14:05:11.402816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e19a7c3d65'
+down_revision: Union[str, Sequence[str], None] = '2f6d8e0b5a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payouts', sa.Column('batch_id', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_payouts_batch_id'), 'payouts', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payouts_batch_id'), table_name='payouts')
+    op.drop_column('payouts', 'batch_id')
@@ -0,0 +1,38 @@
+"""Add on-chain confirmation columns to payouts
+
+Revision ID: c81f3e6a2d94
+Revises: 5a9d27c8e143
+Create Date: 2026-10-17 16:48:03.275519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f3e6a2d94'
+down_revision: Union[str, Sequence[str], None] = '5a9d27c8e143'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payouts', sa.Column('sent_at', sa.DateTime(), nullable=True))
+    op.add_column('payouts', sa.Column('confirmed_at', sa.DateTime(), nullable=True))
+    op.add_column('payouts', sa.Column('tx_missing', sa.Boolean(), server_default='false', nullable=False))
+    # Старые выплаты хранят заглушку "success" вместо хэша и TxTracker'ом не отслеживаются (sent_at = NULL)
+    op.create_index(
+        'ix_payouts_unconfirmed_sent_at', 'payouts', ['sent_at'],
+        postgresql_where=sa.text("status = 'PAID' AND tx_hash IS NULL AND NOT tx_missing AND sent_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payouts_unconfirmed_sent_at', table_name='payouts')
+    op.drop_column('payouts', 'tx_missing')
+    op.drop_column('payouts', 'confirmed_at')
+    op.drop_column('payouts', 'sent_at')
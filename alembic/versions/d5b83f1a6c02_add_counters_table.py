@@ -0,0 +1,35 @@
+"""Add counters table for admin panel
+
+Revision ID: d5b83f1a6c02
+Revises: 9a1f5c3e7b24
+Create Date: 2026-10-17 11:48:05.310264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b83f1a6c02'
+down_revision: Union[str, Sequence[str], None] = '9a1f5c3e7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'counters',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('value', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.execute("INSERT INTO counters (name, value) SELECT 'video_queue', count(*) FROM videos")
+    op.execute("INSERT INTO counters (name, value) SELECT 'pending_payouts', count(*) FROM payouts WHERE status = 'PENDING'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('counters')
@@ -0,0 +1,28 @@
+"""Add is_blocked to users
+
+Revision ID: e37a0c5f9b12
+Revises: c81f3e6a2d94
+Create Date: 2026-10-17 18:02:36.580143
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e37a0c5f9b12'
+down_revision: Union[str, Sequence[str], None] = 'c81f3e6a2d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('is_blocked', sa.Boolean(), server_default='false', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'is_blocked')
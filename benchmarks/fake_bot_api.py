@@ -0,0 +1,157 @@
+# benchmarks/fake_bot_api.py
+
+"""
+Фейковый Bot API для нагрузочного теста: принимает запросы бота, записывает их
+и отвечает правдоподобными объектами. Умеет отвечать 429 — случайно с заданной
+вероятностью и при превышении глобального лимита запросов в секунду,
+как настоящий Telegram.
+
+Бот направляется сюда через TELEGRAM_API_URL=http://127.0.0.1:<port>.
+"""
+
+import asyncio
+import collections
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from aiohttp import web
+
+# Методы, которые никогда не ограничиваются: их вызывают при запуске и остановке
+UNLIMITED_METHODS = {"getme", "setwebhook", "deletewebhook"}
+
+
+@dataclass
+class Call:
+    method: str
+    params: dict[str, Any]
+    chat_id: int | None
+    at: float = field(default_factory=time.monotonic)
+    message_id: int | None = None
+
+    def mentions(self, marker: str) -> bool:
+        """Есть ли marker в тексте или клавиатуре вызова."""
+        return marker in self.params.get("text", "") or marker in self.params.get("reply_markup", "")
+
+
+class FakeBotApi:
+    def __init__(self, error_rate: float = 0.0, rate_limit: float | None = None, latency: float = 0.0, seed: int = 1):
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.latency = latency
+
+        self.counters = collections.Counter()
+        self._rng = random.Random(seed)
+        self._message_id = 1000
+        self._calls: dict[int, list[Call]] = collections.defaultdict(list)
+        self._conditions: dict[int, asyncio.Condition] = collections.defaultdict(asyncio.Condition)
+        self._window_started = time.monotonic()
+        self._window_calls = 0
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str, port: int) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def calls(self, chat_id: int) -> list[Call]:
+        return self._calls[chat_id]
+
+    async def wait_for(self, chat_id: int, since: int, predicate: Callable[[Call], bool], timeout: float) -> tuple[Call, int]:
+        """Ждет вызова в чат chat_id, начиная с индекса since. Возвращает вызов и индекс следующего."""
+        condition = self._conditions[chat_id]
+        calls = self._calls[chat_id]
+        async with condition:
+            deadline = time.monotonic() + timeout
+            while True:
+                for index in range(since, len(calls)):
+                    if predicate(calls[index]):
+                        return calls[index], index + 1
+                since = len(calls)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(condition.wait(), timeout=remaining)
+
+    def _throttled(self, method: str) -> bool:
+        if method in UNLIMITED_METHODS:
+            return False
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return True
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        if now - self._window_started >= 1:
+            self._window_started, self._window_calls = now, 0
+        self._window_calls += 1
+        return self._window_calls > self.rate_limit
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        self.counters[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self._throttled(method):
+            self.counters["429"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+
+        chat_id = self._chat_of(params)
+        result = self._result(method, params, chat_id)
+        if chat_id is not None:
+            call = Call(method=method, params=params, chat_id=chat_id)
+            if isinstance(result, dict):
+                call.message_id = result.get("message_id")
+            condition = self._conditions[chat_id]
+            async with condition:
+                self._calls[chat_id].append(call)
+                condition.notify_all()
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def _chat_of(params: dict[str, Any]) -> int | None:
+        if "chat_id" in params:
+            try:
+                return int(params["chat_id"])
+            except ValueError:
+                return None
+        # id ответа на callback нагрузочный тест строит как "<chat_id>:<n>"
+        if "callback_query_id" in params:
+            return int(params["callback_query_id"].split(":")[0])
+        return None
+
+    def _result(self, method: str, params: dict[str, Any], chat_id: int | None) -> Any:
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method == "getchatmember":
+            return {"status": "member", "user": {"id": int(params["user_id"]), "is_bot": False, "first_name": "User"}}
+        if method in ("sendmessage", "editmessagetext", "editmessagereplymarkup"):
+            message_id = self._next_id() if method == "sendmessage" else int(params.get("message_id", 0))
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        if method == "sendmediagroup":
+            return [
+                {"message_id": self._next_id(), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+                for _ in json.loads(params.get("media", "[]"))
+            ]
+        return True
+
+    def _next_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
@@ -0,0 +1,145 @@
+# benchmarks/seed.py
+
+"""
+Наполнение пустой базы синтетическими данными для бенчмарков.
+
+Все генерируется на стороне базы (generate_series в PostgreSQL, рекурсивный
+CTE в SQLite), поэтому даже десятки миллионов строк вставляются без передачи
+данных по сети.
+"""
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.db.models import Base
+
+# Идентификаторы администраторов, от имени которых «обрабатывалась» история
+ADMIN_IDS = [100, 101, 102, 103, 104]
+TG_ID_OFFSET = 1_000_000_000
+
+POSTGRES_SEED_SQL = [
+    """
+    INSERT INTO users (tg_id, username, wallet, balance, subscribed, registered_at, is_banned,
+                       videos_on_review, videos_accepted, videos_rejected)
+    SELECT :tg_offset + g, 'user' || g, 'UQwallet' || g, (g % 100)::float, true,
+           now() - (g % 365) * interval '1 day', g % 1000 = 0, 0, 0, 0
+    FROM generate_series(1, :users) AS g
+    """,
+    """
+    INSERT INTO videos (user_id, link, created_at)
+    SELECT 1 + (g % :users), 'https://example.com/v/' || g, now() - g * interval '1 second'
+    FROM generate_series(1, :videos) AS g
+    """,
+    """
+    INSERT INTO video_history (user_id, link, status, admin_tg_id, created_at)
+    SELECT 1 + (g % :users), 'https://example.com/h/' || g,
+           (CASE WHEN g % 5 = 0 THEN 'REJECTED' ELSE 'ACCEPTED' END)::video_status_enum,
+           100 + g % 5, now() - (g % 365) * interval '1 day'
+    FROM generate_series(1, :history) AS g
+    """,
+    """
+    INSERT INTO payouts (user_id, amount, wallet, status, admin_tg_id, created_at)
+    SELECT 1 + (g % :users), 5.0, 'UQwallet' || g,
+           (CASE WHEN g % 50 = 0 THEN 'PENDING' WHEN g % 7 = 0 THEN 'CANCELLED' ELSE 'PAID' END)::payout_status_enum,
+           100 + g % 5, now() - (g % 365) * interval '1 day'
+    FROM generate_series(1, :payouts) AS g
+    """,
+    """
+    INSERT INTO daily_stats (day, admin_tg_id, new_users, videos_accepted, videos_rejected, payouts_confirmed, paid_amount)
+    SELECT current_date - d, a, 10, 100, 20, 5, 25.0
+    FROM generate_series(0, 364) AS d, unnest(ARRAY[0, 100, 101, 102, 103, 104]) AS a
+    """,
+    """
+    INSERT INTO counters (name, value)
+    SELECT 'video_queue', count(*) FROM videos
+    UNION ALL
+    SELECT 'pending_payouts', count(*) FROM payouts WHERE status = 'PENDING'
+    """,
+]
+
+
+# Те же данные для SQLite: enum хранятся именами, даты считаются функциями SQLite
+SQLITE_SEED_SQL = [
+    """
+    INSERT INTO users (tg_id, username, wallet, balance, subscribed, registered_at, is_banned,
+                       videos_on_review, videos_accepted, videos_rejected)
+    WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :users)
+    SELECT :tg_offset + x, 'user' || x, 'UQwallet' || x, (x % 100) * 1.0, 1,
+           datetime('now', '-' || (x % 365) || ' days'), x % 1000 = 0, 0, 0, 0
+    FROM g
+    """,
+    """
+    INSERT INTO videos (user_id, link, created_at)
+    WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :videos)
+    SELECT 1 + (x % :users), 'https://example.com/v/' || x, datetime('now', '-' || x || ' seconds')
+    FROM g
+    """,
+    """
+    INSERT INTO video_history (user_id, link, status, admin_tg_id, created_at)
+    WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :history)
+    SELECT 1 + (x % :users), 'https://example.com/h/' || x,
+           CASE WHEN x % 5 = 0 THEN 'REJECTED' ELSE 'ACCEPTED' END,
+           100 + x % 5, datetime('now', '-' || (x % 365) || ' days')
+    FROM g
+    """,
+    """
+    INSERT INTO payouts (user_id, amount, wallet, status, admin_tg_id, created_at)
+    WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < :payouts)
+    SELECT 1 + (x % :users), 5.0, 'UQwallet' || x,
+           CASE WHEN x % 50 = 0 THEN 'PENDING' WHEN x % 7 = 0 THEN 'CANCELLED' ELSE 'PAID' END,
+           100 + x % 5, datetime('now', '-' || (x % 365) || ' days')
+    FROM g
+    """,
+    """
+    INSERT INTO daily_stats (day, admin_tg_id, new_users, videos_accepted, videos_rejected, payouts_confirmed, paid_amount)
+    WITH RECURSIVE d(x) AS (SELECT 0 UNION ALL SELECT x + 1 FROM d WHERE x < 364),
+         a(id) AS (VALUES (0), (100), (101), (102), (103), (104))
+    SELECT date('now', '-' || x || ' days'), id, 10, 100, 20, 5, 25.0
+    FROM d, a
+    """,
+    """
+    INSERT INTO counters (name, value)
+    SELECT 'video_queue', count(*) FROM videos
+    UNION ALL
+    SELECT 'pending_payouts', count(*) FROM payouts WHERE status = 'PENDING'
+    """,
+]
+
+
+async def reset_schema(engine: AsyncEngine) -> None:
+    """Пересоздает все таблицы. Только для отдельной бенчмарк-базы!"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_postgres(engine: AsyncEngine, users: int, videos: int, history: int, payouts: int) -> None:
+    params = {"tg_offset": TG_ID_OFFSET, "users": users, "videos": videos, "history": history, "payouts": payouts}
+    async with engine.begin() as conn:
+        for statement in POSTGRES_SEED_SQL:
+            await conn.execute(text(statement), params)
+    logging.info(f"Seeded: {params}")
+
+    # Свежая статистика и visibility map, иначе планировщик не доверяет индексам
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+
+
+async def seed_sqlite(engine: AsyncEngine, users: int, videos: int, history: int, payouts: int) -> None:
+    params = {"tg_offset": TG_ID_OFFSET, "users": users, "videos": videos, "history": history, "payouts": payouts}
+    async with engine.begin() as conn:
+        for statement in SQLITE_SEED_SQL:
+            await conn.execute(text(statement), params)
+        await conn.execute(text("ANALYZE"))
+    logging.info(f"Seeded: {params}")
+
+
+async def seed(engine: AsyncEngine, users: int, videos: int, history: int, payouts: int) -> None:
+    """Наполняет базу тем способом, который поддерживает ее диалект."""
+    if engine.dialect.name == "sqlite":
+        await seed_sqlite(engine, users=users, videos=videos, history=history, payouts=payouts)
+    else:
+        await seed_postgres(engine, users=users, videos=videos, history=history, payouts=payouts)
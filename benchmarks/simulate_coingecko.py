@@ -0,0 +1,64 @@
+# benchmarks/simulate_coingecko.py
+
+"""
+Прогон CoinGeckoService против локального stub-сервера CoinGecko.
+
+StubCoinGecko поднимает /simple/price на aiohttp.test_utils.TestServer и считает
+запросы; цену, задержку ответа и отказ (HTTP 500) можно менять на лету.
+Сценарии — в tests/test_coingecko_service.py: TTL-кэш, схлопывание конкурентных
+запросов (single-flight), отдача устаревшего курса с обновлением в фоне
+(stale-while-revalidate) и 0.0, когда курса нет совсем. Этот скрипт запускает их.
+
+Запуск (из корня проекта):
+
+    python -m benchmarks.simulate_coingecko
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+TESTS = Path(__file__).resolve().parent.parent / "tests" / "test_coingecko_service.py"
+
+
+class StubCoinGecko:
+    def __init__(self, price: float = 2.5):
+        self.price = price
+        self.delay = 0.0
+        self.failing = False
+        self.requests = 0
+        app = web.Application()
+        app.router.add_get("/simple/price", self._price)
+        self.server = TestServer(app)
+
+    @property
+    def base_url(self) -> str:
+        return str(self.server.make_url("/"))
+
+    async def _price(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failing:
+            return web.json_response({"error": "stub failure"}, status=500)
+        return web.json_response({"the-open-network": {"usd": self.price}})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CoinGeckoService против локального stub-сервера")
+    parser.add_argument("--only", nargs="*", help="запустить только эти сценарии (имена тестов без test_)")
+    args = parser.parse_args()
+
+    pytest_args = ["-q", str(TESTS)]
+    if args.only:
+        pytest_args += ["-k", " or ".join(args.only)]
+    sys.exit(pytest.main(pytest_args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/simulate_ton_service.py
+
+"""
+Прогон TonService против фейкового провайдера TON.
+
+FakeChain заменяет LiteClient и кошелек: держит баланс и seqno, записывает принятые
+внешние сообщения и умеет ломаться так, как ломается настоящая сеть — обрыв до
+отправки, ошибка после того, как сеть уже приняла сообщение, недоступное
+состояние кошелька, сообщение, которое так и не принято, отказ соединения.
+Сценарии — в tests/test_ton_service.py: как send_batch разложил выплаты по
+sent/failed/unknown и что _wait_for_seqno и _landed_after_failure отвечают
+правильно. Этот скрипт запускает их.
+
+Запуск (из корня проекта):
+
+    python -m benchmarks.simulate_ton_service
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from bot.services.ton_service import MAX_MESSAGES_PER_TRANSFER, PayoutTransfer, TonService
+
+ADDRESS = "0:" + "11" * 32
+NANOTONS = 10 ** 9
+
+TESTS = Path(__file__).resolve().parent.parent / "tests" / "test_ton_service.py"
+
+# Что происходит с очередным внешним сообщением
+ACCEPT = "accept"  # сеть приняла, seqno вырос
+FAIL_BEFORE = "fail_before"  # ошибка до отправки, сеть сообщения не видела
+FAIL_AFTER = "fail_after"  # сеть приняла, но ответ потерялся
+DROP = "drop"  # отправка "успешна", но сообщение так и не принято
+
+
+@dataclass
+class AccountState:
+    balance: int
+
+
+@dataclass
+class FakeChain:
+    balance: int = 100 * NANOTONS
+    seqno: int = 0
+    # Поведение для следующих внешних сообщений; когда список пуст — ACCEPT
+    outcomes: list[str] = field(default_factory=list)
+    # Сколько следующих подключений завершится ошибкой
+    failing_connects: int = 0
+    # get_seqno падает (состояние кошелька прочитать нельзя)
+    seqno_unreadable: bool = False
+    accepted: list[list[tuple[str, int, str]]] = field(default_factory=list)
+    # valid_until каждого отправленного внешнего сообщения
+    valid_until: list[int | None] = field(default_factory=list)
+    connects: int = 0
+
+
+@dataclass
+class TransferMessage:
+    seqno: int
+    messages: list[tuple[str, int, str]]
+    valid_until: int | None
+
+
+class FakeLiteClient:
+    def __init__(self, chain: FakeChain):
+        self.chain = chain
+        self.closed = False
+
+    async def connect(self) -> None:
+        self.chain.connects += 1
+        if self.chain.failing_connects:
+            self.chain.failing_connects -= 1
+            raise ConnectionError("liteserver unavailable")
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def get_masterchain_info(self) -> dict[str, Any]:
+        return {"last": self.chain.seqno}
+
+    async def get_account_state(self, address: Any) -> AccountState:
+        return AccountState(balance=self.chain.balance)
+
+
+class FakeWallet:
+    def __init__(self, chain: FakeChain, provider: FakeLiteClient):
+        self.chain = chain
+        self.provider = provider
+        self.address = ADDRESS
+        self.private_key = b"fake-key"
+        self.wallet_id = 0
+
+    async def get_seqno(self) -> int:
+        if self.chain.seqno_unreadable:
+            raise ConnectionError("account state unavailable")
+        return self.chain.seqno
+
+    def create_wallet_internal_message(self, destination: Any, value: int, body: str) -> tuple[str, int, str]:
+        return str(destination), value, body
+
+    def raw_create_transfer_msg(
+        self,
+        private_key: bytes,
+        seqno: int,
+        wallet_id: int,
+        messages: list[tuple[str, int, str]],
+        valid_until: int | None = None,
+    ) -> TransferMessage:
+        return TransferMessage(seqno=seqno, messages=messages, valid_until=valid_until)
+
+    async def send_external(self, body: TransferMessage) -> None:
+        self.chain.valid_until.append(body.valid_until)
+        msgs = body.messages
+        outcome = self.chain.outcomes.pop(0) if self.chain.outcomes else ACCEPT
+        if outcome == FAIL_BEFORE:
+            raise ConnectionError("connection lost before send")
+        if outcome == DROP:
+            return
+        self.chain.seqno += 1
+        self.chain.balance -= sum(value for _, value, _ in msgs)
+        self.chain.accepted.append(msgs)
+        if outcome == FAIL_AFTER:
+            raise ConnectionError("connection lost after send")
+
+
+# Как у V4R2: по четыре перевода во внешнем сообщении
+MAX_MESSAGES_PER_TRANSFER[FakeWallet] = 4
+
+
+def make_service(chain: FakeChain) -> TonService:
+    async def wallet_factory(client: FakeLiteClient, mnemonics: list[str]) -> FakeWallet:
+        return FakeWallet(chain, client)
+
+    return TonService(
+        mnemonics=[],
+        client_factory=lambda: FakeLiteClient(chain),
+        wallet_factory=wallet_factory,
+        max_backoff=0.01,
+        seqno_poll_interval=0.01,
+        message_ttl=0.2,
+    )
+
+
+def transfers(count: int, amount_ton: float = 1.0, first_id: int = 1) -> list[PayoutTransfer]:
+    return [
+        PayoutTransfer(payout_id=payout_id, address=ADDRESS, amount_ton=amount_ton, comment=f"#{payout_id}")
+        for payout_id in range(first_id, first_id + count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TonService против фейкового провайдера")
+    parser.add_argument("--only", nargs="*", help="запустить только эти сценарии (имена тестов без test_)")
+    args = parser.parse_args()
+
+    pytest_args = ["-q", str(TESTS)]
+    if args.only:
+        pytest_args += ["-k", " or ".join(args.only)]
+    sys.exit(pytest.main(pytest_args))
+
+
+if __name__ == "__main__":
+    main()
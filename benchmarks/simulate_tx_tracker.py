@@ -0,0 +1,156 @@
+# benchmarks/simulate_tx_tracker.py
+
+"""
+Прогон TxTracker против симулированной цепочки на SQLite в памяти.
+
+Симуляция создает отправленные выплаты, «проводит» часть из них в цепочке
+(в том числе вперемешку с чужими переводами и на нескольких страницах истории)
+и проверяет, что трекер записал настоящие хэши, а непроведенные старые выплаты
+пометил tx_missing — но не в проходе, оборванном max_pages. Отдельные случаи
+(короткая страница, зациклившаяся история) — в tests/test_tx_tracker.py.
+
+Запуск (из корня проекта):
+
+    python -m benchmarks.simulate_tx_tracker --payouts 500 --lost 7
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import logging
+import random
+import sys
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.db.models import Base, OutboxMessage, Payout, PayoutStatus, User
+from bot.db.repository import utc_now
+from bot.services.ton_service import WalletTransaction, payout_comment
+from bot.services.tx_tracker import TxTracker
+
+
+def epoch(dt: datetime.datetime) -> int:
+    """utime транзакции для наивного UTC-времени из БД."""
+    return int(dt.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+class SimulatedChain:
+    """История горячего кошелька: список транзакций от новых к старым с постраничной выдачей."""
+
+    def __init__(self):
+        self.transactions: list[WalletTransaction] = []
+        self.calls = 0
+        self._lt = 1000
+
+    def land(self, comments: list[str], utime: int) -> WalletTransaction:
+        self._lt += 1
+        previous = self.transactions[0] if self.transactions else None
+        tx = WalletTransaction(
+            lt=self._lt,
+            hash=hashlib.sha256(str(self._lt).encode()).hexdigest(),
+            utime=utime,
+            comments=comments,
+            prev_lt=previous.lt if previous else 0,
+            prev_hash=bytes.fromhex(previous.hash) if previous else b"",
+        )
+        self.transactions.insert(0, tx)
+        return tx
+
+    def relink(self) -> None:
+        """Упорядочивает историю по времени: lt растет со временем, самая старая транзакция — первая в цепочке."""
+        self.transactions.sort(key=lambda tx: tx.utime, reverse=True)
+        for lt, tx in enumerate(reversed(self.transactions), start=1001):
+            tx.lt, tx.hash = lt, hashlib.sha256(str(lt).encode()).hexdigest()
+        for newer, older in zip(self.transactions, self.transactions[1:]):
+            newer.prev_lt, newer.prev_hash = older.lt, bytes.fromhex(older.hash)
+        self.transactions[-1].prev_lt, self.transactions[-1].prev_hash = 0, b""
+
+    async def fetch(self, limit: int, from_lt: int | None, from_hash: bytes | None) -> list[WalletTransaction]:
+        self.calls += 1
+        start = 0
+        if from_lt is not None:
+            start = next(i for i, tx in enumerate(self.transactions) if tx.lt == from_lt)
+        return self.transactions[start:start + limit]
+
+
+async def run(args: argparse.Namespace) -> bool:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(args.seed)
+    now = utc_now()
+    chain = SimulatedChain()
+    async with session_maker() as session:
+        user = User(tg_id=1, username="sim")
+        session.add(user)
+        await session.flush()
+        payouts = [
+            Payout(
+                user_id=user.id, amount=1.0, wallet="UQsim", status=PayoutStatus.PAID,
+                sent_at=now - datetime.timedelta(seconds=rng.randint(0, 600)),
+            )
+            for _ in range(args.payouts)
+        ]
+        # Потерянные выплаты отправлены давно, чтобы трекер их пометил
+        for payout in payouts[:args.lost]:
+            payout.sent_at = now - datetime.timedelta(hours=1)
+        session.add_all(payouts)
+        await session.commit()
+
+    # Проводим остальные: по несколько выплат в транзакции, вперемешку с посторонними переводами
+    landed = payouts[args.lost:]
+    rng.shuffle(landed)
+    for i in range(0, len(landed), 4):
+        chunk = landed[i:i + 4]
+        chain.land(["top-up"], utime=epoch(now) - 5)
+        chain.land([payout_comment(payout.id) for payout in chunk], utime=epoch(max(p.sent_at for p in chunk)))
+    chain.relink()
+
+    # Проход, оборванный max_pages, не должен помечать выплаты, до которых не дошел
+    truncated = TxTracker(fetch=chain.fetch, page_size=args.page_size, max_pages=1, missing_after=900)
+    truncated.bind(session_maker)
+    early_confirmed, early_missing = await truncated.poll_once()
+
+    tracker = TxTracker(fetch=chain.fetch, page_size=args.page_size, max_pages=1000, missing_after=900)
+    tracker.bind(session_maker)
+    confirmed, missing = await tracker.poll_once()
+    confirmed += early_confirmed
+
+    async with session_maker() as session:
+        rows = (await session.execute(select(Payout))).scalars().all()
+        outbox = (await session.execute(select(func.count(OutboxMessage.id)))).scalar_one()
+    by_hash = {tx.hash: tx for tx in chain.transactions}
+    hashes_ok = all(
+        row.tx_hash in by_hash and payout_comment(row.id) in by_hash[row.tx_hash].comments
+        for row in rows if row.tx_hash
+    )
+    ok = (
+        len(confirmed) == len(landed)
+        and (not early_missing or len(chain.transactions) <= args.page_size)
+        and sorted(missing) == sorted(p.id for p in payouts[:args.lost])
+        and hashes_ok
+    )
+    print(f"confirmed={len(confirmed)} missing={len(missing)} early_missing={len(early_missing)} chain_pages={chain.calls} notifications_in_outbox={outbox} ok={ok}")
+    await engine.dispose()
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TxTracker против симулированной цепочки")
+    parser.add_argument("--payouts", type=int, default=500)
+    parser.add_argument("--lost", type=int, default=7)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stdout)
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     # --- Telegram Bot ---
     bot_token: SecretStr
+    telegram_api_url: str | None = None  # свой Bot API сервер вместо api.telegram.org
 
     # --- Webhook Settings ---
     webhook_secret: str
@@ -14,6 +15,21 @@ class Settings(BaseSettings):
     webhook_path: str
     webapp_port: int
     webapp_host: str
+    web_workers: int = 1  # процессов, принимающих вебхуки; 1 — всё в одном процессе
+    update_dedup_ttl: int = 3600  # секунд хранения update_id для отсева повторных доставок
+    # Отвечать Telegram сразу и обрабатывать апдейты из очереди. Порядок апдейтов одного чата
+    # гарантируется только внутри процесса: при WEB_WORKERS > 1 соединения делит ядро,
+    # и два апдейта одного чата могут обработаться в разных воркерах не по порядку
+    webhook_fast_ack: bool = True
+    update_workers: int = 32  # параллельных обработчиков очереди апдейтов (на процесс)
+    update_queue_size: int = 10000  # максимум апдейтов в очереди процесса
+
+    # --- Metrics ---
+    metrics_path: str = "/metrics"
+    metrics_token: SecretStr | None = None  # если задан, /metrics требует Authorization: Bearer <token>
+    update_query_budget: int = 15  # SQL-запросов на апдейт, сверх которых он логируется как медленный
+    update_db_time_budget: float = 0.25  # секунд SQL на апдейт, сверх которых он логируется как медленный
+    n_plus_one_threshold: int = 5  # повторов одного запроса в апдейте, после которых он помечается как N+1
 
     # --- Database ---
     db_user: str
@@ -29,13 +45,22 @@ class Settings(BaseSettings):
     # --- Payouts ---
     wallet_mnemonic: SecretStr
     min_payout_amount: float
+    coingecko_api_url: str = "https://api.coingecko.com/api/v3"
+    payout_batch_size: int = 100  # максимум выплат, забираемых в одну пачку
+    payout_worker_concurrency: int = 2  # параллельных обработчиков очереди выплат
+    payout_max_attempts: int = 3  # попыток отправки до автоматической отмены выплаты
     
     # --- Registration Videos ---
     registration_videos_file_ids_str: str = Field(alias="REG_VIDEO_IDS", default="")
 
+    # --- Video Review ---
+    review_claim_ttl: int = 300  # секунд аренды видео администратором
+    review_prefetch: int = 3  # сколько видео резервируется за администратором заранее
+
     # --- Redis ---
     redis_host: str = "localhost"
     redis_port: int = 6379
+    user_cache_ttl: int = 60  # секунд жизни контекста пользователя в Redis
 
     @property
     def admin_ids(self) -> list[int]:
@@ -5,7 +5,9 @@ from typing import Annotated
 
 from sqlalchemy import (
     BigInteger,
+    Date,
     ForeignKey,
+    Index,
     String,
     TIMESTAMP,
     text,
@@ -43,6 +45,13 @@ class PayoutStatus(enum.Enum):
     CANCELLED = "отменено"
 
 
+class PayoutJobStatus(enum.Enum):
+    QUEUED = "в очереди"
+    RUNNING = "выполняется"
+    DONE = "выполнено"
+    FAILED = "ошибка"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -55,26 +64,51 @@ class User(Base):
     # Применяем наш новый, совместимый тип
     registered_at: Mapped[created_at] 
     is_banned: Mapped[bool] = mapped_column(default=False, server_default="false", index=True)
+    # Бот заблокирован пользователем или аккаунт удален — рассылки пропускают
+    is_blocked: Mapped[bool] = mapped_column(default=False, server_default="false")
+
+    # Денормализованные счетчики для профиля. Обновляются в тех же транзакциях,
+    # что и очередь/история видео, чтобы не считать COUNT(*) по video_history.
+    videos_on_review: Mapped[int] = mapped_column(default=0, server_default="0")
+    videos_accepted: Mapped[int] = mapped_column(default=0, server_default="0")
+    videos_rejected: Mapped[int] = mapped_column(default=0, server_default="0")
 
     videos: Mapped[list["Video"]] = relationship(back_populates="user")
     video_history: Mapped[list["VideoHistory"]] = relationship(back_populates="user")
     payouts: Mapped[list["Payout"]] = relationship(back_populates="user")
 
 
+# Поиск по username без учета регистра (бонусы, /ban, /unban)
+Index("ix_users_username_lower", func.lower(User.username))
+
+
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        Index("ix_videos_created_at", "created_at"),
+        Index("ix_videos_claimed_by_created_at", "claimed_by", "created_at"),
+        Index("ix_videos_user_id", "user_id"),
+    )
 
     id: Mapped[int_pk]
     user_id: Mapped[user_fk]
     link: Mapped[str]
     # Применяем наш новый, совместимый тип
     created_at: Mapped[created_at]
+    # Аренда видео администратором: пока claim_expires_at не прошло,
+    # видео не выдается другим модераторам
+    claimed_by: Mapped[int | None] = mapped_column(BigInteger)
+    claim_expires_at: Mapped[datetime.datetime | None]
 
     user: Mapped["User"] = relationship(back_populates="videos")
 
 
 class VideoHistory(Base):
     __tablename__ = "video_history"
+    __table_args__ = (
+        Index("ix_video_history_user_id_status", "user_id", "status"),
+        Index("ix_video_history_admin_tg_id", "admin_tg_id"),
+    )
 
     id: Mapped[int_pk]
     user_id: Mapped[user_fk]
@@ -90,6 +124,21 @@ class VideoHistory(Base):
 
 class Payout(Base):
     __tablename__ = "payouts"
+    __table_args__ = (
+        # Частичный индекс: очередь выплат маленькая, а таблица растет бесконечно
+        Index(
+            "ix_payouts_pending_created_at", "created_at",
+            postgresql_where=text("status = 'PENDING'"),
+            sqlite_where=text("status = 'PENDING'"),
+        ),
+        Index("ix_payouts_user_id_status", "user_id", "status"),
+        # Выплаты, ожидающие подтверждения в блокчейне (их опрашивает TxTracker)
+        Index(
+            "ix_payouts_unconfirmed_sent_at", "sent_at",
+            postgresql_where=text("status = 'PAID' AND tx_hash IS NULL AND NOT tx_missing AND sent_at IS NOT NULL"),
+            sqlite_where=text("status = 'PAID' AND tx_hash IS NULL AND NOT tx_missing AND sent_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int_pk]
     user_id: Mapped[user_fk]
@@ -102,8 +151,88 @@ class Payout(Base):
     )
     admin_tg_id: Mapped[int | None] = mapped_column(BigInteger)
     tx_hash: Mapped[str | None]
+    # Когда перевод принят сетью и когда транзакция найдена в блокчейне (TxTracker)
+    sent_at: Mapped[datetime.datetime | None]
+    confirmed_at: Mapped[datetime.datetime | None]
+    # Транзакция не найдена в блокчейне за отведенное время
+    tx_missing: Mapped[bool] = mapped_column(default=False, server_default="false")
+    # Пачка, в составе которой выплата отправляется (или была отправлена) в сеть
+    batch_id: Mapped[str | None] = mapped_column(String(32), index=True)
     # Применяем наш новый, совместимый тип
     created_at: Mapped[created_at]
     processed_at: Mapped[processed_at]
 
-    user: Mapped["User"] = relationship(back_populates="payouts")
\ No newline at end of file
+    user: Mapped["User"] = relationship(back_populates="payouts")
+
+
+class DailyStats(Base):
+    """
+    Предрасчитанная статистика по дням и администраторам.
+    Строка с admin_tg_id = 0 хранит события без администратора (регистрации).
+    """
+    __tablename__ = "daily_stats"
+
+    day: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    admin_tg_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    new_users: Mapped[int] = mapped_column(default=0, server_default="0")
+    videos_accepted: Mapped[int] = mapped_column(default=0, server_default="0")
+    videos_rejected: Mapped[int] = mapped_column(default=0, server_default="0")
+    payouts_confirmed: Mapped[int] = mapped_column(default=0, server_default="0")
+    paid_amount: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+
+
+class Counter(Base):
+    """Именованные счетчики (размер очереди видео, число ожидающих выплат)."""
+    __tablename__ = "counters"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+
+
+class PayoutJob(Base):
+    """
+    Задание на отправку выплаты в сеть. Создается по клику администратора,
+    выполняется фоновым PayoutWorker. chat_id/message_id — сообщение, в котором
+    администратору показывается результат.
+    """
+    __tablename__ = "payout_jobs"
+    __table_args__ = (
+        Index("ix_payout_jobs_status_run_after", "status", "run_after"),
+        Index("ix_payout_jobs_chat_id_message_id", "chat_id", "message_id"),
+    )
+
+    id: Mapped[int_pk]
+    payout_id: Mapped[int] = mapped_column(ForeignKey("payouts.id", ondelete="CASCADE"), unique=True)
+    admin_tg_id: Mapped[int] = mapped_column(BigInteger)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_id: Mapped[int]
+    status: Mapped[PayoutJobStatus] = mapped_column(
+        PgEnum(PayoutJobStatus, name="payout_job_status_enum"),
+        default=PayoutJobStatus.QUEUED,
+    )
+    attempts: Mapped[int] = mapped_column(default=0, server_default="0")
+    run_after: Mapped[datetime.datetime] = mapped_column(default=func.now())
+    last_error: Mapped[str | None]
+    # Когда задание завершилось (DONE/FAILED); для неизвестного исхода — отсчет до вердикта TxTracker
+    finished_at: Mapped[datetime.datetime | None]
+    created_at: Mapped[created_at]
+
+    payout: Mapped["Payout"] = relationship()
+
+
+class OutboxMessage(Base):
+    """
+    Уведомление пользователю, записанное в той же транзакции, что и изменение состояния.
+    OutboxRelay отправляет его и удаляет строку. alert_chat_id — кого предупредить,
+    если доставить не удалось.
+    """
+    __tablename__ = "outbox"
+
+    id: Mapped[int_pk]
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str]
+    alert_chat_id: Mapped[int | None] = mapped_column(BigInteger)
+    attempts: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Пока строка арендована отправителем, другие ее не берут
+    locked_until: Mapped[datetime.datetime | None]
+    created_at: Mapped[created_at]
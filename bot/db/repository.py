@@ -1,17 +1,61 @@
 # bot/db/repository.py
 
+import datetime
+import collections
 from typing import Dict, Any
-from sqlalchemy import select, update, func, delete
+from sqlalchemy import select, insert, update, func, delete, true, or_, case, literal, String, BigInteger
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, joinedload
 
-from bot.db.models import User, Video, VideoHistory, VideoStatus, Payout, PayoutStatus
+from bot.db.models import User, Video, VideoHistory, VideoStatus, Payout, PayoutStatus, PayoutJob, PayoutJobStatus, OutboxMessage, DailyStats, Counter
+
+# Ключ строки статистики для событий без администратора
+NO_ADMIN = 0
+
+# Имена счетчиков в таблице counters
+QUEUE_SIZE = "video_queue"
+PENDING_PAYOUTS = "pending_payouts"
+# batch_id выплаты, которая поставлена в очередь PayoutWorker, но еще не отправляется
+PAYOUT_QUEUED_BATCH = "queued"
+
+
+def utc_today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def utc_now() -> datetime.datetime:
+    # Колонки хранятся без часового пояса, поэтому сравниваем с naive UTC
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
 
 
 class Repository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    def _insert(self, model):
+        """INSERT с поддержкой ON CONFLICT для текущего диалекта (PostgreSQL или SQLite в тестах)."""
+        if self.session.bind.dialect.name == "sqlite":
+            return sqlite.insert(model)
+        return postgresql.insert(model)
+
+    async def _increment_daily_stats(self, admin_tg_id: int, **deltas) -> None:
+        """Атомарно добавляет deltas к строке статистики за сегодня (upsert)."""
+        stmt = self._insert(DailyStats).values(day=utc_today(), admin_tg_id=admin_tg_id, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyStats.day, DailyStats.admin_tg_id],
+            set_={name: getattr(DailyStats, name) + getattr(stmt.excluded, name) for name in deltas},
+        )
+        await self.session.execute(stmt)
+
+    async def _increment_counter(self, name: str, delta: int) -> None:
+        stmt = self._insert(Counter).values(name=name, value=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Counter.name],
+            set_={"value": Counter.value + stmt.excluded.value},
+        )
+        await self.session.execute(stmt)
+
     # --- Методы для работы с пользователями (User) ---
 
     async def get_user_by_tg_id(self, tg_id: int) -> User | None:
@@ -28,6 +72,7 @@ class Repository:
         new_user = User(tg_id=tg_id, username=username)
         self.session.add(new_user)
         await self.session.flush()
+        await self._increment_daily_stats(NO_ADMIN, new_users=1)
         return new_user
 
     async def update_user_wallet(self, tg_id: int, wallet_address: str) -> None:
@@ -39,24 +84,105 @@ class Repository:
         await self.session.execute(stmt)
 
     async def ban_user(self, user_id: int) -> None:
+        """После коммита вызывающий код должен оповестить ban_cache.ban(tg_id)."""
         stmt = update(User).where(User.id == user_id).values(is_banned=True)
         await self.session.execute(stmt)
 
     async def unban_user(self, user_id: int) -> None:
+        """После коммита вызывающий код должен оповестить ban_cache.unban(tg_id)."""
         stmt = update(User).where(User.id == user_id).values(is_banned=False)
         await self.session.execute(stmt)
 
+    async def mark_users_blocked(self, tg_ids: list[int]) -> None:
+        """Пользователи, заблокировавшие бота или удалившие аккаунт, — рассылки их пропускают."""
+        if tg_ids:
+            await self.session.execute(update(User).where(User.tg_id.in_(tg_ids)).values(is_blocked=True))
+
+    async def mark_user_reachable(self, tg_id: int) -> None:
+        """Пользователь снова написал боту (например, /start после блокировки)."""
+        await self.session.execute(update(User).where(User.tg_id == tg_id, User.is_blocked.is_(True)).values(is_blocked=False))
+
+    @staticmethod
+    def _broadcast_recipients():
+        return User.is_banned.is_(False), User.is_blocked.is_(False)
+
+    async def get_broadcast_recipients(self, after_id: int, limit: int) -> list[tuple[int, int]]:
+        """Страница получателей рассылки (id, tg_id) по возрастанию id, начиная после after_id."""
+        query = (
+            select(User.id, User.tg_id)
+            .where(User.id > after_id, *self._broadcast_recipients())
+            .order_by(User.id.asc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return [tuple(row) for row in result.all()]
+
+    async def count_broadcast_recipients(self) -> int:
+        query = select(func.count(User.id)).where(*self._broadcast_recipients())
+        result = await self.session.execute(query)
+        return result.scalar_one()
+
     # --- Методы для работы с видео (Video) ---
 
     async def add_video_to_queue(self, user_id: int, link: str) -> Video:
         new_video = Video(user_id=user_id, link=link)
         self.session.add(new_video)
+        counters_stmt = update(User).where(User.id == user_id).values(videos_on_review=User.videos_on_review + 1)
+        await self.session.execute(counters_stmt)
+        await self._increment_counter(QUEUE_SIZE, 1)
         return new_video
 
-    async def get_oldest_video_from_queue(self) -> Video | None:
-        query = select(Video).options(selectinload(Video.user)).order_by(Video.created_at.asc()).limit(1)
+    async def claim_videos_for_review(self, admin_tg_id: int, limit: int, lease_seconds: int) -> None:
+        """
+        Резервирует за администратором до limit самых старых свободных видео
+        (свободных, с истекшей арендой или уже его собственных — им аренда продлевается).
+        SKIP LOCKED не дает двум администраторам одновременно захватить одну строку.
+        """
+        now = utc_now()
+        claimable = (
+            select(Video.id)
+            .where(or_(
+                Video.claimed_by.is_(None),
+                Video.claim_expires_at < now,
+                Video.claimed_by == admin_tg_id,
+            ))
+            .order_by(Video.created_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Video)
+            .where(Video.id.in_(claimable.scalar_subquery()))
+            .values(claimed_by=admin_tg_id, claim_expires_at=now + datetime.timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def get_next_video_for_review(self, admin_tg_id: int, prefetch: int, lease_seconds: int) -> Video | None:
+        """
+        Возвращает самое старое видео, арендованное администратором, предварительно
+        дозаполнив его резерв до prefetch штук. Вызывающий код должен закоммитить сессию.
+        """
+        await self.claim_videos_for_review(admin_tg_id, limit=prefetch, lease_seconds=lease_seconds)
+        query = (
+            select(Video)
+            .options(joinedload(Video.user))
+            .where(Video.claimed_by == admin_tg_id, Video.claim_expires_at >= utc_now())
+            .order_by(Video.created_at.asc())
+            .limit(1)
+        )
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
+
+    async def release_video_claims(self, admin_tg_id: int) -> None:
+        """Возвращает зарезервированные видео в общую очередь."""
+        stmt = (
+            update(Video)
+            .where(Video.claimed_by == admin_tg_id)
+            .values(claimed_by=None, claim_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
     
     async def get_queue_count(self) -> int:
         query = select(func.count(Video.id))
@@ -64,23 +190,121 @@ class Repository:
         return result.scalar_one()
 
     async def process_video_acceptance(self, video_id: int, admin_tg_id: int, amount: float) -> Video:
-        video_to_process = await self.session.get(Video, video_id, options=[selectinload(Video.user)])
+        video_to_process = await self.session.get(Video, video_id, options=[selectinload(Video.user)], with_for_update=True)
         if not video_to_process: raise ValueError("Video not found")
-        user_update_stmt = update(User).where(User.id == video_to_process.user_id).values(balance=User.balance + amount)
+        user_update_stmt = update(User).where(User.id == video_to_process.user_id).values(
+            balance=User.balance + amount,
+            videos_on_review=User.videos_on_review - 1,
+            videos_accepted=User.videos_accepted + 1,
+        )
         await self.session.execute(user_update_stmt)
         history_record = VideoHistory(user_id=video_to_process.user_id, link=video_to_process.link, status=VideoStatus.ACCEPTED, admin_tg_id=admin_tg_id, created_at=video_to_process.created_at)
         self.session.add(history_record)
+        await self._increment_daily_stats(admin_tg_id, videos_accepted=1)
+        await self._increment_counter(QUEUE_SIZE, -1)
         await self.session.delete(video_to_process)
         return video_to_process
 
     async def process_video_rejection(self, video_id: int, admin_tg_id: int, reason: str) -> Video:
-        video_to_process = await self.session.get(Video, video_id, options=[selectinload(Video.user)])
+        video_to_process = await self.session.get(Video, video_id, options=[selectinload(Video.user)], with_for_update=True)
         if not video_to_process: raise ValueError("Video not found")
+        user_update_stmt = update(User).where(User.id == video_to_process.user_id).values(
+            videos_on_review=User.videos_on_review - 1,
+            videos_rejected=User.videos_rejected + 1,
+        )
+        await self.session.execute(user_update_stmt)
         history_record = VideoHistory(user_id=video_to_process.user_id, link=video_to_process.link, status=VideoStatus.REJECTED, reason=reason, admin_tg_id=admin_tg_id, created_at=video_to_process.created_at)
         self.session.add(history_record)
+        await self._increment_daily_stats(admin_tg_id, videos_rejected=1)
+        await self._increment_counter(QUEUE_SIZE, -1)
         await self.session.delete(video_to_process)
         return video_to_process
 
+    async def get_claimed_videos(self, admin_tg_id: int, limit: int) -> list[Video]:
+        """Видео, арендованные администратором, от старых к новым (для пакетной проверки)."""
+        query = (
+            select(Video)
+            .options(joinedload(Video.user))
+            .where(Video.claimed_by == admin_tg_id, Video.claim_expires_at >= utc_now())
+            .order_by(Video.created_at.asc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def accept_videos_batch(self, video_ids: list[int], admin_tg_id: int, amount: float) -> list[int]:
+        """Принимает пачку видео одной транзакцией. Возвращает tg_id авторов (по одному на видео)."""
+        return await self._process_videos_batch(video_ids, admin_tg_id, VideoStatus.ACCEPTED, amount=amount)
+
+    async def reject_videos_batch(self, video_ids: list[int], admin_tg_id: int, reason: str) -> list[int]:
+        """Отклоняет пачку видео с общей причиной. Возвращает tg_id авторов (по одному на видео)."""
+        return await self._process_videos_batch(video_ids, admin_tg_id, VideoStatus.REJECTED, reason=reason)
+
+    async def _process_videos_batch(
+        self,
+        video_ids: list[int],
+        admin_tg_id: int,
+        status: VideoStatus,
+        amount: float = 0.0,
+        reason: str | None = None,
+    ) -> list[int]:
+        """
+        Переносит видео в историю набором из нескольких запросов независимо от размера пачки:
+        блокировка строк, INSERT ... SELECT в историю, один UPDATE пользователей через CASE,
+        один DELETE. Уже обработанные кем-то видео просто отсутствуют в выборке.
+        """
+        if not video_ids:
+            return []
+
+        locked = await self.session.execute(
+            select(Video.id, Video.user_id, User.tg_id)
+            .join(User, User.id == Video.user_id)
+            .where(Video.id.in_(video_ids))
+            .with_for_update(of=Video)
+        )
+        rows = locked.all()
+        if not rows:
+            return []
+        ids = [row.id for row in rows]
+        per_user = collections.Counter(row.user_id for row in rows)
+
+        await self.session.execute(
+            insert(VideoHistory).from_select(
+                ["user_id", "link", "status", "reason", "admin_tg_id", "created_at"],
+                select(
+                    Video.user_id,
+                    Video.link,
+                    literal(status, VideoHistory.status.type),
+                    literal(reason, String),
+                    literal(admin_tg_id, BigInteger),
+                    Video.created_at,
+                ).where(Video.id.in_(ids)),
+            )
+        )
+
+        processed = case(dict(per_user), value=User.id)
+        user_values = {"videos_on_review": User.videos_on_review - processed}
+        if status == VideoStatus.ACCEPTED:
+            user_values["videos_accepted"] = User.videos_accepted + processed
+            user_values["balance"] = User.balance + processed * amount
+        else:
+            user_values["videos_rejected"] = User.videos_rejected + processed
+        await self.session.execute(
+            update(User)
+            .where(User.id.in_(list(per_user)))
+            .values(**user_values)
+            .execution_options(synchronize_session=False)
+        )
+
+        await self.session.execute(
+            delete(Video).where(Video.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+
+        stats_field = "videos_accepted" if status == VideoStatus.ACCEPTED else "videos_rejected"
+        await self._increment_daily_stats(admin_tg_id, **{stats_field: len(ids)})
+        await self._increment_counter(QUEUE_SIZE, -len(ids))
+        return [row.tg_id for row in rows]
+
     # --- Методы для работы с выплатами (Payout) ---
 
     async def create_payout_request(self, user: User, amount: float) -> Payout:
@@ -89,10 +313,12 @@ class Repository:
         user.balance -= amount
         self.session.add(user)
         await self.session.flush()
+        await self._increment_counter(PENDING_PAYOUTS, 1)
         return payout
         
     async def get_oldest_payout_request(self) -> Payout | None:
-        query = select(Payout).options(selectinload(Payout.user)).where(Payout.status == PayoutStatus.PENDING).order_by(Payout.created_at.asc()).limit(1)
+        # Выплаты, уже взятые в пачку, в ручную очередь не попадают
+        query = select(Payout).options(selectinload(Payout.user)).where(Payout.status == PayoutStatus.PENDING, Payout.batch_id.is_(None)).order_by(Payout.created_at.asc()).limit(1)
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
         
@@ -101,14 +327,293 @@ class Repository:
         result = await self.session.execute(query)
         return result.scalar_one()
 
-    async def confirm_payout(self, payout_id: int, admin_tg_id: int, tx_hash: str) -> None:
-        stmt = update(Payout).where(Payout.id == payout_id).values(status=PayoutStatus.PAID, admin_tg_id=admin_tg_id, tx_hash=tx_hash)
-        await self.session.execute(stmt)
+    async def confirm_payout(self, payout_id: int, admin_tg_id: int) -> None:
+        """Отмечает выплату отправленной. Хэш транзакции позже записывает TxTracker."""
+        stmt = (
+            update(Payout)
+            .where(Payout.id == payout_id, Payout.status == PayoutStatus.PENDING)
+            .values(status=PayoutStatus.PAID, admin_tg_id=admin_tg_id, sent_at=utc_now())
+            .returning(Payout.amount)
+        )
+        result = await self.session.execute(stmt)
+        amount = result.scalar_one_or_none()
+        if amount is not None:
+            await self._increment_daily_stats(admin_tg_id, payouts_confirmed=1, paid_amount=amount)
+            await self._increment_counter(PENDING_PAYOUTS, -1)
+
+    async def claim_pending_payouts(self, batch_id: str, limit: int, payout_ids: list[int] | None = None) -> list[Payout]:
+        """
+        Помечает до limit самых старых ожидающих выплат идентификатором пачки и возвращает их.
+        payout_ids ограничивает выбор конкретными выплатами.
+        """
+        claimable = (
+            select(Payout.id)
+            .where(Payout.status == PayoutStatus.PENDING, Payout.batch_id.is_(None))
+            .order_by(Payout.created_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if payout_ids is not None:
+            claimable = claimable.where(Payout.id.in_(payout_ids))
+        await self.session.execute(
+            update(Payout)
+            .where(Payout.id.in_(claimable.scalar_subquery()))
+            .values(batch_id=batch_id)
+            .execution_options(synchronize_session=False)
+        )
+        query = select(Payout).options(joinedload(Payout.user)).where(Payout.batch_id == batch_id).order_by(Payout.created_at.asc())
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def confirm_payout_batch(self, payout_ids: list[int], admin_tg_id: int) -> None:
+        """Отмечает выплаты пачки как выплаченные (одним UPDATE) и обновляет статистику."""
+        if not payout_ids:
+            return
+        stmt = (
+            update(Payout)
+            .where(Payout.id.in_(payout_ids), Payout.status == PayoutStatus.PENDING)
+            .values(status=PayoutStatus.PAID, admin_tg_id=admin_tg_id, sent_at=utc_now())
+            .returning(Payout.amount)
+            .execution_options(synchronize_session=False)
+        )
+        amounts = (await self.session.execute(stmt)).scalars().all()
+        if amounts:
+            await self._increment_daily_stats(admin_tg_id, payouts_confirmed=len(amounts), paid_amount=sum(amounts))
+            await self._increment_counter(PENDING_PAYOUTS, -len(amounts))
+
+    async def release_payouts(self, payout_ids: list[int]) -> None:
+        """Возвращает выплаты, не ушедшие в сеть, обратно в очередь."""
+        await self.set_payouts_batch(payout_ids, None)
+
+    async def set_payouts_batch(self, payout_ids: list[int], batch_id: str | None) -> None:
+        if not payout_ids:
+            return
+        await self.session.execute(
+            update(Payout)
+            .where(Payout.id.in_(payout_ids), Payout.status == PayoutStatus.PENDING)
+            .values(batch_id=batch_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    # --- Transaction Tracking ---
+    @staticmethod
+    def _unconfirmed_payouts():
+        return (
+            Payout.status == PayoutStatus.PAID,
+            Payout.tx_hash.is_(None),
+            Payout.tx_missing.is_(False),
+            Payout.sent_at.is_not(None),
+        )
+
+    async def get_unconfirmed_payouts(self, limit: int) -> list[Payout]:
+        """Отправленные выплаты, транзакция которых еще не найдена в блокчейне."""
+        query = (
+            select(Payout)
+            .options(joinedload(Payout.user))
+            .where(*self._unconfirmed_payouts())
+            .order_by(Payout.sent_at.asc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def record_payout_transactions(self, confirmations: list[Dict[str, Any]]) -> None:
+        """Записывает найденные транзакции: [{"id", "tx_hash", "confirmed_at"}, ...] одним executemany."""
+        if confirmations:
+            await self.session.execute(update(Payout), confirmations)
+
+    async def flag_missing_payouts(self, payout_ids: list[int], sent_before: datetime.datetime) -> list[int]:
+        """Из переданных выплат помечает те, что так и не появились в блокчейне, и возвращает их id."""
+        if not payout_ids:
+            return []
+        stmt = (
+            update(Payout)
+            .where(*self._unconfirmed_payouts(), Payout.id.in_(payout_ids), Payout.sent_at < sent_before)
+            .values(tx_missing=True)
+            .returning(Payout.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    # --- Outbox ---
+    async def enqueue_notification(self, chat_id: int, text: str, alert_chat_id: int | None = None) -> None:
+        """Пишет уведомление в outbox; оно уйдет только если текущая транзакция закоммитится."""
+        self.session.add(OutboxMessage(chat_id=chat_id, text=text, alert_chat_id=alert_chat_id))
+
+    async def enqueue_notifications(self, chat_ids: list[int], text: str) -> None:
+        if chat_ids:
+            await self.session.execute(insert(OutboxMessage), [{"chat_id": chat_id, "text": text} for chat_id in chat_ids])
+
+    async def claim_outbox(self, limit: int, lease_seconds: int) -> list[OutboxMessage]:
+        """Арендует пачку неотправленных уведомлений (SKIP LOCKED — отправители не мешают друг другу)."""
+        now = utc_now()
+        claimable = (
+            select(OutboxMessage.id)
+            .where(or_(OutboxMessage.locked_until.is_(None), OutboxMessage.locked_until < now))
+            .order_by(OutboxMessage.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(claimable.scalar_subquery()))
+            .values(locked_until=now + datetime.timedelta(seconds=lease_seconds), attempts=OutboxMessage.attempts + 1)
+            .returning(OutboxMessage)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(stmt)
+        return sorted(result.scalars().all(), key=lambda message: message.id)
+
+    async def delete_outbox(self, message_ids: list[int]) -> None:
+        if message_ids:
+            await self.session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(message_ids)))
+
+    async def extend_outbox_lease(self, message_ids: list[int], lease_seconds: int) -> None:
+        """Продлевает аренду строк, которые еще отправляются. Истекшую аренду не трогает — строку мог взять другой релей."""
+        if message_ids:
+            now = utc_now()
+            await self.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(message_ids), OutboxMessage.locked_until >= now)
+                .values(locked_until=now + datetime.timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+
+    # --- Payout Jobs ---
+    async def enqueue_payout_jobs(self, payouts: list[Payout], admin_tg_id: int, chat_id: int, message_id: int) -> None:
+        """
+        Ставит выплаты (уже помеченные PAYOUT_QUEUED_BATCH) в очередь на отправку.
+        Проваленное задание выплаты, которую вернули в очередь, запускается заново.
+        """
+        if not payouts:
+            return
+        stmt = self._insert(PayoutJob).values([
+            {"payout_id": payout.id, "admin_tg_id": admin_tg_id, "chat_id": chat_id, "message_id": message_id, "run_after": utc_now()}
+            for payout in payouts
+        ])
+        await self.session.execute(stmt.on_conflict_do_update(
+            index_elements=[PayoutJob.payout_id],
+            set_={
+                "admin_tg_id": stmt.excluded.admin_tg_id,
+                "chat_id": stmt.excluded.chat_id,
+                "message_id": stmt.excluded.message_id,
+                "run_after": stmt.excluded.run_after,
+                "status": PayoutJobStatus.QUEUED,
+                "attempts": 0,
+                "last_error": None,
+                "finished_at": None,
+            },
+            where=PayoutJob.status == PayoutJobStatus.FAILED,
+        ))
+
+    async def claim_payout_jobs(self, limit: int) -> list[PayoutJob]:
+        """Забирает готовые к выполнению задания (SKIP LOCKED — воркеры не мешают друг другу)."""
+        runnable = (
+            select(PayoutJob.id)
+            .where(PayoutJob.status == PayoutJobStatus.QUEUED, PayoutJob.run_after <= utc_now())
+            .order_by(PayoutJob.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(PayoutJob)
+            .where(PayoutJob.id.in_(runnable.scalar_subquery()))
+            .values(status=PayoutJobStatus.RUNNING, attempts=PayoutJob.attempts + 1)
+            .returning(PayoutJob.id)
+            .execution_options(synchronize_session=False)
+        )
+        job_ids = (await self.session.execute(stmt)).scalars().all()
+        if not job_ids:
+            return []
+        query = (
+            select(PayoutJob)
+            .options(joinedload(PayoutJob.payout).joinedload(Payout.user))
+            .where(PayoutJob.id.in_(job_ids))
+            .order_by(PayoutJob.id.asc())
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def finish_payout_jobs(self, job_ids: list[int], status: PayoutJobStatus, error: str | None = None) -> None:
+        if not job_ids:
+            return
+        await self.session.execute(
+            update(PayoutJob)
+            .where(PayoutJob.id.in_(job_ids))
+            .values(status=status, last_error=error, finished_at=utc_now())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def retry_payout_jobs(self, job_ids: list[int], delay_seconds: float, error: str) -> None:
+        if not job_ids:
+            return
+        await self.session.execute(
+            update(PayoutJob)
+            .where(PayoutJob.id.in_(job_ids))
+            .values(
+                status=PayoutJobStatus.QUEUED,
+                run_after=utc_now() + datetime.timedelta(seconds=delay_seconds),
+                last_error=error,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def fail_interrupted_payout_jobs(self) -> list[PayoutJob]:
+        """
+        Задания, оставшиеся RUNNING после перезапуска, могли уже уйти в сеть.
+        Повторять их небезопасно — помечаем как ошибку и возвращаем для разбора администратором.
+        """
+        query = (
+            select(PayoutJob)
+            .where(PayoutJob.status == PayoutJobStatus.RUNNING)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = list((await self.session.execute(query)).scalars().all())
+        await self.finish_payout_jobs([job.id for job in jobs], PayoutJobStatus.FAILED, "interrupted")
+        return jobs
+
+    async def get_unresolved_payout_jobs(self, limit: int) -> list[PayoutJob]:
+        """
+        Задания с неизвестным исходом (прерванные, "delivery unknown"): задание FAILED,
+        а выплата все еще PENDING и помечена пачкой. Ждут вердикта TxTracker.
+        run_after задания — не позже начала последней попытки отправки.
+        """
+        query = (
+            select(PayoutJob)
+            .join(PayoutJob.payout)
+            .options(joinedload(PayoutJob.payout).joinedload(Payout.user))
+            .where(
+                PayoutJob.status == PayoutJobStatus.FAILED,
+                Payout.status == PayoutStatus.PENDING,
+                Payout.batch_id.is_not(None),
+            )
+            .order_by(PayoutJob.run_after.asc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_payout_jobs_progress(self, chat_id: int, message_id: int) -> Dict[PayoutJobStatus, int]:
+        """Сколько заданий, показанных в одном сообщении администратора, в каждом статусе."""
+        query = (
+            select(PayoutJob.status, func.count(PayoutJob.id))
+            .where(PayoutJob.chat_id == chat_id, PayoutJob.message_id == message_id)
+            .group_by(PayoutJob.status)
+        )
+        result = await self.session.execute(query)
+        return {status: count for status, count in result.all()}
 
     async def cancel_payout(self, payout_id: int, admin_tg_id: int) -> Payout:
-        payout = await self.session.get(Payout, payout_id, options=[selectinload(Payout.user)])
+        payout = await self.session.get(Payout, payout_id, options=[selectinload(Payout.user)], with_for_update=True)
         if not payout: 
             raise ValueError("Payout not found")
+        if payout.status != PayoutStatus.PENDING:
+            # Повторная отмена вернула бы средства дважды
+            raise ValueError("Payout already processed")
+        if payout.batch_id is not None:
+            # Выплата прямо сейчас отправляется в составе пачки
+            raise ValueError("Payout is being sent in a batch")
         
         user_update_stmt = (
             update(User)
@@ -120,54 +625,117 @@ class Repository:
         payout.status = PayoutStatus.CANCELLED
         payout.admin_tg_id = admin_tg_id
         self.session.add(payout)
+        await self._increment_counter(PENDING_PAYOUTS, -1)
         
         return payout
 
     # --- МЕТОДЫ ДЛЯ СТАТИСТИКИ ---
-    async def count_videos_on_review(self, user_id: int) -> int:
-        query = select(func.count(Video.id)).where(Video.user_id == user_id)
-        result = await self.session.execute(query)
-        return result.scalar_one()
+    async def get_admin_panel_counters(self) -> Dict[str, int]:
+        """Счетчики для админ-панели: один запрос по первичному ключу таблицы counters."""
+        query = select(Counter.name, Counter.value).where(Counter.name.in_([QUEUE_SIZE, PENDING_PAYOUTS]))
+        values = dict((await self.session.execute(query)).all())
+        return {
+            "queue_count": max(values.get(QUEUE_SIZE, 0), 0),
+            "payout_count": max(values.get(PENDING_PAYOUTS, 0), 0),
+        }
 
-    async def count_accepted_videos(self, user_id: int) -> int:
-        query = select(func.count(VideoHistory.id)).where(VideoHistory.user_id == user_id, VideoHistory.status == VideoStatus.ACCEPTED)
-        result = await self.session.execute(query)
-        return result.scalar_one()
+    async def get_queue_metrics(self) -> Dict[str, tuple[int, datetime.datetime | None]]:
+        """
+        Глубина очередей и время постановки самого старого элемента — для /metrics.
+        Размеры видео и заявок на выплату берутся из counters, минимумы читаются по индексам.
+        """
+        counters = await self.get_admin_panel_counters()
+        queued_jobs = PayoutJob.status == PayoutJobStatus.QUEUED
+        query = select(
+            select(func.min(Video.created_at)).scalar_subquery(),
+            select(func.min(Payout.created_at)).where(Payout.status == PayoutStatus.PENDING).scalar_subquery(),
+            select(func.count(PayoutJob.id)).where(queued_jobs).scalar_subquery(),
+            select(func.min(PayoutJob.run_after)).where(queued_jobs).scalar_subquery(),
+            select(func.count(OutboxMessage.id)).scalar_subquery(),
+            select(func.min(OutboxMessage.created_at)).scalar_subquery(),
+        )
+        oldest_video, oldest_payout, jobs, oldest_job, outbox, oldest_outbox = (await self.session.execute(query)).one()
+        return {
+            "review": (counters["queue_count"], oldest_video),
+            "payout_requests": (counters["payout_count"], oldest_payout),
+            "payout_jobs": (jobs, oldest_job),
+            "outbox": (outbox, oldest_outbox),
+        }
+
+    async def reconcile_counters(self) -> Dict[str, int]:
+        """
+        Пересчитывает счетчики по реальным таблицам и перезаписывает их.
+        Сначала блокирует строки счетчиков (upsert с нулевой дельтой): транзакции,
+        уже изменившие счетчик, к этому моменту закоммичены и попадут в COUNT,
+        а остальные дождутся нашего коммита.
+        """
+        for name in (QUEUE_SIZE, PENDING_PAYOUTS):
+            await self._increment_counter(name, 0)
 
-    async def count_rejected_videos(self, user_id: int) -> int:
-        query = select(func.count(VideoHistory.id)).where(VideoHistory.user_id == user_id, VideoHistory.status == VideoStatus.REJECTED)
+        actual = {
+            QUEUE_SIZE: await self.get_queue_count(),
+            PENDING_PAYOUTS: await self.get_pending_payouts_count(),
+        }
+        for name, value in actual.items():
+            await self.session.execute(update(Counter).where(Counter.name == name).values(value=value))
+        return actual
+
+    async def get_user_profile(self, tg_id: int) -> Dict[str, Any] | None:
+        """Возвращает все данные профиля одним запросом по денормализованным счетчикам."""
+        query = select(
+            User.balance,
+            User.wallet,
+            User.videos_on_review,
+            User.videos_accepted,
+            User.videos_rejected,
+        ).where(User.tg_id == tg_id)
         result = await self.session.execute(query)
-        return result.scalar_one()
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return {
+            "balance": row.balance,
+            "wallet": row.wallet,
+            "on_review_count": row.videos_on_review,
+            "accepted_count": row.videos_accepted,
+            "rejected_count": row.videos_rejected,
+        }
+
+    @staticmethod
+    def _stats_window(days: int | None):
+        """Условие на окно в днях (1 — сегодня). None или 0 — за всё время."""
+        if not days:
+            return true()
+        return DailyStats.day >= utc_today() - datetime.timedelta(days=days - 1)
+
+    async def get_global_stats(self, days: int | None = None) -> Dict[str, Any]:
+        """Читает предрасчитанные дневные агрегаты вместо сканирования users/video_history/payouts."""
+        query = select(
+            func.sum(DailyStats.new_users),
+            func.sum(DailyStats.videos_accepted + DailyStats.videos_rejected),
+            func.sum(DailyStats.paid_amount),
+        ).where(self._stats_window(days))
+        total_users, total_processed_videos, total_paid_amount = (await self.session.execute(query)).one()
 
-    async def get_global_stats(self) -> Dict[str, Any]:
-        total_users = await self.session.scalar(select(func.count(User.id)))
-        total_processed_videos = await self.session.scalar(select(func.count(VideoHistory.id)))
-        total_paid_amount = await self.session.scalar(select(func.sum(Payout.amount)).where(Payout.status == PayoutStatus.PAID))
-        
         return {
             "total_users": total_users or 0,
             "total_processed_videos": total_processed_videos or 0,
             "total_paid_amount": total_paid_amount or 0.0,
         }
-    
-    # --- НОВЫЙ МЕТОД ---
-    async def get_admin_stats(self, admin_tg_id: int) -> Dict[str, Any]:
+
+    async def get_admin_stats(self, admin_tg_id: int, days: int | None = None) -> Dict[str, Any]:
         """Получает статистику по конкретному администратору."""
-        videos_processed_query = select(func.count(VideoHistory.id)).where(VideoHistory.admin_tg_id == admin_tg_id)
-        payouts_confirmed_query = select(func.count(Payout.id)).where(
-            Payout.admin_tg_id == admin_tg_id,
-            Payout.status == PayoutStatus.PAID
-        )
+        query = select(
+            func.sum(DailyStats.videos_accepted + DailyStats.videos_rejected),
+            func.sum(DailyStats.payouts_confirmed),
+        ).where(DailyStats.admin_tg_id == admin_tg_id, self._stats_window(days))
+        videos_processed, payouts_confirmed = (await self.session.execute(query)).one()
 
-        videos_processed = await self.session.scalar(videos_processed_query)
-        payouts_confirmed = await self.session.scalar(payouts_confirmed_query)
-        
         return {
             "videos_processed": videos_processed or 0,
             "payouts_confirmed": payouts_confirmed or 0,
         }
-    # ------------------
-    
+
     async def has_pending_payout(self, user_id: int) -> bool:
         """Проверяет, есть ли у пользователя активная заявка на вывод."""
         query = select(Payout.id).where(Payout.user_id == user_id, Payout.status == PayoutStatus.PENDING).limit(1)
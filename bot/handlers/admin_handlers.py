@@ -1,6 +1,6 @@
 # bot/handlers/admin_handlers.py
 
-import asyncio
+import html
 import json
 import logging
 from pathlib import Path
@@ -11,47 +11,53 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup, any_state
 from aiogram.types import Message, CallbackQuery
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy.ext.asyncio import async_sessionmaker
-from sqlalchemy.orm import selectinload
 
+from bot.config import config
 from bot.db.models import User
-from bot.db.repository import Repository
+from bot.db.repository import Repository, PAYOUT_QUEUED_BATCH
 from bot.keyboards import admin_keyboards as kb
 from bot.middlewares.admin_check import AdminCheckMiddleware
-from bot.services.coingecko_service import coingecko_service
-from bot.services.ton_service import ton_service
-from bot.db.models import Payout, PayoutStatus
+from bot.services.ban_cache import ban_cache
+from bot.services.broadcast_service import broadcast_service
+from bot.services.message_dispatcher import message_dispatcher
+from bot.services.outbox_relay import outbox_relay
+from bot.services.payout_worker import payout_worker
+from bot.services.user_cache import user_cache
 
 # --- Global variables & setup ---
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
     texts = json.load(f)
 
+VIDEO_REWARD = 0.10  # $ за принятое видео
+BATCH_PAGE_SIZE = 10  # видео на странице пакетной проверки
+
 # --- FSM States ---
 class VideoRejection(StatesGroup):
     waiting_for_reason = State()
 
+class BatchReviewFSM(StatesGroup):
+    waiting_for_reason = State()
+
+class BroadcastFSM(StatesGroup):
+    waiting_for_text = State()
+
 class BonusFSM(StatesGroup):
     waiting_for_username = State()
     waiting_for_amount = State()
 
-admin_router = Router()
+admin_router = Router(name="admin_router")
 admin_router.message.middleware(AdminCheckMiddleware())
 admin_router.callback_query.middleware(AdminCheckMiddleware())
 
 
 # --- Helper Function for Admin Panel ---
-async def show_admin_panel(bot: Bot, chat_id: int, session_maker: async_sessionmaker, message_id: int = None):
+async def show_admin_panel(bot: Bot, chat_id: int, repo: Repository, message_id: int = None):
     """Отправляет или редактирует сообщение, показывая главную админ-панель."""
-    queue_count = 0
-    payout_count = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        queue_count = await repo.get_queue_count()
-        payout_count = await repo.get_pending_payouts_count()
+    counters = await repo.get_admin_panel_counters()
 
     text = texts['admin_panel']['welcome']
-    reply_markup = kb.get_admin_main_menu(queue_count=queue_count, payout_count=payout_count)
+    reply_markup = kb.get_admin_main_menu(**counters)
     
     if message_id:
         try:
@@ -73,26 +79,32 @@ async def show_admin_panel(bot: Bot, chat_id: int, session_maker: async_sessionm
 
 # --- Main Panel Navigation ---
 @admin_router.message(Command("admin"))
-async def admin_panel_handler(message: Message, bot: Bot, session_maker: async_sessionmaker):
+async def admin_panel_handler(message: Message, bot: Bot, repo: Repository):
     await message.delete()
-    await show_admin_panel(bot, message.chat.id, session_maker)
+    await show_admin_panel(bot, message.chat.id, repo)
 
 @admin_router.callback_query(F.data == "back_to_admin_main", StateFilter(any_state))
-async def back_to_admin_main_handler(callback: CallbackQuery, bot: Bot, state: FSMContext, session_maker: async_sessionmaker):
+async def back_to_admin_main_handler(callback: CallbackQuery, bot: Bot, state: FSMContext, repo: Repository):
     await state.clear()
-    await show_admin_panel(bot, callback.message.chat.id, session_maker, callback.message.message_id)
+    # Администратор ушел из проверки — отдаем его резерв видео другим модераторам
+    await repo.release_video_claims(callback.from_user.id)
+    await show_admin_panel(bot, callback.message.chat.id, repo, callback.message.message_id)
     await callback.answer()
 
 
 # --- Video Review Logic ---
 @admin_router.callback_query(F.data == "get_video_review")
-async def get_video_for_review_handler(callback: CallbackQuery, session_maker: async_sessionmaker):
+async def get_video_for_review_handler(callback: CallbackQuery, repo: Repository):
     video_data = None
-    async with session_maker() as session:
-        repo = Repository(session)
-        video = await repo.get_oldest_video_from_queue()
-        if video:
-            video_data = {"id": video.id, "link": video.link, "created_at": video.created_at, "username": video.user.username, "tg_id": video.user.tg_id}
+    video = await repo.get_next_video_for_review(
+        admin_tg_id=callback.from_user.id,
+        prefetch=config.review_prefetch,
+        lease_seconds=config.review_claim_ttl,
+    )
+    if video:
+        video_data = {"id": video.id, "link": video.link, "created_at": video.created_at, "username": video.user.username, "tg_id": video.user.tg_id}
+    # Резерв фиксируем сразу, а не после ответа Telegram: другие модераторы его уже не возьмут
+    await repo.session.commit()
 
     if not video_data:
         await callback.answer(texts['admin_panel']['queue_empty'], show_alert=True)
@@ -111,26 +123,25 @@ async def get_video_for_review_handler(callback: CallbackQuery, session_maker: a
     await callback.answer()
 
 @admin_router.callback_query(kb.VideoReviewCallback.filter(F.action == "accept"))
-async def accept_video_handler(callback: CallbackQuery, callback_data: kb.VideoReviewCallback, bot: Bot, session_maker: async_sessionmaker):
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        try:
-            processed_video = await repo.process_video_acceptance(video_id=callback_data.video_id, admin_tg_id=callback.from_user.id, amount=0.10)
-            user_tg_id = processed_video.user.tg_id
-            await session.commit()
-        except ValueError:
-            await callback.answer(texts['admin_panel']['error_already_processed'], show_alert=True)
-            return
+async def accept_video_handler(callback: CallbackQuery, callback_data: kb.VideoReviewCallback, bot: Bot, repo: Repository):
+    try:
+        processed_video = await repo.process_video_acceptance(video_id=callback_data.video_id, admin_tg_id=callback.from_user.id, amount=VIDEO_REWARD)
+        # Уведомление пишется в outbox в той же транзакции, что и решение по видео
+        await repo.enqueue_notification(
+            processed_video.user.tg_id, texts['user_notifications']['video_accepted'].format(amount=VIDEO_REWARD),
+            alert_chat_id=callback.from_user.id,
+        )
+    except ValueError:
+        await repo.session.rollback()
+        await callback.answer(texts['admin_panel']['error_already_processed'], show_alert=True)
+        return
+    # Коммитим до wake(), иначе релей может не увидеть новое уведомление
+    await repo.session.commit()
+    outbox_relay.wake()
+    await user_cache.invalidate(processed_video.user.tg_id)
     
-    await callback.answer(texts['admin_panel']['video_accepted'].format(amount=0.10), show_alert=False)
-    await show_admin_panel(bot, callback.message.chat.id, session_maker, callback.message.message_id)
-
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['video_accepted'].format(amount=0.10))
-        except Exception as e:
-            await bot.send_message(callback.from_user.id, texts['admin_panel']['error_notify_user_alert'].format(error=e))
+    await callback.answer(texts['admin_panel']['video_accepted'].format(amount=VIDEO_REWARD), show_alert=False)
+    await show_admin_panel(bot, callback.message.chat.id, repo, callback.message.message_id)
         
 @admin_router.callback_query(kb.VideoReviewCallback.filter(F.action == "reject"))
 async def reject_video_handler(callback: CallbackQuery, callback_data: kb.VideoReviewCallback, state: FSMContext):
@@ -140,7 +151,7 @@ async def reject_video_handler(callback: CallbackQuery, callback_data: kb.VideoR
     await callback.answer()
 
 @admin_router.message(VideoRejection.waiting_for_reason)
-async def rejection_reason_handler(message: Message, state: FSMContext, bot: Bot, session_maker: async_sessionmaker):
+async def rejection_reason_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository):
     data = await state.get_data()
     video_id = data.get("video_id")
     original_message_id = data.get("original_message_id")
@@ -149,34 +160,159 @@ async def rejection_reason_handler(message: Message, state: FSMContext, bot: Bot
     
     await message.delete()
 
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        try:
-            processed_video = await repo.process_video_rejection(video_id=video_id, admin_tg_id=message.from_user.id, reason=reason)
-            user_tg_id = processed_video.user.tg_id
-            await session.commit()
-        except ValueError:
-            await bot.edit_message_text(chat_id=message.chat.id, message_id=original_message_id, text=texts['admin_panel']['error_already_processed'])
-            return
-
-    await show_admin_panel(bot, message.chat.id, session_maker, original_message_id)
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['video_rejected'].format(reason=reason))
-        except Exception as e:
-            await bot.send_message(message.from_user.id, texts['admin_panel']['error_notify_user_alert'].format(error=e))
+    try:
+        processed_video = await repo.process_video_rejection(video_id=video_id, admin_tg_id=message.from_user.id, reason=reason)
+        await repo.enqueue_notification(
+            processed_video.user.tg_id, texts['user_notifications']['video_rejected'].format(reason=reason),
+            alert_chat_id=message.from_user.id,
+        )
+    except ValueError:
+        await repo.session.rollback()
+        await bot.edit_message_text(chat_id=message.chat.id, message_id=original_message_id, text=texts['admin_panel']['error_already_processed'])
+        return
+
+    await repo.session.commit()
+    outbox_relay.wake()
+    await show_admin_panel(bot, message.chat.id, repo, original_message_id)
+
+
+# --- Batch Review Logic ---
+async def load_batch_page(admin_tg_id: int, state: FSMContext, repo: Repository, keep_marked: list[int] | None = None) -> list[dict]:
+    """Резервирует страницу видео за администратором и кладет ее в FSM, чтобы переключатели не ходили в БД."""
+    await repo.claim_videos_for_review(admin_tg_id, limit=BATCH_PAGE_SIZE, lease_seconds=config.review_claim_ttl)
+    videos = await repo.get_claimed_videos(admin_tg_id, limit=BATCH_PAGE_SIZE)
+    items = [
+        {
+            "id": video.id,
+            "link": video.link,
+            "username": f"@{video.user.username}" if video.user.username else f"ID: {video.user.tg_id}",
+        }
+        for video in videos
+    ]
+    await repo.session.commit()
+
+    page_ids = {item["id"] for item in items}
+    marked = [video_id for video_id in (keep_marked or []) if video_id in page_ids]
+    await state.update_data(batch_items=items, batch_marked=marked)
+    return items
+
+async def render_batch_page(bot: Bot, chat_id: int, message_id: int, items: list[dict], marked: list[int]):
+    lines = [
+        texts['admin_panel']['batch_review_item'].format(
+            number=number,
+            mark="❌" if item["id"] in marked else "✅",
+            username=html.escape(item["username"]),
+            link=html.escape(item["link"]),
+        )
+        for number, item in enumerate(items, start=1)
+    ]
+    text = texts['admin_panel']['batch_review_title'].format(count=len(items), items="\n".join(lines))
+    await bot.edit_message_text(
+        text=text,
+        chat_id=chat_id,
+        message_id=message_id,
+        reply_markup=kb.get_batch_review_keyboard([item["id"] for item in items], marked),
+        disable_web_page_preview=True
+    )
+
+async def show_batch_page_or_panel(bot: Bot, chat_id: int, message_id: int, admin_tg_id: int, state: FSMContext, repo: Repository, keep_marked: list[int] | None = None):
+    items = await load_batch_page(admin_tg_id, state, repo, keep_marked)
+    if not items:
+        await state.clear()
+        await show_admin_panel(bot, chat_id, repo, message_id)
+        return
+    data = await state.get_data()
+    await render_batch_page(bot, chat_id, message_id, items, data.get("batch_marked", []))
+
+@admin_router.callback_query(F.data == "batch_review")
+async def batch_review_handler(callback: CallbackQuery, bot: Bot, state: FSMContext, repo: Repository):
+    items = await load_batch_page(callback.from_user.id, state, repo)
+    if not items:
+        await callback.answer(texts['admin_panel']['queue_empty'], show_alert=True)
+        return
+    await render_batch_page(bot, callback.message.chat.id, callback.message.message_id, items, [])
+    await callback.answer()
+
+@admin_router.callback_query(kb.BatchReviewCallback.filter(F.action == "toggle"))
+async def batch_toggle_handler(callback: CallbackQuery, callback_data: kb.BatchReviewCallback, bot: Bot, state: FSMContext):
+    data = await state.get_data()
+    items = data.get("batch_items", [])
+    marked = data.get("batch_marked", [])
+    if not any(item["id"] == callback_data.video_id for item in items):
+        # Страница устарела (например, после возврата в меню)
+        await callback.answer(texts['admin_panel']['error_already_processed'], show_alert=True)
+        return
+    if callback_data.video_id in marked:
+        marked.remove(callback_data.video_id)
+    else:
+        marked.append(callback_data.video_id)
+    await state.update_data(batch_marked=marked)
+
+    await render_batch_page(bot, callback.message.chat.id, callback.message.message_id, items, marked)
+    await callback.answer()
+
+@admin_router.callback_query(kb.BatchReviewCallback.filter(F.action == "accept_all"))
+async def batch_accept_handler(callback: CallbackQuery, bot: Bot, state: FSMContext, repo: Repository):
+    data = await state.get_data()
+    marked = data.get("batch_marked", [])
+    video_ids = [item["id"] for item in data.get("batch_items", []) if item["id"] not in marked]
+    if not video_ids:
+        await callback.answer(texts['admin_panel']['batch_nothing_to_accept'], show_alert=True)
+        return
+
+    user_tg_ids = await repo.accept_videos_batch(video_ids, admin_tg_id=callback.from_user.id, amount=VIDEO_REWARD)
+    await repo.enqueue_notifications(user_tg_ids, texts['user_notifications']['video_accepted'].format(amount=VIDEO_REWARD))
+    await repo.session.commit()
+    outbox_relay.wake()
+    await user_cache.invalidate(*user_tg_ids)
+
+    await callback.answer(texts['admin_panel']['batch_accepted'].format(count=len(user_tg_ids), amount=VIDEO_REWARD))
+    await show_batch_page_or_panel(bot, callback.message.chat.id, callback.message.message_id, callback.from_user.id, state, repo, keep_marked=marked)
+
+@admin_router.callback_query(kb.BatchReviewCallback.filter(F.action == "reject_selected"))
+async def batch_reject_handler(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    marked = data.get("batch_marked", [])
+    if not marked:
+        await callback.answer(texts['admin_panel']['batch_nothing_selected'], show_alert=True)
+        return
+
+    await state.set_state(BatchReviewFSM.waiting_for_reason)
+    await state.update_data(batch_message_id=callback.message.message_id)
+    await callback.message.edit_text(
+        texts['admin_panel']['batch_ask_rejection_reason'].format(count=len(marked)),
+        reply_markup=kb.get_admin_cancel_keyboard()
+    )
+    await callback.answer()
+
+@admin_router.message(BatchReviewFSM.waiting_for_reason)
+async def batch_rejection_reason_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository):
+    data = await state.get_data()
+    marked = data.get("batch_marked", [])
+    message_id = data.get("batch_message_id")
+    reason = message.text
+    await state.set_state(None)
+    await message.delete()
+
+    user_tg_ids = await repo.reject_videos_batch(marked, admin_tg_id=message.from_user.id, reason=reason)
+    await repo.enqueue_notifications(user_tg_ids, texts['user_notifications']['video_rejected'].format(reason=reason))
+    await repo.session.commit()
+    outbox_relay.wake()
+
+    await show_batch_page_or_panel(bot, message.chat.id, message_id, message.from_user.id, state, repo)
+
+    # Подтверждение как у batch_accepted; удаляет его диспетчер, не занимая обработчик апдейтов
+    temp_msg = await message.answer(texts['admin_panel']['batch_rejected'].format(count=len(user_tg_ids)))
+    message_dispatcher.delete_message(message.chat.id, temp_msg.message_id, delay=2)
 
 
 # --- Payout Logic ---
 @admin_router.callback_query(F.data == "get_payout_request")
-async def get_payout_request_handler(callback: CallbackQuery, session_maker: async_sessionmaker):
+async def get_payout_request_handler(callback: CallbackQuery, repo: Repository):
     payout_data = None
-    async with session_maker() as session:
-        repo = Repository(session)
-        payout = await repo.get_oldest_payout_request()
-        if payout:
-            payout_data = {"id": payout.id, "amount": payout.amount, "wallet": payout.wallet, "username": payout.user.username, "tg_id": payout.user.tg_id}
+    payout = await repo.get_oldest_payout_request()
+    if payout:
+        payout_data = {"id": payout.id, "amount": payout.amount, "wallet": payout.wallet, "username": payout.user.username, "tg_id": payout.user.tg_id}
 
     if not payout_data:
         await callback.answer(texts['admin_panel']['payout_queue_empty'], show_alert=True)
@@ -188,77 +324,57 @@ async def get_payout_request_handler(callback: CallbackQuery, session_maker: asy
     await callback.answer()
 
 @admin_router.callback_query(kb.PayoutCallback.filter(F.action == "confirm"))
-async def confirm_payout_handler(callback: CallbackQuery, callback_data: kb.PayoutCallback, bot: Bot, session_maker: async_sessionmaker):
-    payout_data = None
-    async with session_maker() as session:
-        repo = Repository(session)
-        payout = await repo.session.get(Payout, callback_data.payout_id, options=[selectinload(Payout.user)])
-        if not payout or payout.status != PayoutStatus.PENDING:
-            await callback.message.edit_text(texts['admin_panel']['error_already_processed'])
-            await callback.answer()
-            return
-        payout_data = {"wallet": payout.wallet, "amount": payout.amount, "user_tg_id": payout.user.tg_id}
-
-    await callback.message.edit_text(texts['admin_panel']['payout_processing'])
-    rate = coingecko_service.get_ton_to_usd_rate()
-    if rate <= 0:
-        await callback.message.edit_text(texts['admin_panel']['payout_error_api'])
+async def confirm_payout_handler(callback: CallbackQuery, callback_data: kb.PayoutCallback, repo: Repository):
+    """Ставит выплату в очередь PayoutWorker; отправка и отчет выполняются в фоне."""
+    # Помечаем выплату как поставленную в очередь — повторный клик или отмена ее уже не возьмут
+    payouts = await repo.claim_pending_payouts(PAYOUT_QUEUED_BATCH, limit=1, payout_ids=[callback_data.payout_id])
+    if not payouts:
+        await callback.message.edit_text(texts['admin_panel']['error_already_processed'])
+        await callback.answer()
         return
-    
-    amount_ton = payout_data['amount'] / rate
-    tx_hash = await ton_service.send_transaction(to_address=payout_data['wallet'], amount_ton=amount_ton, comment="Rocky Clips Payout")
-    
-    user_to_notify_id = payout_data['user_tg_id']
-    amount_to_notify = payout_data['amount']
-
-    if tx_hash:
-        async with session_maker() as session:
-            repo = Repository(session)
-            await repo.confirm_payout(payout_id=callback_data.payout_id, admin_tg_id=callback.from_user.id, tx_hash=tx_hash)
-            await session.commit()
-        
-        await callback.answer(texts['admin_panel']['payout_confirmed_admin'].format(tx_hash=tx_hash), show_alert=True)
-        try:
-            await bot.send_message(user_to_notify_id, texts['user_notifications']['payout_confirmed_user'].format(amount=amount_to_notify, tx_hash=tx_hash))
-        except Exception as e:
-            await bot.send_message(callback.from_user.id, texts['admin_panel']['error_notify_user_alert'].format(error=e))
-    else:
-        async with session_maker() as session:
-            repo = Repository(session)
-            await repo.cancel_payout(payout_id=callback_data.payout_id, admin_tg_id=callback.from_user.id)
-            await session.commit()
-            
-        await callback.message.edit_text(texts['admin_panel']['payout_error_tx_admin'])
-        try:
-            await bot.send_message(user_to_notify_id, texts['user_notifications']['payout_failed_user'])
-        except Exception as e:
-            await bot.send_message(callback.from_user.id, texts['admin_panel']['error_notify_user_alert'].format(error=e))
-    
-    await asyncio.sleep(2)
-    await show_admin_panel(bot, callback.message.chat.id, session_maker, callback.message.message_id)
+    await repo.enqueue_payout_jobs(payouts, callback.from_user.id, callback.message.chat.id, callback.message.message_id)
+    await repo.session.commit()
+
+    payout_worker.wake()
+    await callback.message.edit_text(texts['admin_panel']['payout_processing'], reply_markup=kb.get_back_to_admin_menu_keyboard())
+    await callback.answer()
+
+@admin_router.callback_query(F.data == "pay_batch")
+async def pay_batch_handler(callback: CallbackQuery, repo: Repository):
+    """Ставит в очередь накопившиеся выплаты; воркер отправит их пачкой."""
+    payouts = await repo.claim_pending_payouts(PAYOUT_QUEUED_BATCH, limit=config.payout_batch_size)
+    if not payouts:
+        await callback.answer(texts['admin_panel']['payout_queue_empty'], show_alert=True)
+        return
+    await repo.enqueue_payout_jobs(payouts, callback.from_user.id, callback.message.chat.id, callback.message.message_id)
+    await repo.session.commit()
+
+    payout_worker.wake()
+    await callback.message.edit_text(
+        texts['admin_panel']['payout_batch_processing'].format(count=len(payouts)),
+        reply_markup=kb.get_back_to_admin_menu_keyboard(),
+    )
     await callback.answer()
 
 @admin_router.callback_query(kb.PayoutCallback.filter(F.action == "cancel"))
-async def cancel_payout_handler(callback: CallbackQuery, callback_data: kb.PayoutCallback, bot: Bot, session_maker: async_sessionmaker):
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        try:
-            cancelled_payout = await repo.cancel_payout(payout_id=callback_data.payout_id, admin_tg_id=callback.from_user.id)
-            user_tg_id = cancelled_payout.user.tg_id
-            await session.commit()
-        except ValueError:
-            await callback.answer(texts['admin_panel']['error_already_processed'], show_alert=True)
-            return
+async def cancel_payout_handler(callback: CallbackQuery, callback_data: kb.PayoutCallback, bot: Bot, repo: Repository):
+    try:
+        cancelled_payout = await repo.cancel_payout(payout_id=callback_data.payout_id, admin_tg_id=callback.from_user.id)
+        await repo.enqueue_notification(
+            cancelled_payout.user.tg_id, texts['user_notifications']['payout_cancelled_user'],
+            alert_chat_id=callback.from_user.id,
+        )
+    except ValueError:
+        await repo.session.rollback()
+        await callback.answer(texts['admin_panel']['error_already_processed'], show_alert=True)
+        return
+    await repo.session.commit()
+    outbox_relay.wake()
+    # Сумма выплаты вернулась на баланс
+    await user_cache.invalidate(cancelled_payout.user.tg_id)
     
     await callback.answer(texts['admin_panel']['payout_cancelled_admin'], show_alert=False)
-    await show_admin_panel(bot, callback.message.chat.id, session_maker, callback.message.message_id)
-
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['payout_cancelled_user'])
-        except Exception as e:
-            await bot.send_message(callback.from_user.id, texts['admin_panel']['error_notify_user_alert'].format(error=e))
+    await show_admin_panel(bot, callback.message.chat.id, repo, callback.message.message_id)
 
 
 # --- Statistics Logic ---
@@ -270,32 +386,26 @@ async def show_stats_menu_handler(callback: CallbackQuery):
     )
     await callback.answer()
 
-@admin_router.callback_query(F.data == "get_global_stats")
-async def get_global_stats_handler(callback: CallbackQuery, session_maker: async_sessionmaker):
-    stats = {}
-    async with session_maker() as session:
-        repo = Repository(session)
-        stats = await repo.get_global_stats()
-        
-    text = texts['admin_panel']['global_stats_message'].format(**stats)
-    await callback.message.edit_text(
-        text,
-        reply_markup=kb.get_back_to_stats_menu_keyboard()
-    )
-    await callback.answer()
+@admin_router.callback_query(kb.StatsCallback.filter())
+async def stats_handler(callback: CallbackQuery, callback_data: kb.StatsCallback, repo: Repository):
+    days = callback_data.days or None
+    if callback_data.scope == "my":
+        stats = await repo.get_admin_stats(callback.from_user.id, days=days)
+        template = texts['admin_panel']['my_stats_message']
+    else:
+        stats = await repo.get_global_stats(days=days)
+        template = texts['admin_panel']['global_stats_message']
 
-@admin_router.callback_query(F.data == "get_my_stats")
-async def get_my_stats_handler(callback: CallbackQuery, session_maker: async_sessionmaker):
-    stats = {}
-    async with session_maker() as session:
-        repo = Repository(session)
-        stats = await repo.get_admin_stats(callback.from_user.id)
-        
-    text = texts['admin_panel']['my_stats_message'].format(**stats)
-    await callback.message.edit_text(
-        text,
-        reply_markup=kb.get_back_to_stats_menu_keyboard()
-    )
+    period = texts['admin_panel']['stats_periods'][str(callback_data.days)]
+    text = template.format(period=period, **stats)
+    try:
+        await callback.message.edit_text(
+            text,
+            reply_markup=kb.get_back_to_stats_menu_keyboard(scope=callback_data.scope, days=callback_data.days)
+        )
+    except TelegramBadRequest:
+        # Повторное нажатие на тот же период — сообщение не изменилось
+        pass
     await callback.answer()
 
 
@@ -311,15 +421,13 @@ async def start_bonus_handler(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @admin_router.message(BonusFSM.waiting_for_username)
-async def bonus_username_handler(message: Message, state: FSMContext, session_maker: async_sessionmaker):
+async def bonus_username_handler(message: Message, state: FSMContext, repo: Repository):
     username = message.text.lstrip('@').strip()
     
     user_data = None
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_username(username)
-        if user:
-            user_data = {"id": user.id, "username": user.username}
+    user = await repo.get_user_by_username(username)
+    if user:
+        user_data = {"id": user.id, "username": user.username}
 
     data = await state.get_data()
     main_panel_message_id = data.get("main_panel_message_id")
@@ -330,11 +438,9 @@ async def bonus_username_handler(message: Message, state: FSMContext, session_ma
             chat_id=message.chat.id, message_id=main_panel_message_id,
             text=texts['admin_panel']['bonus_error_user_not_found'].format(username=f"@{username}")
         )
-        await asyncio.sleep(3)
-        await message.bot.edit_message_text(
-            chat_id=message.chat.id, message_id=main_panel_message_id,
-            text=texts['admin_panel']['ask_for_bonus_username'],
-            reply_markup=kb.get_admin_cancel_keyboard()
+        message_dispatcher.edit_message_text(
+            message.chat.id, main_panel_message_id, texts['admin_panel']['ask_for_bonus_username'],
+            reply_markup=kb.get_admin_cancel_keyboard(), delay=3
         )
         return
 
@@ -348,7 +454,7 @@ async def bonus_username_handler(message: Message, state: FSMContext, session_ma
     )
 
 @admin_router.message(BonusFSM.waiting_for_amount)
-async def bonus_amount_handler(message: Message, state: FSMContext, bot: Bot, session_maker: async_sessionmaker):
+async def bonus_amount_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository):
     data = await state.get_data()
     main_panel_message_id = data.get("main_panel_message_id")
     username = data.get("target_username")
@@ -364,91 +470,127 @@ async def bonus_amount_handler(message: Message, state: FSMContext, bot: Bot, se
             chat_id=message.chat.id, message_id=main_panel_message_id,
             text=texts['admin_panel']['bonus_error_invalid_amount']
         )
-        await asyncio.sleep(3)
-        await bot.edit_message_text(
-            chat_id=message.chat.id, message_id=main_panel_message_id,
-            text=texts['admin_panel']['ask_for_bonus_amount'].format(username=f"@{username}"),
-            reply_markup=kb.get_admin_cancel_keyboard()
+        message_dispatcher.edit_message_text(
+            message.chat.id, main_panel_message_id, texts['admin_panel']['ask_for_bonus_amount'].format(username=f"@{username}"),
+            reply_markup=kb.get_admin_cancel_keyboard(), delay=3
         )
         return
     
     await state.clear()
     
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        await repo.add_bonus_to_user(user_id=user_id, amount=amount)
-        user = await repo.session.get(User, user_id)
-        if user:
-            user_tg_id = user.tg_id
-        await session.commit()
+    await repo.add_bonus_to_user(user_id=user_id, amount=amount)
+    user = await repo.session.get(User, user_id)
+    if user:
+        await repo.enqueue_notification(
+            user.tg_id, texts['user_notifications']['bonus_received'].format(amount=amount),
+            alert_chat_id=message.chat.id,
+        )
+    await repo.session.commit()
+    outbox_relay.wake()
+    if user:
+        await user_cache.invalidate(user.tg_id)
 
     await bot.edit_message_text(
         chat_id=message.chat.id, message_id=main_panel_message_id,
         text=texts['admin_panel']['bonus_success_admin'].format(amount=amount, username=f"@{username}")
     )
-    
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['bonus_received'].format(amount=amount))
-        except Exception as e:
-            await message.answer(texts['admin_panel']['error_notify_user_alert'].format(error=e))
 
-    await asyncio.sleep(3)
-    await show_admin_panel(bot, message.chat.id, session_maker, main_panel_message_id)
+    # Через 3 секунды возвращаем панель; счетчики берем сейчас, пока сессия открыта
+    counters = await repo.get_admin_panel_counters()
+    message_dispatcher.edit_message_text(
+        message.chat.id, main_panel_message_id, texts['admin_panel']['welcome'],
+        reply_markup=kb.get_admin_main_menu(**counters), disable_web_page_preview=True, delay=3
+    )
+
+
+# --- Broadcast Logic ---
+@admin_router.message(Command("broadcast"))
+async def broadcast_start_handler(message: Message, state: FSMContext):
+    await message.delete()
+    prompt = await message.answer(texts['admin_panel']['broadcast_ask_text'], reply_markup=kb.get_admin_cancel_keyboard())
+    await state.set_state(BroadcastFSM.waiting_for_text)
+    await state.update_data(prompt_message_id=prompt.message_id)
+
+@admin_router.message(BroadcastFSM.waiting_for_text, F.text)
+async def broadcast_text_handler(message: Message, state: FSMContext, bot: Bot):
+    data = await state.get_data()
+    prompt_message_id = data.get("prompt_message_id")
+    # html_text сохраняет форматирование, которое администратор набрал в Telegram
+    text = message.html_text
+    await message.delete()
+
+    await state.update_data(broadcast_text=text)
+    await bot.edit_message_text(
+        chat_id=message.chat.id, message_id=prompt_message_id,
+        text=texts['admin_panel']['broadcast_preview'].format(text=text),
+        reply_markup=kb.get_broadcast_confirm_keyboard()
+    )
+
+@admin_router.callback_query(kb.BroadcastCallback.filter(F.action == "confirm"), BroadcastFSM.waiting_for_text)
+async def broadcast_confirm_handler(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    text = data.get("broadcast_text")
+    if not text:
+        await callback.answer(texts['admin_panel']['broadcast_ask_text'], show_alert=True)
+        return
+    await state.clear()
+
+    await broadcast_service.create(text, admin_chat_id=callback.message.chat.id, message_id=callback.message.message_id)
+    await callback.message.edit_text(texts['admin_panel']['broadcast_started'])
+    await callback.answer()
+
+@admin_router.callback_query(kb.BroadcastCallback.filter(F.action == "stop"))
+async def broadcast_stop_handler(callback: CallbackQuery, callback_data: kb.BroadcastCallback):
+    stopped = await broadcast_service.cancel(callback_data.job_id)
+    await callback.answer(texts['admin_panel']['broadcast_stopping'] if stopped else texts['admin_panel']['error_already_processed'])
 
 
 # --- Ban/Unban Logic ---
 @admin_router.message(Command("ban"))
-async def ban_user_handler(message: Message, bot: Bot, session_maker: async_sessionmaker):
+async def ban_user_handler(message: Message, bot: Bot, repo: Repository):
     args = message.text.split()
     if len(args) != 2:
         await message.answer(texts['admin_panel']['ban_error_format']); return
     
     username = args[1].lstrip('@')
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_username(username)
-        if not user:
-            await message.answer(texts['admin_panel']['bonus_error_user_not_found'].format(username=f"@{username}")); return
-        if user.is_banned:
-            await message.answer(texts['admin_panel']['user_already_banned'].format(username=f"@{username}")); return
-        
-        await repo.ban_user(user.id)
-        user_tg_id = user.tg_id
-        await session.commit()
+    user = await repo.get_user_by_username(username)
+    if not user:
+        await message.answer(texts['admin_panel']['bonus_error_user_not_found'].format(username=f"@{username}")); return
+    if user.is_banned:
+        await message.answer(texts['admin_panel']['user_already_banned'].format(username=f"@{username}")); return
+    
+    await repo.ban_user(user.id)
+    await repo.enqueue_notification(user.tg_id, texts['user_notifications']['user_banned'], alert_chat_id=message.chat.id)
+    user_tg_id = user.tg_id
+    await repo.session.commit()
+    outbox_relay.wake()
+
+    # Рассылаем изменение всем воркерам только после успешного коммита
+    await ban_cache.ban(user_tg_id)
+    await user_cache.invalidate(user_tg_id)
         
     await message.answer(texts['admin_panel']['ban_success'].format(username=f"@{username}"))
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['user_banned'])
-        except Exception as e:
-            await message.answer(texts['admin_panel']['error_notify_user_alert'].format(error=e))
 
 @admin_router.message(Command("unban"))
-async def unban_user_handler(message: Message, bot: Bot, session_maker: async_sessionmaker):
+async def unban_user_handler(message: Message, bot: Bot, repo: Repository):
     args = message.text.split()
     if len(args) != 2:
         await message.answer(texts['admin_panel']['unban_error_format']); return
         
     username = args[1].lstrip('@')
-    user_tg_id = 0
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_username(username)
-        if not user:
-            await message.answer(texts['admin_panel']['bonus_error_user_not_found'].format(username=f"@{username}")); return
-        if not user.is_banned:
-            await message.answer(texts['admin_panel']['user_not_banned'].format(username=f"@{username}")); return
-            
-        await repo.unban_user(user.id)
-        user_tg_id = user.tg_id
-        await session.commit()
-
-    await message.answer(texts['admin_panel']['unban_success'].format(username=f"@{username}"))
-    if user_tg_id:
-        try:
-            await bot.send_message(user_tg_id, texts['user_notifications']['user_unbanned'])
-        except Exception as e:
-            await message.answer(texts['admin_panel']['error_notify_user_alert'].format(error=e))
\ No newline at end of file
+    user = await repo.get_user_by_username(username)
+    if not user:
+        await message.answer(texts['admin_panel']['bonus_error_user_not_found'].format(username=f"@{username}")); return
+    if not user.is_banned:
+        await message.answer(texts['admin_panel']['user_not_banned'].format(username=f"@{username}")); return
+        
+    await repo.unban_user(user.id)
+    await repo.enqueue_notification(user.tg_id, texts['user_notifications']['user_unbanned'], alert_chat_id=message.chat.id)
+    user_tg_id = user.tg_id
+    await repo.session.commit()
+    outbox_relay.wake()
+
+    await ban_cache.unban(user_tg_id)
+    await user_cache.invalidate(user_tg_id)
+
+    await message.answer(texts['admin_panel']['unban_success'].format(username=f"@{username}"))
\ No newline at end of file
@@ -9,14 +9,14 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery, InputMediaVideo
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from pytoniq_core import Address
 
 from bot.config import config
 from bot.db.repository import Repository
 from bot.keyboards import user_keyboards as kb
-from bot.middlewares.throttling import RateLimiterMiddleware
+from bot.services.message_dispatcher import message_dispatcher
+from bot.services.user_cache import UserContext, user_cache
 
 # --- Global variables & setup ---
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -24,10 +24,11 @@ with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
     texts = json.load(f)
 
 user_router = Router(name="user_router")
-throttled_router = Router(name="throttled_router")
 
-throttled_router.message.middleware(RateLimiterMiddleware(limit=10, period=3600))
-user_router.include_router(throttled_router)
+# --- Rate limits (читаются RateLimiterMiddleware из флагов хендлеров) ---
+VIDEO_RATE_LIMIT = {"key": "video", "limit": 10, "period": 3600}
+WALLET_RATE_LIMIT = {"key": "wallet", "limit": 5, "period": 3600, "text": "rate_limit_wallet"}
+PAYOUT_RATE_LIMIT = {"key": "payout", "limit": 3, "period": 3600, "text": "rate_limit_payout"}
 
 
 # --- FSM States ---
@@ -65,27 +66,21 @@ async def show_main_menu(bot: Bot, chat_id: int, message_id: int | None = None,
         await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
 
 
-async def show_profile_panel(bot: Bot, chat_id: int, session_maker: async_sessionmaker, message_id: int | None = None):
+async def show_profile_panel(bot: Bot, chat_id: int, repo: Repository, message_id: int | None = None):
     """Отправляет или редактирует сообщение с профилем пользователя."""
-    profile_text = ""
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_tg_id(chat_id)
-        if not user:
-            return
-
-        on_review_count = await repo.count_videos_on_review(user.id)
-        accepted_count = await repo.count_accepted_videos(user.id)
-        rejected_count = await repo.count_rejected_videos(user.id)
-        wallet_short = f"{user.wallet[:4]}...{user.wallet[-4:]}" if user.wallet else "Не указан"
-
-        profile_text = texts['user_panel']['profile_text'].format(
-            balance=user.balance,
-            on_review_count=on_review_count,
-            accepted_count=accepted_count,
-            rejected_count=rejected_count,
-            wallet_short=wallet_short
-        )
+    profile = await repo.get_user_profile(chat_id)
+    if not profile:
+        return
+
+    wallet = profile['wallet']
+    wallet_short = f"{wallet[:4]}...{wallet[-4:]}" if wallet else "Не указан"
+    profile_text = texts['user_panel']['profile_text'].format(
+        balance=profile['balance'],
+        on_review_count=profile['on_review_count'],
+        accepted_count=profile['accepted_count'],
+        rejected_count=profile['rejected_count'],
+        wallet_short=wallet_short
+    )
 
     reply_markup = kb.get_profile_keyboard()
     if message_id:
@@ -116,18 +111,19 @@ async def send_registration_videos(bot: Bot, chat_id: int):
 # --- Registration Flow ---
 
 @user_router.message(CommandStart())
-async def start_handler(message: Message, bot: Bot, state: FSMContext, session_maker: async_sessionmaker):
+async def start_handler(message: Message, bot: Bot, state: FSMContext, repo: Repository, user_ctx: UserContext | None):
     await state.clear()
     #await message.delete()
 
-    user_wallet = None
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_tg_id(message.from_user.id)
-        if not user:
-            user = await repo.create_user(tg_id=message.from_user.id, username=message.from_user.username)
-            await session.commit()
-        user_wallet = user.wallet
+    user_wallet = user_ctx.wallet if user_ctx else None
+    if not user_ctx:
+        await repo.create_user(tg_id=message.from_user.id, username=message.from_user.username)
+        await repo.session.commit()
+    elif user_ctx.is_blocked:
+        # Пользователь разблокировал бота — снова включаем его в рассылки
+        await repo.mark_user_reachable(message.from_user.id)
+        await repo.session.commit()
+        await user_cache.invalidate(message.from_user.id)
 
     if user_wallet:
         await show_main_menu(bot, message.chat.id)
@@ -196,8 +192,8 @@ async def final_agree_handler(callback: CallbackQuery, state: FSMContext, bot: B
     await state.update_data(prompt_message_id=prompt_message.message_id)
 
 
-@user_router.message(Registration.waiting_for_wallet)
-async def wallet_handler(message: Message, state: FSMContext, bot: Bot, session_maker: async_sessionmaker):
+@user_router.message(Registration.waiting_for_wallet, flags={"rate_limit": WALLET_RATE_LIMIT})
+async def wallet_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository):
     data = await state.get_data()
     prompt_message_id = data.get("prompt_message_id")
     wallet_address = message.text.strip()
@@ -211,11 +207,9 @@ async def wallet_handler(message: Message, state: FSMContext, bot: Bot, session_
         is_valid = False
 
     if is_valid:
-        async with session_maker() as session:
-            repo = Repository(session)
-            await repo.update_user_wallet(tg_id=message.from_user.id, wallet_address=wallet_address)
-            await session.commit()
-            
+        await repo.update_user_wallet(tg_id=message.from_user.id, wallet_address=wallet_address)
+        await repo.session.commit()
+        await user_cache.invalidate(message.from_user.id)
         await state.clear()
 
         if prompt_message_id:
@@ -232,21 +226,16 @@ async def wallet_handler(message: Message, state: FSMContext, bot: Bot, session_
             message_id=prompt_message_id,
             text=texts['registration']['invalid_wallet']
         )
-        await asyncio.sleep(3)
-        await bot.edit_message_text(
-            chat_id=message.chat.id,
-            message_id=prompt_message_id,
-            text=texts['registration']['ask_for_wallet']
-        )
+        message_dispatcher.edit_message_text(message.chat.id, prompt_message_id, texts['registration']['ask_for_wallet'], delay=3)
 
 
 # --- Main Menu and Profile Handlers ---
 
 @user_router.callback_query(F.data == "show_profile")
-async def profile_handler(callback: CallbackQuery, bot: Bot, session_maker: async_sessionmaker):
+async def profile_handler(callback: CallbackQuery, bot: Bot, repo: Repository):
     await callback.answer()
     await callback.message.delete()
-    await show_profile_panel(bot, callback.from_user.id, session_maker)
+    await show_profile_panel(bot, callback.from_user.id, repo)
 
 
 @user_router.callback_query(F.data == "back_to_main_menu")
@@ -270,8 +259,8 @@ async def change_wallet_handler(callback: CallbackQuery, state: FSMContext):
     await state.update_data(prompt_message_id=callback.message.message_id)
 
 
-@user_router.message(ProfileUpdate.waiting_for_new_wallet)
-async def new_wallet_handler(message: Message, state: FSMContext, bot: Bot, session_maker: async_sessionmaker):
+@user_router.message(ProfileUpdate.waiting_for_new_wallet, flags={"rate_limit": WALLET_RATE_LIMIT})
+async def new_wallet_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository):
     data = await state.get_data()
     prompt_message_id = data.get("prompt_message_id")
     new_wallet_address = message.text.strip()
@@ -284,19 +273,18 @@ async def new_wallet_handler(message: Message, state: FSMContext, bot: Bot, sess
         is_valid = False
 
     if is_valid:
-        async with session_maker() as session:
-            repo = Repository(session)
-            await repo.update_user_wallet(tg_id=message.from_user.id, wallet_address=new_wallet_address)
-            await session.commit()
+        await repo.update_user_wallet(tg_id=message.from_user.id, wallet_address=new_wallet_address)
+        # Кэш сбрасываем только после коммита
+        await repo.session.commit()
+        await user_cache.invalidate(message.from_user.id)
 
         await state.clear()
         await bot.delete_message(message.chat.id, prompt_message_id)
 
         temp_msg = await message.answer(texts['user_panel']['wallet_changed_successfully'])
-        await asyncio.sleep(2)
-        await temp_msg.delete()
+        message_dispatcher.delete_message(message.chat.id, temp_msg.message_id, delay=2)
 
-        await show_profile_panel(bot, message.chat.id, session_maker)
+        await show_profile_panel(bot, message.chat.id, repo)
     else:
         await bot.edit_message_text(
             chat_id=message.chat.id,
@@ -304,12 +292,9 @@ async def new_wallet_handler(message: Message, state: FSMContext, bot: Bot, sess
             text=texts['registration']['invalid_wallet'],
             reply_markup=kb.get_cancel_change_wallet_keyboard()
         )
-        await asyncio.sleep(3)
-        await bot.edit_message_text(
-            chat_id=message.chat.id,
-            message_id=prompt_message_id,
-            text=texts['user_panel']['ask_for_new_wallet'],
-            reply_markup=kb.get_cancel_change_wallet_keyboard()
+        message_dispatcher.edit_message_text(
+            message.chat.id, prompt_message_id, texts['user_panel']['ask_for_new_wallet'],
+            reply_markup=kb.get_cancel_change_wallet_keyboard(), delay=3
         )
 
 
@@ -326,8 +311,9 @@ async def send_video_handler(callback: CallbackQuery, state: FSMContext):
     await state.update_data(prompt_message_id=callback.message.message_id)
 
 
-@throttled_router.message(VideoSubmission.waiting_for_link)
-async def receive_video_link_handler(message: Message, state: FSMContext, bot: Bot, session_maker: async_sessionmaker):
+@user_router.message(VideoSubmission.waiting_for_link, flags={"rate_limit": VIDEO_RATE_LIMIT})
+async def receive_video_link_handler(message: Message, state: FSMContext, bot: Bot, repo: Repository, user_ctx: UserContext | None):
+    if not user_ctx: return
     data = await state.get_data()
     prompt_message_id = data.get("prompt_message_id")
     await state.clear()
@@ -343,11 +329,8 @@ async def receive_video_link_handler(message: Message, state: FSMContext, bot: B
         await state.set_state(VideoSubmission.waiting_for_link)
         await state.update_data(prompt_message_id=prompt_message_id)
     else:
-        async with session_maker() as session:
-            repo = Repository(session)
-            user = await repo.get_user_by_tg_id(message.from_user.id)
-            await repo.add_video_to_queue(user_id=user.id, link=message.text)
-            await session.commit()
+        await repo.add_video_to_queue(user_id=user_ctx.id, link=message.text)
+        await repo.session.commit()
 
         await bot.delete_message(message.chat.id, prompt_message_id)
         await show_main_menu(bot, message.chat.id)
@@ -356,19 +339,14 @@ async def receive_video_link_handler(message: Message, state: FSMContext, bot: B
 # --- Payout Handlers ---
 
 @user_router.callback_query(F.data == "request_payout")
-async def request_payout_handler(callback: CallbackQuery, bot: Bot, session_maker: async_sessionmaker):
+async def request_payout_handler(callback: CallbackQuery, bot: Bot, repo: Repository, user_ctx: UserContext | None):
     await callback.answer()
 
-    has_pending = False
-    user_balance = 0.0
-    user_wallet = ""
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_tg_id(callback.from_user.id)
-        if not user: return
-        has_pending = await repo.has_pending_payout(user.id)
-        user_balance = user.balance
-        user_wallet = user.wallet
+    # Баланс здесь только показывается; confirm_payout_request_handler перечитает его из БД
+    if not user_ctx: return
+    has_pending = await repo.has_pending_payout(user_ctx.id)
+    user_balance = user_ctx.balance
+    user_wallet = user_ctx.wallet
 
     if has_pending:
         await bot.answer_callback_query(callback.id, texts['user_panel']['payout_already_pending'], show_alert=True)
@@ -389,39 +367,37 @@ async def request_payout_handler(callback: CallbackQuery, bot: Bot, session_make
         )
 
 
-@user_router.callback_query(F.data == "confirm_payout_request")
-async def confirm_payout_request_handler(callback: CallbackQuery, bot: Bot, session_maker: async_sessionmaker):
+@user_router.callback_query(F.data == "confirm_payout_request", flags={"rate_limit": PAYOUT_RATE_LIMIT})
+async def confirm_payout_request_handler(callback: CallbackQuery, bot: Bot, repo: Repository):
     await callback.answer()
-    should_show_profile = True
     
-    async with session_maker() as session:
-        repo = Repository(session)
-        user = await repo.get_user_by_tg_id(callback.from_user.id)
-        
-        if await repo.has_pending_payout(user.id):
-            await bot.answer_callback_query(callback.id, texts['user_panel']['payout_already_pending'], show_alert=True)
-            should_show_profile = False # Не нужно обновлять профиль, т.к. ничего не изменилось
-            return
-
-        if user.balance >= config.min_payout_amount:
-            await repo.create_payout_request(user, user.balance)
-            await session.commit()
-            await bot.answer_callback_query(callback.id, texts['user_panel']['payout_request_created'], show_alert=True)
-        else:
-            await bot.answer_callback_query(
-                callback.id,
-                texts['user_panel']['payout_not_enough_balance'].format(min_payout=config.min_payout_amount),
-                show_alert=True
-            )
+    user = await repo.get_user_by_tg_id(callback.from_user.id)
+    
+    if await repo.has_pending_payout(user.id):
+        # Не нужно обновлять профиль, т.к. ничего не изменилось
+        await bot.answer_callback_query(callback.id, texts['user_panel']['payout_already_pending'], show_alert=True)
+        return
+
+    if user.balance >= config.min_payout_amount:
+        await repo.create_payout_request(user, user.balance)
+        # Заявка должна быть сохранена до того, как пользователь увидит подтверждение
+        await repo.session.commit()
+        await user_cache.invalidate(callback.from_user.id)
+        await bot.answer_callback_query(callback.id, texts['user_panel']['payout_request_created'], show_alert=True)
+    else:
+        await bot.answer_callback_query(
+            callback.id,
+            texts['user_panel']['payout_not_enough_balance'].format(min_payout=config.min_payout_amount),
+            show_alert=True
+        )
     
     await callback.message.delete()
-    if should_show_profile:
-        await show_profile_panel(bot, callback.from_user.id, session_maker)
+    await show_profile_panel(bot, callback.from_user.id, repo)
 
 
 @user_router.callback_query(F.data == "cancel_payout_request")
-async def cancel_payout_request_handler(callback: CallbackQuery, bot: Bot, session_maker: async_sessionmaker):
+async def cancel_payout_request_handler(callback: CallbackQuery, bot: Bot, repo: Repository):
     await callback.answer()
     await callback.message.delete()
     await bot.answer_callback_query(callback.id, texts['user_panel']['payout_request_cancelled'], show_alert=False)
-    await show_profile_panel(bot, callback.from_user.id, session_maker)
\ No newline at end of file
+    await show_profile_panel(bot, callback.from_user.id, repo)
\ No newline at end of file
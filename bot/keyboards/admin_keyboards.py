@@ -12,13 +12,30 @@ class PayoutCallback(CallbackData, prefix="payout"):
     action: str
     payout_id: int
 
+class BatchReviewCallback(CallbackData, prefix="batch"):
+    action: str  # "toggle", "accept_all", "reject_selected"
+    video_id: int = 0
+
+class BroadcastCallback(CallbackData, prefix="broadcast"):
+    action: str  # "confirm", "stop"
+    job_id: str = ""
+
+class StatsCallback(CallbackData, prefix="stats"):
+    scope: str  # "global" или "my"
+    days: int  # 0 — за всё время
+
+# Доступные окна статистики: (дней, подпись кнопки)
+STATS_PERIODS = [(1, "Сегодня"), (7, "7 дней"), (30, "30 дней"), (0, "Всё время")]
+
 def get_admin_main_menu(queue_count: int = 0, payout_count: int = 0) -> InlineKeyboardMarkup:
     """
     Inline клавиатура для главного меню администратора.
     """
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=f"📩 Видео на проверку ({queue_count})", callback_data="get_video_review"))
+    builder.row(InlineKeyboardButton(text="📦 Пакетная проверка", callback_data="batch_review"))
     builder.row(InlineKeyboardButton(text=f"💰 Запросы на вывод ({payout_count})", callback_data="get_payout_request"))
+    builder.row(InlineKeyboardButton(text="💸 Выплатить пачкой", callback_data="pay_batch"))
     builder.row(
         InlineKeyboardButton(text="📊 Статистика", callback_data="show_stats_menu"),
         InlineKeyboardButton(text="🎁 Начислить бонус", callback_data="give_bonus_start")
@@ -28,14 +45,21 @@ def get_admin_main_menu(queue_count: int = 0, payout_count: int = 0) -> InlineKe
 def get_stats_menu_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для меню выбора статистики."""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="📈 Моя статистика", callback_data="get_my_stats"))
-    builder.row(InlineKeyboardButton(text="🌍 Общая статистика", callback_data="get_global_stats"))
+    builder.row(InlineKeyboardButton(text="📈 Моя статистика", callback_data=StatsCallback(scope="my", days=0).pack()))
+    builder.row(InlineKeyboardButton(text="🌍 Общая статистика", callback_data=StatsCallback(scope="global", days=0).pack()))
     builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_admin_main"))
     return builder.as_markup()
 
-def get_back_to_stats_menu_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура с кнопкой 'Назад' в меню статистики."""
+def get_back_to_stats_menu_keyboard(scope: str, days: int) -> InlineKeyboardMarkup:
+    """Клавиатура с переключателем периода и кнопкой 'Назад' в меню статистики."""
     builder = InlineKeyboardBuilder()
+    builder.row(*[
+        InlineKeyboardButton(
+            text=f"• {label} •" if period == days else label,
+            callback_data=StatsCallback(scope=scope, days=period).pack()
+        )
+        for period, label in STATS_PERIODS
+    ])
     builder.row(InlineKeyboardButton(text="⬅️ Назад в меню статистики", callback_data="show_stats_menu"))
     return builder.as_markup()
 
@@ -49,6 +73,23 @@ def get_video_review_keyboard(video_id: int) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_admin_main"))
     return builder.as_markup()
 
+def get_batch_review_keyboard(video_ids: list[int], marked_ids: list[int]) -> InlineKeyboardMarkup:
+    """Клавиатура пакетной проверки: переключатели по номерам видео и действия над пачкой."""
+    builder = InlineKeyboardBuilder()
+    for number, video_id in enumerate(video_ids, start=1):
+        mark = "❌" if video_id in marked_ids else "✅"
+        builder.button(text=f"{number} {mark}", callback_data=BatchReviewCallback(action="toggle", video_id=video_id).pack())
+    builder.adjust(5)
+
+    to_accept = len(video_ids) - len(marked_ids)
+    accept_text = f"✅ Принять остальные ({to_accept})" if marked_ids else f"✅ Принять все ({to_accept})"
+    builder.row(
+        InlineKeyboardButton(text=accept_text, callback_data=BatchReviewCallback(action="accept_all").pack()),
+        InlineKeyboardButton(text=f"❌ Отклонить выбранные ({len(marked_ids)})", callback_data=BatchReviewCallback(action="reject_selected").pack())
+    )
+    builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_admin_main"))
+    return builder.as_markup()
+
 def get_payout_review_keyboard(payout_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для обработки запроса на вывод админом."""
     builder = InlineKeyboardBuilder()
@@ -60,8 +101,24 @@ def get_payout_review_keyboard(payout_id: int) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_admin_main"))
     return builder.as_markup()
 
+def get_back_to_admin_menu_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_admin_main"))
+    return builder.as_markup()
+
 def get_admin_cancel_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой 'Отмена' для прерывания FSM админом."""
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="⬅️ Отмена", callback_data="back_to_admin_main"))
+    return builder.as_markup()
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📣 Отправить всем", callback_data=BroadcastCallback(action="confirm").pack()))
+    builder.row(InlineKeyboardButton(text="⬅️ Отмена", callback_data="back_to_admin_main"))
+    return builder.as_markup()
+
+def get_broadcast_progress_keyboard(job_id: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="⏹ Остановить рассылку", callback_data=BroadcastCallback(action="stop", job_id=job_id).pack()))
     return builder.as_markup()
\ No newline at end of file
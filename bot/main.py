@@ -1,7 +1,11 @@
 # bot/main.py
 
 import asyncio
+import gc
 import logging
+import os
+import signal
+import socket
 import sys
 from functools import partial
 
@@ -10,6 +14,8 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from redis.asyncio import Redis
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiogram.fsm.storage.redis import RedisStorage
@@ -17,14 +23,34 @@ from aiogram.fsm.storage.redis import RedisStorage
 from bot.config import config
 from bot.db.models import Base
 from bot.middlewares.ban_check import BanCheckMiddleware
+from bot.middlewares.db_session import DbSessionMiddleware
+from bot.middlewares.idempotency import IdempotencyMiddleware
+from bot.middlewares.metrics import TelegramApiMetricsMiddleware, UpdateMetricsMiddleware, register_handler_metrics
+from bot.middlewares.throttling import RateLimiterMiddleware
+from bot.middlewares.user_context import UserContextMiddleware
 from bot.handlers.admin_handlers import admin_router
 from bot.handlers.user_handlers import user_router
+from bot.services.ban_cache import ban_cache
+from bot.services.broadcast_service import broadcast_service
+from bot.services.coingecko_service import coingecko_service
+from bot.services.counters_service import counters_reconciler
+from bot.services.ton_service import ton_service
+from bot.services.payout_worker import payout_worker
+from bot.services.tx_tracker import tx_tracker
+from bot.services.message_dispatcher import message_dispatcher
+from bot.services.outbox_relay import outbox_relay
+from bot.services.update_queue import QueuedRequestHandler
+from bot.services.metrics import DbStatsLogFilter, setup_metrics
+from bot.services.user_cache import user_cache
 
 
-async def on_startup(bot: Bot, engine) -> None:
+async def prepare_deployment(bot: Bot, engine, redis: Redis, session_maker: async_sessionmaker) -> None:
+    """Разовая подготовка на запуск всего приложения, а не каждого воркера: схема, Redis, вебхук."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
+
+    await ban_cache.seed(redis, session_maker)
+
     await bot.delete_webhook(drop_pending_updates=True)
     
     await bot.set_webhook(
@@ -34,64 +60,262 @@ async def on_startup(bot: Bot, engine) -> None:
     logging.info("Webhook has been set. Pending updates dropped.")
 
 
-async def on_shutdown(bot: Bot) -> None:
-    await bot.delete_webhook()
-    logging.info("Webhook has been deleted.")
+async def on_startup(
+    bot: Bot, engine, redis: Redis, session_maker: async_sessionmaker, primary: bool, workers: int
+) -> None:
+    if workers == 1:
+        await prepare_deployment(bot, engine, redis, session_maker)
 
+    # Безопасно запускать в каждом воркере: общее состояние в Redis/БД,
+    # строки outbox разбираются с SKIP LOCKED
+    await ban_cache.start(redis)
+    user_cache.start(redis)
+    await coingecko_service.start()
+    message_dispatcher.start(bot, workers=workers)
+    outbox_relay.start(session_maker)
+    await broadcast_service.start(redis, session_maker, resume=primary)
+
+    # Фоновые задачи в единственном экземпляре: у кошелька один seqno,
+    # а восстановление прерванных выплат не должно задеть чужие задания
+    if primary:
+        counters_reconciler.start(session_maker)
+        await ton_service.start()
+        await payout_worker.start(session_maker)
+        tx_tracker.start(session_maker)
 
-def main() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-        stream=sys.stdout,
-    )
 
-    engine = create_async_engine(
+async def on_shutdown(bot: Bot, workers: int) -> None:
+    await ban_cache.stop()
+    await payout_worker.stop()
+    await tx_tracker.stop()
+    await broadcast_service.stop()
+    await outbox_relay.stop()
+    await message_dispatcher.stop()
+    await counters_reconciler.stop()
+    await coingecko_service.stop()
+    await ton_service.close()
+    if workers == 1:
+        await bot.delete_webhook()
+        logging.info("Webhook has been deleted.")
+
+
+def create_engine(workers: int):
+    # Пул делится между воркерами, чтобы суммарно не выйти за max_connections Postgres
+    return create_async_engine(
         config.database_url,
         echo=False,
-        pool_size=20,
-        max_overflow=10,
+        pool_size=max(5, 20 // workers),
+        max_overflow=max(2, 10 // workers),
         pool_timeout=30,
         pool_recycle=3600
     )
-    
+
+
+def create_bot() -> Bot:
+    # TELEGRAM_API_URL — локальный Bot API сервер или фейковый API нагрузочного теста
+    session = AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_url)) if config.telegram_api_url else None
+    return Bot(token=config.bot_token.get_secret_value(), parse_mode=ParseMode.HTML, session=session)
+
+
+def create_app(
+    worker_index: int = 0,
+    workers: int = 1,
+    *,
+    engine=None,
+    redis: Redis | None = None,
+    bot: Bot | None = None,
+    background_jobs: bool | None = None,
+) -> web.Application:
+    """
+    Приложение одного воркера. engine, redis и bot можно передать готовыми
+    (нагрузочный тест подставляет SQLite, fakeredis и фейковый Bot API);
+    background_jobs по умолчанию включены только в воркере 0.
+    """
+    engine = engine or create_engine(workers)
     session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
     # Создаем клиент Redis и хранилище FSM на его основе
-    redis_client = Redis(host=config.redis_host, port=config.redis_port, db=0)
+    redis_client = redis or Redis(host=config.redis_host, port=config.redis_port, db=0)
     storage = RedisStorage(redis=redis_client)
     
-    bot = Bot(token=config.bot_token.get_secret_value(), parse_mode=ParseMode.HTML)
+    bot = bot or create_bot()
+    bot.session.middleware(TelegramApiMetricsMiddleware())
     # Передаем storage в Dispatcher при его создании
     dp = Dispatcher(storage=storage)
     
-    # Прокидываем фабрику сессий в хендлеры
+    # Фабрика сессий нужна фоновым сервисам; хендлеры получают repo от DbSessionMiddleware
     dp["session_maker"] = session_maker
 
+    # Повторные доставки вебхука отсекаются до роутеров
+    dp.update.outer_middleware(IdempotencyMiddleware(redis_client, ttl=config.update_dedup_ttl))
+    # Метрики считаются только для апдейтов, прошедших отсев дубликатов
+    dp.update.outer_middleware(UpdateMetricsMiddleware(
+        query_budget=config.update_query_budget,
+        time_budget=config.update_db_time_budget,
+        repeat_threshold=config.n_plus_one_threshold,
+    ))
+    # Одна сессия БД на апдейт; ее запросы и коммит попадают в метрики апдейта
+    dp.update.outer_middleware(DbSessionMiddleware(session_maker))
+
     # Регистрируем middleware для проверки бана
     user_router.message.middleware(BanCheckMiddleware())
     user_router.callback_query.middleware(BanCheckMiddleware())
+
+    # Лимиты на частоту запросов (квоты задаются флагами хендлеров)
+    rate_limiter = RateLimiterMiddleware(redis_client)
+    user_router.message.middleware(rate_limiter)
+    user_router.callback_query.middleware(rate_limiter)
+
+    # Контекст пользователя из кэша — уже после отсева банов и лимитов
+    user_router.message.middleware(UserContextMiddleware())
+    user_router.callback_query.middleware(UserContextMiddleware())
     
-    dp.startup.register(partial(on_startup, engine=engine))
-    dp.shutdown.register(on_shutdown)
+    dp.startup.register(partial(
+        on_startup, engine=engine, redis=redis_client, session_maker=session_maker,
+        primary=worker_index == 0 if background_jobs is None else background_jobs, workers=workers,
+    ))
+    dp.shutdown.register(partial(on_shutdown, workers=workers))
     
     dp.include_router(admin_router)
     dp.include_router(user_router)
+    register_handler_metrics(admin_router, user_router)
     
     app = web.Application()
     
-    webhook_requests_handler = SimpleRequestHandler(
-        dispatcher=dp,
-        bot=bot,
-        secret_token=config.webhook_secret,
-    )
+    if config.webhook_fast_ack:
+        # Telegram получает ответ сразу, апдейты обрабатываются из очереди с порядком внутри чата
+        webhook_requests_handler = QueuedRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            workers=config.update_workers,
+            max_queue=config.update_queue_size,
+            secret_token=config.webhook_secret,
+        )
+    else:
+        webhook_requests_handler = SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=config.webhook_secret,
+        )
     
     webhook_requests_handler.register(app, path=config.webhook_path)
+    setup_metrics(
+        app, engine, session_maker,
+        update_handler=webhook_requests_handler if config.webhook_fast_ack else None,
+        path=config.metrics_path,
+        token=config.metrics_token.get_secret_value() if config.metrics_token else None,
+    )
     
     setup_application(app, dp, bot=bot)
-    
-    logging.info(f"Starting web server on {config.webapp_host}:{config.webapp_port}")
-    web.run_app(app, host=config.webapp_host, port=config.webapp_port)
+    app["webhook_handler"] = webhook_requests_handler
+    return app
+
+
+async def prepare_supervisor() -> None:
+    """Подготовка в процессе-супервизоре; все соединения закрываются до fork."""
+    engine = create_engine(workers=1)
+    redis_client = Redis(host=config.redis_host, port=config.redis_port, db=0)
+    bot = create_bot()
+    try:
+        await prepare_deployment(bot, engine, redis_client, async_sessionmaker(engine, expire_on_commit=False))
+    finally:
+        await bot.session.close()
+        await redis_client.aclose()
+        await engine.dispose()
+
+
+async def cleanup_supervisor() -> None:
+    bot = create_bot()
+    try:
+        await bot.delete_webhook()
+        logging.info("Webhook has been deleted.")
+    finally:
+        await bot.session.close()
+
+
+def run_workers(workers: int) -> None:
+    """
+    Pre-fork супервизор: один слушающий сокет на всех, воркеры принимают
+    соединения из него сами. Если один воркер упал — останавливаются все
+    (перезапуск целиком делает restart: always), чтобы фоновые задачи
+    воркера 0 никогда не работали в двух копиях.
+    """
+    asyncio.run(prepare_supervisor())
+    if config.webhook_fast_ack:
+        logging.warning(f"{workers} workers with WEBHOOK_FAST_ACK: per-chat update order is kept only within a worker")
+
+    # Файлы метрик прошлого запуска нужно удалить, иначе счетчики продолжатся с чужих значений
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
+
+    sock = socket.create_server((config.webapp_host, config.webapp_port), backlog=1024)
+
+    # Все импортированное до этого момента не трогается GC в детях — страницы остаются общими (copy-on-write)
+    gc.freeze()
+
+    children: dict[int, int] = {}
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                logging.info(f"Worker {index} started (pid {os.getpid()})")
+                web.run_app(create_app(index, workers), sock=sock, print=None)
+            except Exception:
+                logging.exception(f"Worker {index} crashed")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = index
+    sock.close()
+
+    stopping = False
+
+    def terminate(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    exit_code = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid)
+        if not stopping:
+            logging.error(f"Worker {index} exited unexpectedly (status {status}), stopping all workers")
+            exit_code = 1
+            terminate(signal.SIGTERM, None)
+
+    asyncio.run(cleanup_supervisor())
+    sys.exit(exit_code)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(process)d - %(levelname)s - %(name)s - %(message)s%(db_stats)s",
+        stream=sys.stdout,
+    )
+    # Записи, сделанные во время апдейта, получают число и время его SQL-запросов
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(DbStatsLogFilter())
+
+    logging.info(f"Starting web server on {config.webapp_host}:{config.webapp_port} with {config.web_workers} worker(s)")
+    if config.web_workers > 1:
+        run_workers(config.web_workers)
+    else:
+        web.run_app(create_app(), host=config.webapp_host, port=config.webapp_port)
 
 
 if __name__ == "__main__":
@@ -5,9 +5,8 @@ from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from bot.db.repository import Repository
+from bot.services.ban_cache import ban_cache
 
 
 class BanCheckMiddleware(BaseMiddleware):
@@ -19,29 +18,16 @@ class BanCheckMiddleware(BaseMiddleware):
     ) -> Any:
         """
         Проверяет, заблокирован ли пользователь.
-        Самостоятельно создает КОРОТКОЖИВУЩУЮ сессию для проверки.
+        Смотрит только в локальный снимок BanCache — без запросов к БД и Redis.
         """
         user = data.get("event_from_user")
-        session_maker: async_sessionmaker = data.get("session_maker")
         
-        # Если это событие не от пользователя, или нет фабрики сессий - пропускаем
-        if not user or not session_maker:
+        # Если это событие не от пользователя - пропускаем
+        if not user:
             return await handler(event, data)
         
-        is_banned = False
-        # --- ОТКРЫЛ БАЗУ ---
-        async with session_maker() as session:
-            repo = Repository(session)
-            db_user = await repo.get_user_by_tg_id(user.id)
-            if db_user and db_user.is_banned:
-                is_banned = True
-        # --- СРАЗУ ЖЕ ЗАКРЫЛ БАЗУ ---
-        
-        if is_banned:
+        if ban_cache.is_banned(user.id):
             logging.info(f"Ignoring update from banned user {user.id}")
             return
         
-        # Если пользователь не забанен, просто вызываем следующий обработчик.
-        # Этот следующий обработчик (например, start_handler) уже сам откроет
-        # СВОЕ СОБСТВЕННОЕ, НОВОЕ соединение, когда оно ему понадобится.
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
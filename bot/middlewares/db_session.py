@@ -0,0 +1,79 @@
+# bot/middlewares/db_session.py
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.event import listen
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import ORMExecuteState, Session, UOWTransaction
+
+from bot.db.repository import Repository
+
+# Ключ в data апдейта: True, если хендлер закоммитил хотя бы одно изменение
+# (читает IdempotencyMiddleware, чтобы не разрешать повтор уже примененного апдейта)
+COMMITTED_KEY = "db_committed"
+
+
+def track_committed_writes(session: Session) -> None:
+    """После коммита, в транзакции которого были INSERT/UPDATE/DELETE, ставит session.info["committed"]."""
+
+    def on_execute(state: ORMExecuteState) -> None:
+        if state.is_insert or state.is_update or state.is_delete:
+            session.info["writes"] = True
+
+    def on_flush(session: Session, flush_context: UOWTransaction) -> None:
+        session.info["writes"] = True
+
+    def on_commit(session: Session) -> None:
+        if session.info.pop("writes", False):
+            session.info["committed"] = True
+
+    def on_rollback(session: Session) -> None:
+        session.info.pop("writes", None)
+
+    listen(session, "do_orm_execute", on_execute)
+    listen(session, "after_flush", on_flush)
+    listen(session, "after_commit", on_commit)
+    listen(session, "after_rollback", on_rollback)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Одна сессия БД на апдейт.
+
+    Хендлеры получают готовый Repository в аргументе repo вместо того, чтобы открывать
+    собственные сессии через session_maker, — апдейт держит не больше одного соединения из пула.
+    Сессия ленивая: соединение берется из пула только при первом запросе, поэтому апдейты,
+    которые до БД не доходят (бан, лимиты, дубликаты), пул не трогают.
+
+    После хендлера открытая транзакция коммитится, если он завершился без исключения,
+    и откатывается, если упал. Хендлер может закоммитить раньше сам (repo.session.commit()),
+    когда после коммита нужно разбудить фоновый сервис или разослать изменение воркерам.
+    Был ли закоммичен хоть один запрос на запись, записывается в data[COMMITTED_KEY].
+
+    Регистрируется как outer middleware на dp.update.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker):
+        self.session_maker = session_maker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_maker() as session:
+            track_committed_writes(session.sync_session)
+            data["repo"] = Repository(session)
+            try:
+                result = await handler(event, data)
+                if session.in_transaction():
+                    await session.commit()
+                return result
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                data[COMMITTED_KEY] = session.info.get("committed", False)
@@ -0,0 +1,79 @@
+# bot/middlewares/idempotency.py
+
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio import Redis
+
+from bot.middlewares.db_session import COMMITTED_KEY
+
+SEEN_KEY = "updates:seen:{update_id}"
+STATS_KEY = "updates:stats"
+
+# Отметка апдейта и счетчики за один вызов: SET NX EX + HINCRBY.
+# Возвращает 1, если апдейт новый, и 0, если это повторная доставка.
+MARK_SEEN_LUA = """
+local fresh = redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1])
+redis.call('HINCRBY', KEYS[2], 'total', 1)
+if fresh then
+    return 1
+end
+redis.call('HINCRBY', KEYS[2], 'duplicates', 1)
+return 0
+"""
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторные доставки одного и того же апдейта.
+
+    Telegram повторяет вебхук, если мы отвечаем медленно или с ошибкой, и без защиты
+    неидемпотентные хендлеры (подтверждение выплаты, начисление бонуса) сработали бы дважды.
+    update_id записывается в Redis с SET NX и TTL до передачи апдейта в роутеры,
+    поэтому дубликат отсекается и тогда, когда оригинал еще обрабатывается в другом воркере.
+    Если обработка упала до коммита изменений в БД, отметка снимается — повтор от Telegram
+    будет обработан заново; если коммит уже был, повтор отбрасывается.
+
+    Регистрируется как outer middleware на dp.update.
+    """
+
+    def __init__(self, redis: Redis, ttl: int = 3600):
+        self.redis = redis
+        self.ttl = ttl
+        self.script = redis.register_script(MARK_SEEN_LUA)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        key = SEEN_KEY.format(update_id=event.update_id)
+        if not await self.script(keys=[key, STATS_KEY], args=[self.ttl]):
+            logging.info(f"Dropping duplicate delivery of update {event.update_id}")
+            return
+
+        try:
+            return await handler(event, data)
+        except Exception:
+            # Если хендлер успел что-то закоммитить, повтор применил бы это второй раз:
+            # отметка остается до истечения TTL
+            if not data.get(COMMITTED_KEY):
+                await self.redis.delete(key)
+            raise
+
+    async def stats(self) -> dict[str, float]:
+        """Сколько апдейтов пришло и какая доля из них — повторные доставки (общие для всех воркеров)."""
+        raw = await self.redis.hgetall(STATS_KEY)
+        total = int(raw.get(b"total", 0))
+        duplicates = int(raw.get(b"duplicates", 0))
+        return {
+            "total": total,
+            "duplicates": duplicates,
+            "hit_rate": round(duplicates / total, 4) if total else 0.0,
+        }
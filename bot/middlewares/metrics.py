@@ -0,0 +1,158 @@
+# bot/middlewares/metrics.py
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramConflictError,
+    TelegramEntityTooLarge,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+    TelegramUnauthorizedError,
+)
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+from bot.services.metrics import (
+    DbStats,
+    HANDLER_LATENCY,
+    TELEGRAM_API_ERRORS,
+    TELEGRAM_API_LATENCY,
+    UPDATE_DB_QUERIES,
+    UPDATE_DB_SECONDS,
+    current_db_stats,
+    statement_fingerprint,
+)
+
+# Метка ошибки Bot API; порядок важен — подклассы раньше базовых
+ERROR_CODES = [
+    (TelegramRetryAfter, "429"),
+    (TelegramForbiddenError, "403"),
+    (TelegramUnauthorizedError, "401"),
+    (TelegramNotFound, "404"),
+    (TelegramConflictError, "409"),
+    (TelegramEntityTooLarge, "413"),
+    (TelegramBadRequest, "400"),
+    (TelegramServerError, "5xx"),
+    (TelegramNetworkError, "network"),
+    (TelegramAPIError, "other"),
+]
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Outer middleware на dp.update: считает SQL-запросы и их время на весь апдейт
+    (включая middleware), события движка пишут в DbStats через contextvar.
+
+    Апдейт, превысивший query_budget запросов или time_budget секунд SQL, логируется
+    как медленный с отпечатками самых дорогих запросов. Запрос, повторенный
+    в одном апдейте repeat_threshold раз и больше, помечается как вероятный N+1.
+    """
+
+    def __init__(self, query_budget: int | None = None, time_budget: float | None = None, repeat_threshold: int = 5):
+        self.query_budget = query_budget
+        self.time_budget = time_budget
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        stats = DbStats()
+        token = current_db_stats.set(stats)
+        try:
+            return await handler(event, data)
+        finally:
+            current_db_stats.reset(token)
+            UPDATE_DB_QUERIES.observe(stats.queries)
+            UPDATE_DB_SECONDS.observe(stats.duration)
+            self._check_budget(getattr(event, "update_id", None), stats)
+
+    def _check_budget(self, update_id: int | None, stats: DbStats) -> None:
+        source = f"update {update_id} ({stats.handler or 'no handler'})"
+        for statement, count in stats.statements.items():
+            if count >= self.repeat_threshold:
+                logging.warning(f"Possible N+1 in {source}: statement ran {count} times: {statement_fingerprint(statement)}")
+
+        over_queries = self.query_budget is not None and stats.queries > self.query_budget
+        over_time = self.time_budget is not None and stats.duration > self.time_budget
+        if not (over_queries or over_time):
+            return
+        slowest = sorted(stats.statements, key=stats.statement_time.__getitem__, reverse=True)[:5]
+        details = "\n".join(
+            f"  {stats.statements[statement]}x {stats.statement_time[statement] * 1000:.1f} ms: {statement_fingerprint(statement)}"
+            for statement in slowest
+        )
+        logging.warning(
+            f"Slow {source}: {stats.queries} queries, {stats.duration * 1000:.1f} ms in SQL "
+            f"(budget: {self.query_budget} queries, {self.time_budget} s)\n{details}"
+        )
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware: время работы хендлера с метками роутера и имени функции.
+    Регистрируется на каждый тип событий роутера, см. register_handler_metrics.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        router = data.get("event_router")
+        labels = (
+            router.name if router else "unknown",
+            handler_object.callback.__name__ if handler_object else "unknown",
+        )
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.handler = labels[1]
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+
+
+def register_handler_metrics(*routers) -> None:
+    middleware = HandlerMetricsMiddleware()
+    for router in routers:
+        for name, observer in router.observers.items():
+            # error-хендлеры вызываются с другим набором данных
+            if name != "error":
+                observer.middleware(middleware)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки каждого запроса к Bot API по методу."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            code = next((code for error, code in ERROR_CODES if isinstance(e, error)), "other")
+            TELEGRAM_API_ERRORS.labels(name, code).inc()
+            raise
+        finally:
+            TELEGRAM_API_LATENCY.labels(name).observe(time.perf_counter() - start)
@@ -1,61 +1,95 @@
-import time
+# bot/middlewares/throttling.py
+
 import json
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, List
+from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
-from aiogram.types import Message
-from cachetools import TTLCache
-
-# Кэш теперь будет хранить список временных меток (timestamps) для каждого пользователя.
-# TTL (Time-To-Live) - 3600 секунд (1 час).
-# Это значит, что запись о пользователе будет удалена через час после его ПОСЛЕДНЕГО сообщения.
-cache = TTLCache(maxsize=10_000, ttl=3600)
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message, CallbackQuery, TelegramObject
+from redis.asyncio import Redis
 
 # Загружаем тексты прямо в middleware, чтобы оно могло отправлять сообщения
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
     texts = json.load(f)
 
+# Скользящее окно на двух счетчиках: текущее и предыдущее окно.
+# Количество запросов оценивается как prev * (доля непрошедшего окна) + cur.
+# На пользователя хранится один хэш из трех полей — память не зависит от лимита.
+# Время берется у Redis, поэтому несколько воркеров считают одинаково.
+SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = math.floor(now / period)
+
+local data = redis.call('HMGET', KEYS[1], 'w', 'cur', 'prev')
+local w = tonumber(data[1]) or window
+local cur = tonumber(data[2]) or 0
+local prev = tonumber(data[3]) or 0
+
+if w ~= window then
+    if w == window - 1 then prev = cur else prev = 0 end
+    cur = 0
+end
+
+local elapsed = (now - window * period) / period
+local estimated = prev * (1 - elapsed) + cur
+local allowed = 0
+if estimated < limit then
+    cur = cur + 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'w', window, 'cur', cur, 'prev', prev)
+redis.call('EXPIRE', KEYS[1], period * 2)
+return allowed
+"""
+
 
 class RateLimiterMiddleware(BaseMiddleware):
-    def __init__(self, limit: int = 10, period: int = 3600):
-        self.limit = limit  # Максимальное количество сообщений
-        self.period = period  # Временной период в секундах (3600 = 1 час)
+    """
+    Распределенный rate limiter на Redis. Один атомарный вызов Lua-скрипта на событие.
+
+    Лимит задается на уровне хендлера через флаг:
+
+        @router.message(..., flags={"rate_limit": {"key": "video", "limit": 10, "period": 3600}})
+
+    Хендлеры без флага не ограничиваются. У каждого ключа свой счетчик,
+    поэтому квоты разных маршрутов не влияют друг на друга.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.script = redis.register_script(SLIDING_WINDOW_LUA)
 
     async def __call__(
         self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        # Проверяем, что событие - это Message и что у него есть пользователь
-        if isinstance(event, Message) and event.from_user:
-            user_id = event.from_user.id
-            current_time = time.time()
-            
-            # Получаем список временных меток пользователя из кэша (или пустой список, если его нет)
-            timestamps: List[float] = cache.get(user_id, [])
-            
-            # Отфильтровываем временные метки, которые старше, чем наш период (1 час)
-            # Это реализует "скользящее окно"
-            recent_timestamps = [ts for ts in timestamps if current_time - ts < self.period]
-            
-            # Если количество недавних сообщений превышает или равно лимиту
-            if len(recent_timestamps) >= self.limit:
-                # Отправляем пользователю сообщение о превышении лимита
-                text = texts['user_panel']['rate_limit_exceeded'].format(limit=self.limit)
-                await event.answer(text)
-                # И не пропускаем сообщение дальше
-                return
-            
-            # Добавляем текущую временную метку в список
-            recent_timestamps.append(current_time)
-            # Обновляем кэш для этого пользователя
-            cache[user_id] = recent_timestamps
-            
-            # Пропускаем событие дальше, к хендлеру
+        rate_limit: Dict[str, Any] | None = get_flag(data, "rate_limit")
+        user = data.get("event_from_user")
+
+        # Если у хендлера нет лимита или событие не от пользователя, просто пропускаем
+        if not rate_limit or not user:
             return await handler(event, data)
-        
-        # Если это не сообщение от пользователя, просто пропускаем
-        return await handler(event, data)
\ No newline at end of file
+
+        limit = rate_limit["limit"]
+        period = rate_limit["period"]
+        key = f"throttle:{rate_limit['key']}:{user.id}"
+
+        allowed = await self.script(keys=[key], args=[limit, period])
+        if allowed:
+            return await handler(event, data)
+
+        # Отправляем пользователю сообщение о превышении лимита и не пропускаем событие дальше
+        text_key = rate_limit.get("text", "rate_limit_exceeded")
+        text = texts['user_panel'][text_key].format(limit=limit)
+        if isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(text)
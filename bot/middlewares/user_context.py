@@ -0,0 +1,33 @@
+# bot/middlewares/user_context.py
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.services.user_cache import user_cache
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Передает хендлеру контекст пользователя (UserContext) в аргументе user_ctx.
+
+    Контекст берется из UserCache один раз на апдейт и только для хендлеров,
+    которые объявили аргумент user_ctx, — остальные не делают ни запроса в Redis,
+    ни SELECT по users. Для незарегистрированного пользователя user_ctx равен None.
+    Использует repo от DbSessionMiddleware.
+
+    Регистрируется на user_router после проверки бана и лимитов.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        if user and handler_object and "user_ctx" in handler_object.params:
+            data["user_ctx"] = await user_cache.get(data["repo"], user.id)
+        return await handler(event, data)
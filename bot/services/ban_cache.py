@@ -0,0 +1,126 @@
+# bot/services/ban_cache.py
+
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.models import User
+
+BANNED_SET_KEY = "ban_cache:banned"
+UPDATES_CHANNEL = "ban_cache:updates"
+
+
+class BanCache:
+    """
+    Кэш заблокированных пользователей.
+
+    Источник правды — таблица users, общая копия — Redis-множество tg_id,
+    а для горячего пути каждый воркер держит локальный снимок (set).
+    Изменения рассылаются через pub/sub, поэтому проверка бана
+    не требует ни запроса в БД, ни запроса в Redis.
+    """
+
+    def __init__(self):
+        self.redis: Redis | None = None
+        self._banned: set[int] = set()
+        self._listener_task: asyncio.Task | None = None
+
+    @staticmethod
+    async def seed(redis: Redis, session_maker: async_sessionmaker) -> None:
+        """
+        Заполняет Redis из БД. Выполняется один раз на запуск всего приложения
+        (до старта воркеров), а не в каждом процессе: иначе поздний воркер
+        мог бы затереть бан, выданный в уже работающем.
+        """
+        async with session_maker() as session:
+            result = await session.execute(select(User.tg_id).where(User.is_banned.is_(True)))
+            banned_ids = set(result.scalars().all())
+
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(BANNED_SET_KEY)
+            if banned_ids:
+                pipe.sadd(BANNED_SET_KEY, *banned_ids)
+            await pipe.execute()
+        logging.info(f"Ban cache seeded: {len(banned_ids)} banned users.")
+
+    async def start(self, redis: Redis) -> None:
+        """Загружает локальный снимок из Redis и подписывается на обновления."""
+        self.redis = redis
+        await self._resync()
+        self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    def is_banned(self, tg_id: int) -> bool:
+        """Проверка без обращения к сети — только локальный снимок."""
+        return tg_id in self._banned
+
+    async def ban(self, tg_id: int) -> None:
+        await self._publish("ban", tg_id)
+
+    async def unban(self, tg_id: int) -> None:
+        await self._publish("unban", tg_id)
+
+    async def _publish(self, action: str, tg_id: int) -> None:
+        # Локальный снимок обновляем сразу, не дожидаясь сообщения из канала
+        self._apply(action, tg_id)
+        if self.redis is None:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if action == "ban":
+                pipe.sadd(BANNED_SET_KEY, tg_id)
+            else:
+                pipe.srem(BANNED_SET_KEY, tg_id)
+            pipe.publish(UPDATES_CHANNEL, f"{action}:{tg_id}")
+            await pipe.execute()
+
+    def _apply(self, action: str, tg_id: int) -> None:
+        if action == "ban":
+            self._banned.add(tg_id)
+        elif action == "unban":
+            self._banned.discard(tg_id)
+
+    async def _resync(self) -> None:
+        members = await self.redis.smembers(BANNED_SET_KEY)
+        self._banned = {int(member) for member in members}
+
+    async def _listen(self) -> None:
+        """Слушает канал обновлений; после обрыва связи перечитывает множество целиком."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(UPDATES_CHANNEL)
+                # Подписка активна — всё, что пришло до неё, забираем из множества
+                await self._resync()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    action, _, tg_id = data.partition(":")
+                    self._apply(action, int(tg_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Ban cache listener error: {e}. Reconnecting...")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+# Создаем один экземпляр кэша для всего приложения
+ban_cache = BanCache()
@@ -0,0 +1,199 @@
+# bot/services/broadcast_service.py
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.repository import Repository
+from bot.keyboards import admin_keyboards as kb
+from bot.services.message_dispatcher import message_dispatcher, Priority
+from bot.services.user_cache import user_cache
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
+    texts = json.load(f)
+
+ACTIVE_SET_KEY = "broadcast:active"
+JOB_KEY = "broadcast:{job_id}"
+# Завершенные рассылки хранятся неделю — для истории и отладки
+FINISHED_TTL = 7 * 24 * 3600
+
+RUNNING, DONE, CANCELLED = "running", "done", "cancelled"
+
+
+class BroadcastService:
+    """
+    Массовая рассылка всем пользователям.
+
+    Получатели читаются из users страницами по id (keyset pagination: WHERE id > last_id),
+    поэтому память не зависит от числа пользователей. Страница отправляется через
+    BULK-полосу MessageDispatcher, и следующая не читается, пока не разошлась текущая —
+    это и есть ограничение скорости и обратное давление.
+
+    После каждой страницы прогресс (last_id и счетчики) сохраняется в Redis-хэше,
+    а незавершенные рассылки продолжаются после перезапуска. Пользователи,
+    заблокировавшие бота или удалившие аккаунт, помечаются is_blocked и дальше пропускаются.
+    Страница, прерванная перезапуском, может быть отправлена повторно.
+    """
+
+    def __init__(self, page_size: int = 500, progress_interval: float = 3):
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+
+        self.redis: Redis | None = None
+        self._session_maker: async_sessionmaker | None = None
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def start(self, redis: Redis, session_maker: async_sessionmaker, resume: bool = True) -> None:
+        """
+        Продолжает рассылки, прерванные остановкой бота. При нескольких воркерах
+        resume включается только в одном — иначе рассылка продолжилась бы в каждом.
+        """
+        self.redis = redis
+        self._session_maker = session_maker
+        if not resume:
+            return
+        for job_id in await redis.smembers(ACTIVE_SET_KEY):
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            logging.info(f"Resuming broadcast {job_id}")
+            self._spawn(job_id)
+
+    async def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    async def create(self, text: str, admin_chat_id: int, message_id: int) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        async with self._session_maker() as session:
+            total = await Repository(session).count_broadcast_recipients()
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(JOB_KEY.format(job_id=job_id), mapping={
+                "text": text,
+                "admin_chat_id": admin_chat_id,
+                "message_id": message_id,
+                "status": RUNNING,
+                "last_id": 0,
+                "total": total,
+                "sent": 0,
+                "failed": 0,
+                "blocked": 0,
+            })
+            pipe.sadd(ACTIVE_SET_KEY, job_id)
+            await pipe.execute()
+        self._spawn(job_id)
+        return job_id
+
+    async def cancel(self, job_id: str) -> bool:
+        """Останавливает рассылку после текущей страницы."""
+        key = JOB_KEY.format(job_id=job_id)
+        if await self.redis.hget(key, "status") not in (RUNNING, RUNNING.encode()):
+            return False
+        await self.redis.hset(key, "status", CANCELLED)
+        return True
+
+    def _spawn(self, job_id: str) -> None:
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _load(self, job_id: str) -> dict[str, str]:
+        raw = await self.redis.hgetall(JOB_KEY.format(job_id=job_id))
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()
+        }
+
+    async def _run(self, job_id: str) -> None:
+        key = JOB_KEY.format(job_id=job_id)
+        try:
+            job = await self._load(job_id)
+            if not job:
+                await self.redis.srem(ACTIVE_SET_KEY, job_id)
+                return
+            text = job["text"]
+            last_id = int(job["last_id"])
+            last_report = 0.0
+
+            while True:
+                if (await self.redis.hget(key, "status")) in (CANCELLED, CANCELLED.encode()):
+                    break
+
+                async with self._session_maker() as session:
+                    recipients = await Repository(session).get_broadcast_recipients(after_id=last_id, limit=self.page_size)
+                if not recipients:
+                    await self.redis.hset(key, "status", DONE)
+                    break
+
+                futures = [message_dispatcher.send_message(tg_id, text, priority=Priority.BULK) for _, tg_id in recipients]
+                results = await asyncio.gather(*futures, return_exceptions=True)
+
+                sent, failed, blocked = 0, 0, []
+                for (_, tg_id), result in zip(recipients, results):
+                    if not isinstance(result, BaseException):
+                        sent += 1
+                    elif self._is_unreachable(result):
+                        blocked.append(tg_id)
+                    else:
+                        failed += 1
+
+                if blocked:
+                    async with self._session_maker() as session:
+                        await Repository(session).mark_users_blocked(blocked)
+                        await session.commit()
+                    await user_cache.invalidate(*blocked)
+
+                last_id = recipients[-1][0]
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.hset(key, "last_id", last_id)
+                    pipe.hincrby(key, "sent", sent)
+                    pipe.hincrby(key, "failed", failed)
+                    pipe.hincrby(key, "blocked", len(blocked))
+                    await pipe.execute()
+
+                if time.monotonic() - last_report >= self.progress_interval:
+                    await self._report(job_id)
+                    last_report = time.monotonic()
+
+            await self.redis.srem(ACTIVE_SET_KEY, job_id)
+            await self.redis.expire(key, FINISHED_TTL)
+            await self._report(job_id)
+        except asyncio.CancelledError:
+            # Остановка бота: рассылка остается в ACTIVE_SET_KEY и продолжится после запуска
+            raise
+        except Exception as e:
+            logging.error(f"Broadcast {job_id} failed, will resume on restart: {e}", exc_info=True)
+
+    @staticmethod
+    def _is_unreachable(error: BaseException) -> bool:
+        """Пользователь заблокировал бота, удалил аккаунт или чат недоступен."""
+        if isinstance(error, TelegramForbiddenError):
+            return True
+        return isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower()
+
+    async def _report(self, job_id: str) -> None:
+        job = await self._load(job_id)
+        processed = int(job["sent"]) + int(job["failed"]) + int(job["blocked"])
+        template = {
+            RUNNING: texts['admin_panel']['broadcast_progress'],
+            DONE: texts['admin_panel']['broadcast_done'],
+            CANCELLED: texts['admin_panel']['broadcast_cancelled'],
+        }[job["status"]]
+        text = template.format(
+            processed=processed, total=job["total"], sent=job["sent"], failed=job["failed"], blocked=job["blocked"]
+        )
+        markup = kb.get_broadcast_progress_keyboard(job_id) if job["status"] == RUNNING else kb.get_back_to_admin_menu_keyboard()
+        message_dispatcher.edit_message_text(int(job["admin_chat_id"]), int(job["message_id"]), text, reply_markup=markup)
+
+
+# Создаем один экземпляр сервиса для всего приложения
+broadcast_service = BroadcastService()
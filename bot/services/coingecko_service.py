@@ -1,26 +1,122 @@
 # bot/services/coingecko_service.py
 
-from pycoingecko import CoinGeckoAPI
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from bot.config import config
 
 
 class CoinGeckoService:
-    def __init__(self):
-        self.api = CoinGeckoAPI()
+    """
+    Асинхронный сервис курса TON/USD.
+
+    - Курс кэшируется на ttl секунд.
+    - Конкурентные обновления схлопываются в один HTTP-запрос (single-flight).
+    - Фоновая задача обновляет курс заранее, поэтому выплаты не ждут API.
+    - Если кэш устарел, но не старше max_stale, отдается старое значение,
+      а обновление запускается в фоне (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        ttl: float = 60,
+        max_stale: float = 900,
+        refresh_interval: float = 45,
+        timeout: float = 10,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_interval = refresh_interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self._rate: float | None = None
+        self._fetched_at: float = 0.0
+        self._inflight: asyncio.Future | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._refresher_task: asyncio.Task | None = None
 
-    def get_ton_to_usd_rate(self) -> float:
+    async def start(self) -> None:
+        """Запускает фоновое обновление курса (первый запрос — сразу)."""
+        self._refresher_task = asyncio.create_task(self._refresher())
+
+    async def stop(self) -> None:
+        if self._refresher_task:
+            self._refresher_task.cancel()
+            try:
+                await self._refresher_task
+            except asyncio.CancelledError:
+                pass
+            self._refresher_task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def get_ton_to_usd_rate(self) -> float:
         """
-        Получает текущий курс TON к USD.
-        Использует синхронную библиотеку, но для редких запросов это приемлемо.
-        Для высоконагруженных систем стоит использовать aiohttp.
+        Возвращает текущий курс TON к USD.
+        В случае недоступности API и отсутствия кэша возвращает 0.0.
         """
+        age = time.monotonic() - self._fetched_at
+        if self._rate is not None and age < self.ttl:
+            return self._rate
+
+        if self._rate is not None and age < self.max_stale:
+            # Отдаем устаревшее значение, обновляемся в фоне
+            self._start_refresh()
+            return self._rate
+
         try:
-            # Запрашиваем цену a 'the-open-network' в 'usd'
-            price_data = self.api.get_price(ids='the-open-network', vs_currencies='usd')
-            return price_data['the-open-network']['usd']
+            return await self._refresh()
         except Exception as e:
-            # В случае ошибки API возвращаем 0 или None и логируем ошибку
-            print(f"Error getting price from CoinGecko: {e}") # TODO: Заменить на logging
+            logging.error(f"Error getting price from CoinGecko: {e}")
             return 0.0
 
+    def _start_refresh(self) -> asyncio.Future:
+        """Запускает обновление, если оно еще не идет; все вызывающие получают один запрос."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    def _refresh(self) -> asyncio.Future:
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return asyncio.shield(self._start_refresh())
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            logging.warning(f"CoinGecko refresh failed: {future.exception()}")
+
+    async def _fetch(self) -> float:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+
+        params = {"ids": "the-open-network", "vs_currencies": "usd"}
+        async with self._session.get(f"{self.base_url}/simple/price", params=params) as response:
+            response.raise_for_status()
+            price_data = await response.json()
+
+        rate = float(price_data["the-open-network"]["usd"])
+        self._rate = rate
+        self._fetched_at = time.monotonic()
+        return rate
+
+    async def _refresher(self) -> None:
+        while True:
+            try:
+                await self._refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Уже залогировано в _log_failure, пробуем на следующем шаге
+                pass
+            await asyncio.sleep(self.refresh_interval)
+
+
 # Создаем один экземпляр сервиса для всего приложения
-coingecko_service = CoinGeckoService()
\ No newline at end of file
+coingecko_service = CoinGeckoService(base_url=config.coingecko_api_url)
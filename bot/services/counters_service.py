@@ -0,0 +1,53 @@
+# bot/services/counters_service.py
+
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.repository import Repository
+
+
+class CountersReconciler:
+    """
+    Периодически сверяет счетчики админ-панели с реальными таблицами.
+    В штатном режиме счетчики ведутся инкрементально в транзакциях репозитория,
+    сверка лишь исправляет возможный дрейф (ручные правки БД, старые данные).
+    """
+
+    def __init__(self, interval: float = 600):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self, session_maker: async_sessionmaker) -> None:
+        self._task = asyncio.create_task(self._run(session_maker))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def reconcile(self, session_maker: async_sessionmaker) -> None:
+        async with session_maker() as session:
+            repo = Repository(session)
+            actual = await repo.reconcile_counters()
+            await session.commit()
+        logging.info(f"Counters reconciled: {actual}")
+
+    async def _run(self, session_maker: async_sessionmaker) -> None:
+        while True:
+            try:
+                await self.reconcile(session_maker)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Counters reconciliation failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+# Создаем один экземпляр сервиса для всего приложения
+counters_reconciler = CountersReconciler()
@@ -0,0 +1,265 @@
+# bot/services/message_dispatcher.py
+
+import asyncio
+import collections
+import enum
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+
+class Priority(enum.IntEnum):
+    UI = 0  # правки админ-интерфейса
+    NOTIFY = 1  # уведомления пользователям о действиях администраторов
+    BULK = 2  # массовые рассылки
+
+
+@dataclass
+class Outgoing:
+    method: str
+    chat_id: int
+    priority: Priority
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    # Раньше этого момента (time.monotonic) сообщение не отправляется
+    not_before: float = 0.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 — уже доступен)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class MessageDispatcher:
+    """
+    Единая точка исходящих сообщений бота с учетом лимитов Telegram.
+
+    - Глобальный token bucket (по умолчанию 30 сообщений/с на бота).
+    - Token bucket на каждый чат (1 сообщение/с с небольшим запасом на всплеск).
+    - Полосы приоритетов: правки админ-интерфейса обгоняют уведомления,
+      уведомления обгоняют массовые рассылки. Чат, исчерпавший свой лимит,
+      не блокирует очередь — берется следующее сообщение в другой чат.
+    - На 429 отправка приостанавливается на retry_after, сообщение возвращается в начало очереди.
+    - Отложенные операции (delay) ждут своего времени в очереди, а не в хендлере:
+      временное сообщение, удаленное через пару секунд, не держит обработчик апдейтов.
+
+    send_message/edit_message_text/delete_message не ждут отправки и возвращают Future с результатом.
+    """
+
+    def __init__(
+        self,
+        rate: float = 30,
+        per_chat_rate: float = 1,
+        per_chat_burst: float = 3,
+        max_queue: int = 50_000,
+        max_attempts: int = 5,
+        scan_depth: int = 200,
+    ):
+        self.rate = rate
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        # Сколько сообщений полосы просматривается в поисках чата, не упершегося в лимит
+        self.scan_depth = scan_depth
+
+        self._bot: Bot | None = None
+        self._global = TokenBucket(rate, capacity=rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._lanes: dict[Priority, collections.deque[Outgoing]] = {p: collections.deque() for p in Priority}
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._counters = collections.Counter()
+
+    def start(self, bot: Bot, workers: int = 1) -> None:
+        """
+        workers — сколько процессов отправляют от имени бота, каждый со своим диспетчером.
+        Глобальный лимит делится между ними поровну; лимит на чат остается
+        на процесс, превышения ловит обработка 429.
+        """
+        self._bot = bot
+        self._global = TokenBucket(self.rate / workers, capacity=self.rate / workers)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 10) -> None:
+        """Дает очереди дослаться (не дольше drain_timeout) и останавливает отправку."""
+        deadline = time.monotonic() + drain_timeout
+        while self.queued() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        for lane in self._lanes.values():
+            while lane:
+                lane.popleft().future.cancel()
+
+    def send_message(self, chat_id: int, text: str, priority: Priority = Priority.NOTIFY, **kwargs) -> asyncio.Future:
+        return self.submit("send_message", chat_id, priority, text=text, **kwargs)
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, priority: Priority = Priority.UI, delay: float = 0, **kwargs
+    ) -> asyncio.Future:
+        return self.submit("edit_message_text", chat_id, priority, delay=delay, message_id=message_id, text=text, **kwargs)
+
+    def delete_message(self, chat_id: int, message_id: int, priority: Priority = Priority.UI, delay: float = 0) -> asyncio.Future:
+        return self.submit("delete_message", chat_id, priority, delay=delay, message_id=message_id)
+
+    def submit(self, method: str, chat_id: int, priority: Priority, delay: float = 0, **kwargs) -> asyncio.Future:
+        """delay — через сколько секунд выполнить операцию (0 — как только позволят лимиты)."""
+        future = asyncio.get_running_loop().create_future()
+        if self.queued() >= self.max_queue:
+            self._counters["rejected"] += 1
+            future.set_exception(asyncio.QueueFull())
+            return future
+        # Ошибка уже залогирована в _deliver; вызывающий может не ждать результат
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        item = Outgoing(method=method, chat_id=chat_id, priority=priority, kwargs=kwargs, future=future)
+        if delay > 0:
+            # Ожидание в stats() считается с момента, когда операцию можно выполнять
+            item.not_before = item.enqueued_at = time.monotonic() + delay
+        self._lanes[priority].append(item)
+        self._wakeup.set()
+        return future
+
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def stats(self) -> dict[str, Any]:
+        """Глубина очередей и счетчики — для метрик и мониторинга."""
+        now = time.monotonic()
+        return {
+            "queued": {p.name.lower(): len(lane) for p, lane in self._lanes.items()},
+            "oldest_wait_seconds": {
+                p.name.lower(): round(max(now - lane[0].enqueued_at, 0.0), 3) if lane else 0.0
+                for p, lane in self._lanes.items()
+            },
+            "in_flight": len(self._in_flight),
+            "paused_for": max(0.0, round(self._paused_until - now, 3)),
+            "tracked_chats": len(self._chats),
+            **{name: self._counters[name] for name in ("sent", "failed", "retried", "rejected")},
+        }
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, capacity=self.per_chat_burst)
+        return bucket
+
+    def _pick(self, now: float) -> tuple[Outgoing | None, float]:
+        """Следующее сообщение, которое можно отправить сейчас, или время ожидания до ближайшего."""
+        nearest = float("inf")
+        for priority in Priority:
+            lane = self._lanes[priority]
+            for index, item in enumerate(lane):
+                if index >= self.scan_depth:
+                    break
+                if item.not_before > now:
+                    nearest = min(nearest, item.not_before - now)
+                    continue
+                wait = self._chat_bucket(item.chat_id).wait_time(now)
+                if wait == 0:
+                    del lane[index]
+                    return item, 0.0
+                nearest = min(nearest, wait)
+        return None, nearest
+
+    def _forget_idle_chats(self, now: float) -> None:
+        if len(self._chats) > 10_000:
+            self._chats = {chat_id: b for chat_id, b in self._chats.items() if not b.is_full(now)}
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            wait = self._global.wait_time(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            self._wakeup.clear()
+            item, wait = self._pick(now)
+            if item is None:
+                self._forget_idle_chats(now)
+                timeout = None if wait == float("inf") else wait
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.take()
+            self._chat_bucket(item.chat_id).take()
+            task = asyncio.create_task(self._deliver(item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _deliver(self, item: Outgoing) -> None:
+        if item.future.cancelled():
+            return
+        item.attempts += 1
+        try:
+            result = await getattr(self._bot, item.method)(chat_id=item.chat_id, **item.kwargs)
+        except TelegramRetryAfter as e:
+            logging.warning(f"Telegram rate limit hit, pausing dispatcher for {e.retry_after}s")
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            if item.attempts < self.max_attempts:
+                self._counters["retried"] += 1
+                # Сообщение уже ждало дольше всех — возвращаем его в начало своей полосы
+                self._lanes[item.priority].appendleft(item)
+                self._wakeup.set()
+                return
+            self._fail(item, e)
+            return
+        except Exception as e:
+            self._fail(item, e)
+            return
+
+        self._counters["sent"] += 1
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def _fail(self, item: Outgoing, error: Exception) -> None:
+        self._counters["failed"] += 1
+        logging.warning(f"Could not {item.method} to chat {item.chat_id}: {error}")
+        if not item.future.done():
+            item.future.set_exception(error)
+
+
+# Создаем один экземпляр сервиса для всего приложения
+message_dispatcher = MessageDispatcher()
@@ -0,0 +1,188 @@
+# bot/services/metrics.py
+
+import asyncio
+import collections
+import contextvars
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from bot.db.repository import Repository, utc_now
+from bot.services.message_dispatcher import message_dispatcher
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Время работы хендлера", ["router", "handler"],
+)
+UPDATE_DB_QUERIES = Histogram(
+    "bot_update_db_queries", "Число SQL-запросов на один апдейт",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+UPDATE_DB_SECONDS = Histogram(
+    "bot_update_db_duration_seconds", "Суммарное время SQL-запросов на один апдейт",
+)
+DB_QUERY_SECONDS = Histogram(
+    "bot_db_query_duration_seconds", "Время одного SQL-запроса (включая фоновые задачи)",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+TELEGRAM_API_LATENCY = Histogram(
+    "bot_telegram_api_duration_seconds", "Время запроса к Bot API", ["method"],
+)
+TELEGRAM_API_ERRORS = Counter(
+    "bot_telegram_api_errors", "Ошибки Bot API по кодам", ["method", "code"],
+)
+
+
+@dataclass
+class DbStats:
+    queries: int = 0
+    duration: float = 0.0
+    # Хендлер, обработавший апдейт (заполняет HandlerMetricsMiddleware)
+    handler: str | None = None
+    # Повторы и время по тексту запроса; отпечаток считается только при выводе в лог
+    statements: collections.Counter = field(default_factory=collections.Counter)
+    statement_time: collections.defaultdict = field(default_factory=lambda: collections.defaultdict(float))
+
+
+_PLACEHOLDER_RE = re.compile(r"\$\d+|%\(\w+\)s")
+_PLACEHOLDER_LIST_RE = re.compile(r"\?(?:::\w+)?(?:\s*,\s*\?(?:::\w+)?)+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_fingerprint(statement: str, max_length: int = 300) -> str:
+    """Текст запроса без значений параметров: списки IN (...) любой длины сводятся к одному виду."""
+    fingerprint = _PLACEHOLDER_RE.sub("?", statement)
+    fingerprint = _PLACEHOLDER_LIST_RE.sub("?, ...", fingerprint)
+    fingerprint = _WHITESPACE_RE.sub(" ", fingerprint).strip()
+    return fingerprint if len(fingerprint) <= max_length else fingerprint[:max_length] + "…"
+
+
+# Статистика запросов текущего апдейта; None вне обработки апдейта (фоновые сервисы)
+current_db_stats: contextvars.ContextVar[DbStats | None] = contextvars.ContextVar("current_db_stats", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Считает время каждого запроса: два обработчика событий движка, без обращений к сети."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.duration += elapsed
+            stats.statements[statement] += 1
+            stats.statement_time[statement] += elapsed
+
+
+class DbStatsLogFilter(logging.Filter):
+    """Добавляет к записям лога, сделанным во время апдейта, число и время его SQL-запросов (поле db_stats)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stats = current_db_stats.get()
+        record.db_stats = f" [db: {stats.queries} q, {stats.duration * 1000:.1f} ms]" if stats else ""
+        return True
+
+
+class BotStateCollector:
+    """
+    Метрики состояния, снимаемые в момент запроса /metrics: очереди и пул соединений.
+
+    Очереди в БД читаются одним запросом не чаще раза в cache_ttl секунд,
+    поэтому частый опрос Prometheus не нагружает базу. Очереди в памяти
+    (исходящие сообщения, входящие апдейты) и пул — свои у каждого процесса.
+    """
+
+    def __init__(self, engine: AsyncEngine, session_maker: async_sessionmaker, update_handler: Any = None, cache_ttl: float = 15):
+        self.engine = engine
+        self.session_maker = session_maker
+        self.update_handler = update_handler
+        self.cache_ttl = cache_ttl
+
+        self._queues: dict[str, tuple[int, Any]] = {}
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            if time.monotonic() - self._refreshed_at < self.cache_ttl:
+                return
+            try:
+                async with self.session_maker() as session:
+                    self._queues = await Repository(session).get_queue_metrics()
+            except Exception as e:
+                # Отдаем прошлые значения, а не ошибку скрейпа
+                logging.warning(f"Could not refresh queue metrics: {e}")
+            self._refreshed_at = time.monotonic()
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        depth = GaugeMetricFamily("bot_queue_depth", "Элементов в очереди", labels=["queue"])
+        oldest = GaugeMetricFamily("bot_queue_oldest_age_seconds", "Возраст самого старого элемента очереди", labels=["queue"])
+
+        now = utc_now()
+        for name, (size, oldest_at) in self._queues.items():
+            depth.add_metric([name], size)
+            oldest.add_metric([name], max(0.0, (now - oldest_at).total_seconds()) if oldest_at else 0.0)
+
+        outgoing = message_dispatcher.stats()
+        depth.add_metric(["telegram_outgoing"], sum(outgoing["queued"].values()))
+        oldest.add_metric(["telegram_outgoing"], max(outgoing["oldest_wait_seconds"].values()))
+        if self.update_handler is not None:
+            incoming = self.update_handler.stats()
+            depth.add_metric(["updates"], incoming["queued"])
+            oldest.add_metric(["updates"], incoming["oldest_wait_seconds"])
+        yield depth
+        yield oldest
+
+        pool = self.engine.pool
+        yield GaugeMetricFamily("bot_db_pool_size", "Размер пула соединений", value=pool.size())
+        yield GaugeMetricFamily("bot_db_pool_checked_out", "Соединений выдано из пула", value=pool.checkedout())
+        yield GaugeMetricFamily("bot_db_pool_overflow", "Соединений сверх pool_size", value=max(pool.overflow(), 0))
+
+
+def setup_metrics(
+    app: web.Application,
+    engine: AsyncEngine,
+    session_maker: async_sessionmaker,
+    update_handler: Any = None,
+    path: str = "/metrics",
+    token: str | None = None,
+) -> None:
+    """
+    Подключает /metrics к приложению. При нескольких воркерах задайте PROMETHEUS_MULTIPROC_DIR:
+    гистограммы и счетчики всех процессов тогда суммируются, а метрики состояния
+    отдает воркер, обслуживший запрос.
+    """
+    instrument_engine(engine)
+    collector = BotStateCollector(engine, session_maker, update_handler)
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    registry.register(collector)
+
+    async def metrics_handler(request: web.Request) -> web.Response:
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return web.Response(body="Unauthorized", status=401)
+        await collector.refresh()
+        return web.Response(body=generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    app.router.add_get(path, metrics_handler)
@@ -0,0 +1,154 @@
+# bot/services/outbox_relay.py
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.models import OutboxMessage
+from bot.db.repository import Repository
+from bot.services.message_dispatcher import message_dispatcher, Priority
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
+    texts = json.load(f)
+
+
+class OutboxRelay:
+    """
+    Доставка уведомлений из таблицы outbox.
+
+    Хендлеры пишут уведомление в той же транзакции, что и изменение состояния,
+    и после коммита лишь будят релей. Релей арендует пачку строк (locked_until),
+    отправляет их через MessageDispatcher и удаляет отправленные по мере отправки
+    (не позже чем через flush_interval), продлевая аренду тех, что еще в очереди.
+    Временные ошибки повторяются после истечения аренды, постоянные
+    (бот заблокирован, чат не найден) и исчерпавшие попытки — удаляются,
+    администратор из alert_chat_id получает предупреждение.
+    Повторная отправка возможна только при падении между отправкой и удалением строки
+    (окно — flush_interval).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        lease_seconds: int = 60,
+        max_attempts: int = 5,
+        poll_interval: float = 5,
+        flush_interval: float = 1,
+    ):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+
+        self._session_maker: async_sessionmaker | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def start(self, session_maker: async_sessionmaker) -> None:
+        self._session_maker = session_maker
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 15) -> None:
+        """Дает дослать текущую пачку, чтобы ее строки не остались арендованными и не ушли повторно."""
+        if self._task:
+            self._stopping = True
+            self.wake()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """Вызывается после коммита, в котором были записаны уведомления."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                if await self.relay_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Outbox relay iteration failed: {e}", exc_info=True)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def relay_once(self) -> int:
+        """Отправляет одну пачку. Возвращает число взятых строк (0 — outbox пуст)."""
+        async with self._session_maker() as session:
+            messages = await Repository(session).claim_outbox(self.batch_size, self.lease_seconds)
+            await session.commit()
+        if not messages:
+            return 0
+
+        # Пачка может отправляться дольше аренды (лимит на чат, retry_after),
+        # поэтому строки удаляются по мере отправки, а аренда оставшихся продлевается
+        pending = {message.id: message for message in messages}
+        resolved: list[int] = []
+        bookkeeping = asyncio.create_task(self._keep_leases(pending, resolved))
+        try:
+            await asyncio.gather(*(self._deliver(message, pending, resolved) for message in messages))
+        finally:
+            bookkeeping.cancel()
+            await asyncio.gather(bookkeeping, return_exceptions=True)
+            await self._flush(resolved)
+        return len(messages)
+
+    async def _deliver(self, message: OutboxMessage, pending: dict[int, OutboxMessage], resolved: list[int]) -> None:
+        try:
+            await message_dispatcher.send_message(message.chat_id, message.text)
+        except Exception as error:
+            if not isinstance(error, (TelegramForbiddenError, TelegramBadRequest)) and message.attempts < self.max_attempts:
+                # Строка останется в outbox и будет взята снова после истечения аренды
+                pending.pop(message.id, None)
+                return
+            logging.warning(f"Dropping outbox message #{message.id} to {message.chat_id}: {error}")
+            if message.alert_chat_id is not None:
+                message_dispatcher.send_message(
+                    message.alert_chat_id, texts['admin_panel']['error_notify_user_alert'].format(error=error), priority=Priority.UI
+                )
+        pending.pop(message.id, None)
+        resolved.append(message.id)
+
+    async def _keep_leases(self, pending: dict[int, OutboxMessage], resolved: list[int]) -> None:
+        """Раз в flush_interval удаляет отправленные строки, раз в треть аренды продлевает ее неотправленным."""
+        loop = asyncio.get_running_loop()
+        renew_at = loop.time() + self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush(resolved)
+                if loop.time() >= renew_at and pending:
+                    async with self._session_maker() as session:
+                        await Repository(session).extend_outbox_lease(list(pending), self.lease_seconds)
+                        await session.commit()
+                    renew_at = loop.time() + self.lease_seconds / 3
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Outbox relay bookkeeping failed: {e}", exc_info=True)
+
+    async def _flush(self, resolved: list[int]) -> None:
+        if not resolved:
+            return
+        message_ids = resolved[:]
+        async with self._session_maker() as session:
+            await Repository(session).delete_outbox(message_ids)
+            await session.commit()
+        del resolved[:len(message_ids)]
+
+# Создаем один экземпляр сервиса для всего приложения
+outbox_relay = OutboxRelay()
@@ -0,0 +1,215 @@
+# bot/services/payout_worker.py
+
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.config import config
+from bot.db.models import PayoutJob, PayoutJobStatus
+from bot.db.repository import Repository, PAYOUT_QUEUED_BATCH
+from bot.keyboards import admin_keyboards as kb
+from bot.services.coingecko_service import coingecko_service
+from bot.services.message_dispatcher import message_dispatcher
+from bot.services.outbox_relay import outbox_relay
+from bot.services.ton_service import ton_service, PayoutTransfer, payout_comment
+from bot.services.user_cache import user_cache
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
+    texts = json.load(f)
+
+# Итог обработки задания в текущем проходе (для сообщения администратору)
+SENT, RETRY, CANCELLED, UNKNOWN = "sent", "retry", "cancelled", "unknown"
+
+
+class PayoutWorker:
+    """
+    Фоновая отправка выплат из очереди payout_jobs.
+
+    Хендлер администратора только ставит задание в очередь и сразу отвечает.
+    Воркер забирает задания пачками (SKIP LOCKED), отправляет их одной пачкой
+    через TonService.send_batch, повторяет неотправленные с экспоненциальной
+    задержкой, а после max_attempts отменяет выплату с возвратом средств.
+    Результат показывается в сообщении администратора. Пользователя уведомляет
+    TxTracker, когда транзакция найдена в блокчейне.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 2,
+        batch_size: int = 100,
+        max_attempts: int = 3,
+        retry_delay: float = 60,
+        poll_interval: float = 5,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+
+        self._session_maker: async_sessionmaker | None = None
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self, session_maker: async_sessionmaker) -> None:
+        self._session_maker = session_maker
+        await self._recover_interrupted()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Вызывается после коммита новых заданий, чтобы не ждать poll_interval."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self._session_maker() as session:
+                    jobs = await Repository(session).claim_payout_jobs(self.batch_size)
+                    await session.commit()
+                if jobs:
+                    await self._process(jobs)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Payout worker iteration failed: {e}", exc_info=True)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _recover_interrupted(self) -> None:
+        async with self._session_maker() as session:
+            jobs = await Repository(session).fail_interrupted_payout_jobs()
+            await session.commit()
+        for job in jobs:
+            logging.error(f"Payout job #{job.id} (payout #{job.payout_id}) was interrupted mid-send")
+            message_dispatcher.send_message(job.admin_tg_id, texts['admin_panel']['payout_uncertain_admin'].format(payout_id=job.payout_id))
+
+    async def _process(self, jobs: list[PayoutJob]) -> None:
+        outcomes: dict[int, str] = {}
+        rate = await coingecko_service.get_ton_to_usd_rate()
+        if rate <= 0:
+            outcomes.update(await self._retry_or_cancel(jobs, "TON rate unavailable"))
+            await self._report(jobs, outcomes)
+            return
+
+        batch_id = uuid.uuid4().hex
+        async with self._session_maker() as session:
+            await Repository(session).set_payouts_batch([job.payout_id for job in jobs], batch_id)
+            await session.commit()
+
+        result = await ton_service.send_batch([
+            PayoutTransfer(
+                payout_id=job.payout_id,
+                address=job.payout.wallet,
+                amount_ton=job.payout.amount / rate,
+                comment=payout_comment(job.payout_id),
+            )
+            for job in jobs
+        ])
+        jobs_by_payout = {job.payout_id: job for job in jobs}
+        sent = [jobs_by_payout[payout_id] for payout_id in result.sent]
+        failed = [jobs_by_payout[payout_id] for payout_id in result.failed]
+        unknown = [jobs_by_payout[payout_id] for payout_id in result.unknown]
+
+        async with self._session_maker() as session:
+            repo = Repository(session)
+            by_admin = lambda job: job.admin_tg_id
+            for admin_tg_id, group in itertools.groupby(sorted(sent, key=by_admin), key=by_admin):
+                await repo.confirm_payout_batch([job.payout_id for job in group], admin_tg_id=admin_tg_id)
+            await repo.finish_payout_jobs([job.id for job in sent], PayoutJobStatus.DONE)
+            # Выплата остается помеченной пачкой до вердикта TxTracker: повторять ее до этого нельзя
+            await repo.finish_payout_jobs([job.id for job in unknown], PayoutJobStatus.FAILED, "delivery unknown")
+            await session.commit()
+
+        outcomes.update({job.id: SENT for job in sent})
+        outcomes.update({job.id: UNKNOWN for job in unknown})
+        outcomes.update(await self._retry_or_cancel(failed, "transfer failed"))
+
+        for job in unknown:
+            message_dispatcher.send_message(job.admin_tg_id, texts['admin_panel']['payout_uncertain_admin'].format(payout_id=job.payout_id))
+        await self._report(jobs, outcomes)
+
+    async def _retry_or_cancel(self, jobs: list[PayoutJob], error: str) -> dict[int, str]:
+        """Точно не отправленные выплаты: повтор с задержкой или, после max_attempts, отмена с возвратом."""
+        outcomes: dict[int, str] = {}
+        if not jobs:
+            return outcomes
+        retry = [job for job in jobs if job.attempts < self.max_attempts]
+        give_up = [job for job in jobs if job.attempts >= self.max_attempts]
+
+        async with self._session_maker() as session:
+            repo = Repository(session)
+            await repo.set_payouts_batch([job.payout_id for job in retry], PAYOUT_QUEUED_BATCH)
+            for job in retry:
+                await repo.retry_payout_jobs([job.id], self.retry_delay * 2 ** (job.attempts - 1), error)
+                outcomes[job.id] = RETRY
+
+            await repo.release_payouts([job.payout_id for job in give_up])
+            cancelled, stuck = [], []
+            for job in give_up:
+                try:
+                    await repo.cancel_payout(job.payout_id, admin_tg_id=job.admin_tg_id)
+                except ValueError as e:
+                    # Выплату уже обработали вручную — задание закрываем, остальные отменяем как обычно
+                    logging.error(f"Could not cancel payout #{job.payout_id} of job #{job.id}: {e}")
+                    stuck.append(job)
+                    outcomes[job.id] = UNKNOWN
+                    continue
+                await repo.enqueue_notification(job.payout.user.tg_id, texts['user_notifications']['payout_failed_user'])
+                cancelled.append(job)
+                outcomes[job.id] = CANCELLED
+            await repo.finish_payout_jobs([job.id for job in cancelled], PayoutJobStatus.FAILED, error)
+            await repo.finish_payout_jobs([job.id for job in stuck], PayoutJobStatus.FAILED, f"{error}; cancel failed")
+            await session.commit()
+
+        if cancelled:
+            outbox_relay.wake()
+            # Отмена вернула суммы на балансы
+            await user_cache.invalidate(*(job.payout.user.tg_id for job in cancelled))
+        return outcomes
+
+    async def _report(self, jobs: list[PayoutJob], outcomes: dict[int, str]) -> None:
+        """Обновляет сообщения администраторов, из которых были поставлены задания."""
+        messages = {(job.chat_id, job.message_id): job for job in jobs}
+        for (chat_id, message_id), job in messages.items():
+            async with self._session_maker() as session:
+                progress = await Repository(session).get_payout_jobs_progress(chat_id, message_id)
+
+            if sum(progress.values()) == 1:
+                text = {
+                    SENT: texts['admin_panel']['payout_confirmed_admin'],
+                    RETRY: texts['admin_panel']['payout_retry_admin'],
+                    CANCELLED: texts['admin_panel']['payout_error_tx_admin'],
+                    UNKNOWN: texts['admin_panel']['payout_uncertain_admin'].format(payout_id=job.payout_id),
+                }[outcomes[job.id]]
+            else:
+                text = texts['admin_panel']['payout_batch_progress'].format(
+                    done=progress.get(PayoutJobStatus.DONE, 0),
+                    failed=progress.get(PayoutJobStatus.FAILED, 0),
+                    pending=progress.get(PayoutJobStatus.QUEUED, 0) + progress.get(PayoutJobStatus.RUNNING, 0),
+                )
+            message_dispatcher.edit_message_text(chat_id, message_id, text, reply_markup=kb.get_back_to_admin_menu_keyboard())
+
+
+# Создаем один экземпляр сервиса для всего приложения
+payout_worker = PayoutWorker(
+    concurrency=config.payout_worker_concurrency,
+    batch_size=config.payout_batch_size,
+    max_attempts=config.payout_max_attempts,
+)
@@ -2,13 +2,169 @@
 
 import asyncio
 import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
 from pytoniq import LiteClient, WalletV3R2, WalletV4R2, WalletV5R1, ShardAccount
+from pytoniq_core import Address
 
 from bot.config import config
 
+
+# Через сколько секунд неотправленное внешнее сообщение кошелька протухает (valid_until)
+MESSAGE_TTL = 60
+
+# Сколько внутренних сообщений версия кошелька принимает в одном внешнем
+MAX_MESSAGES_PER_TRANSFER = {
+    WalletV5R1: 255,
+    WalletV4R2: 4,
+    WalletV3R2: 4,
+}
+
+
+def mainnet_client_factory() -> LiteClient:
+    return LiteClient.from_mainnet_config(trust_level=2, timeout=20)
+
+
+async def mainnet_wallet_factory(client: LiteClient, mnemonics: list[str]) -> WalletV5R1:
+    return await WalletV5R1.from_mnemonic(provider=client, mnemonics=mnemonics, network_global_id=-239)
+
+
+def payout_comment(payout_id: int) -> str:
+    """Комментарий перевода; по нему выплату можно найти в блокчейне."""
+    return f"Rocky Clips Payout #{payout_id}"
+
+
+@dataclass
+class PayoutTransfer:
+    payout_id: int
+    address: str
+    amount_ton: float
+    comment: str
+
+
+@dataclass
+class WalletTransaction:
+    """Исходящая транзакция горячего кошелька в том виде, в каком ее разбирает TxTracker."""
+    lt: int
+    hash: str
+    utime: int
+    comments: list[str]
+    prev_lt: int
+    prev_hash: bytes
+
+
+@dataclass
+class BatchResult:
+    sent: list[int] = field(default_factory=list)
+    # Точно не ушли в сеть — можно повторить
+    failed: list[int] = field(default_factory=list)
+    # Судьба неизвестна (сеть недоступна) — повторять нельзя, нужна ручная проверка
+    unknown: list[int] = field(default_factory=list)
+
+
 class TonService:
-    def __init__(self, mnemonics: list[str]):
+    """
+    Отправка TON с горячего кошелька.
+
+    Держит одно долгоживущее соединение LiteClient и готовый объект кошелька:
+    handshake и вывод ключей из мнемоники выполняются один раз, а не на каждую выплату.
+    Соединение проверяется перед использованием (не чаще health_check_interval)
+    и переподключается с экспоненциальной задержкой.
+    Провайдер подменяется через client_factory и wallet_factory — например, фейковой
+    цепочкой из benchmarks/simulate_ton_service.py.
+    """
+
+    def __init__(
+        self,
+        mnemonics: list[str],
+        client_factory: Callable[[], Any] = mainnet_client_factory,
+        wallet_factory: Callable[[Any, list[str]], Awaitable[Any]] = mainnet_wallet_factory,
+        health_check_interval: float = 30,
+        connect_attempts: int = 5,
+        max_backoff: float = 30,
+        seqno_poll_interval: float = 2,
+        message_ttl: float = MESSAGE_TTL,
+    ):
         self.mnemonics = mnemonics
+        self.client_factory = client_factory
+        self.wallet_factory = wallet_factory
+        self.health_check_interval = health_check_interval
+        self.connect_attempts = connect_attempts
+        self.max_backoff = max_backoff
+        self.seqno_poll_interval = seqno_poll_interval
+        self.message_ttl = message_ttl
+
+        self._client: LiteClient | None = None
+        self._wallet: WalletV5R1 | None = None
+        # Отдельное соединение для чтения истории: отправки держат _lock подолгу
+        self._reader: LiteClient | None = None
+        self._reader_lock = asyncio.Lock()
+        self._last_health_check = 0.0
+        # Отправки идут строго по одной: у кошелька один seqno
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Заранее поднимает соединение и кошелек, чтобы первая выплата не ждала handshake."""
+        async with self._lock:
+            try:
+                await self._ensure_wallet()
+            except Exception as e:
+                logging.warning(f"TON client warm-up failed, will retry on first payout: {e}")
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._drop_client()
+        async with self._reader_lock:
+            if self._reader is not None:
+                try: await self._reader.close()
+                except Exception: pass
+                self._reader = None
+
+    async def _connect(self) -> LiteClient:
+        delay = 1.0
+        for attempt in range(1, self.connect_attempts + 1):
+            client = self.client_factory()
+            try:
+                await client.connect()
+                await client.get_masterchain_info()
+                return client
+            except Exception as e:
+                logging.warning(f"TON client connect attempt {attempt} failed: {e}")
+                try: await client.close()
+                except Exception: pass
+                if attempt < self.connect_attempts:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+        raise ConnectionError("Could not connect to TON liteserver")
+
+    async def _drop_client(self) -> None:
+        if self._client is not None:
+            try: await self._client.close()
+            except Exception: pass
+            self._client = None
+
+    async def _ensure_wallet(self) -> WalletV5R1:
+        """Возвращает кошелек с живым соединением, при необходимости переподключаясь."""
+        now = time.monotonic()
+        if self._client is not None and now - self._last_health_check > self.health_check_interval:
+            try:
+                await self._client.get_masterchain_info()
+                self._last_health_check = now
+            except Exception as e:
+                logging.warning(f"TON client health check failed, reconnecting: {e}")
+                await self._drop_client()
+
+        if self._client is None:
+            self._client = await self._connect()
+            self._last_health_check = time.monotonic()
+            if self._wallet is None:
+                self._wallet = await self.wallet_factory(self._client, self.mnemonics)
+            else:
+                # Ключи уже выведены — достаточно пересадить кошелек на новое соединение
+                self._wallet.provider = self._client
+        return self._wallet
 
     async def get_account_state(self, client: LiteClient, address: str) -> ShardAccount | None:
         try:
@@ -18,51 +174,166 @@ class TonService:
             logging.error(f"Could not get account state for {address}: {e}")
             return None
 
-    async def send_transaction(self, to_address: str, amount_ton: float, comment: str = "") -> str | None:
-        client = None
-        try:
-            client = LiteClient.from_mainnet_config(trust_level=2, timeout=20)
-            await client.connect()
-            await client.get_masterchain_info()
-
-            wallet = await WalletV5R1.from_mnemonic(provider=client, mnemonics=self.mnemonics, network_global_id=-239)
-
-            state = await self.get_account_state(client, wallet.address)
-            balance = state.balance if state and hasattr(state, 'balance') else 0
-            seqno_for_log = state.seqno if state and hasattr(state, 'seqno') else 0
-            
-            friendly_address = wallet.address.to_str(is_user_friendly=True, is_bounceable=True)
-            logging.info(f"Using {wallet.__class__.__name__}. Wallet address: {friendly_address}. Balance: {balance / 1e9} TON. Seqno: {seqno_for_log}")
-
-            amount_nanotons = int(amount_ton * 1e9)
-            if balance < amount_nanotons:
-                logging.error(f"Insufficient balance for transaction. Needed: {amount_ton}, have: {balance / 1e9}")
-                await client.close()
-                return None
+    async def _wait_for_seqno(self, wallet: WalletV5R1, seqno_before: int) -> bool:
+        """Ждет, пока сообщение примется сетью, чтобы следующая отправка не повторила seqno."""
+        timeout = self.message_ttl
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.seqno_poll_interval)
+            try:
+                if await wallet.get_seqno() > seqno_before:
+                    return True
+            except Exception as e:
+                logging.warning(f"Could not read wallet seqno: {e}")
+        logging.warning(f"Wallet seqno did not advance past {seqno_before} within {timeout}s")
+        return False
 
-            tx_result = await wallet.transfer(
-                destination=to_address,
-                amount=amount_nanotons,
-                body=comment
-            )
-            
-            await client.close()
-
-            # --- ФИНАЛЬНОЕ ИСПРАВЛЕНИЕ ---
-            # Функция больше не возвращает объект с хэшем.
-            # Мы не можем получить хэш напрямую, но можем вернуть "success"
-            # для индикации успешной отправки в сеть.
-            # Хэш можно будет найти в обозревателе блокчейна по адресу кошелька.
-            # В реальном проекте, для получения хэша, нужен более сложный мониторинг.
-            logging.info(f"Transaction sent to network. Result: {tx_result}")
-            return "success" # Возвращаем "success" вместо хэша
-            # ---------------------------
+    async def _landed_after_failure(self, seqno_before: int) -> bool | None:
+        """
+        После ошибки отправки выясняет, приняла ли сеть сообщение с seqno_before.
+        Ждет до message_ttl: позже сообщение уже не может быть принято.
+        None — состояние кошелька прочитать не удалось.
+        """
+        deadline = time.monotonic() + self.message_ttl + 5 * self.seqno_poll_interval
+        readable = False
+        while time.monotonic() < deadline:
+            try:
+                wallet = await self._ensure_wallet()
+                if await wallet.get_seqno() > seqno_before:
+                    return True
+                readable = True
+            except Exception as e:
+                logging.warning(f"Could not read wallet seqno after failed transfer: {e}")
+                await self._drop_client()
+            await asyncio.sleep(2.5 * self.seqno_poll_interval)
+        return False if readable else None
 
-        except Exception as e:
-            logging.error(f"Transaction failed: {e}", exc_info=True)
-            if client:
-                try: await client.close()
+    async def get_outgoing_transactions(self, limit: int, from_lt: int | None = None, from_hash: bytes | None = None) -> list[WalletTransaction]:
+        """
+        Страница транзакций горячего кошелька, от новых к старым.
+        Следующую страницу запрашивают с prev_lt/prev_hash последней транзакции.
+        """
+        if self._wallet is None:
+            async with self._lock:
+                await self._ensure_wallet()
+
+        async with self._reader_lock:
+            if self._reader is None:
+                self._reader = await self._connect()
+            try:
+                transactions = await self._reader.get_transactions(
+                    address=self._wallet.address, count=limit, from_lt=from_lt, from_hash=from_hash
+                )
+            except Exception:
+                try: await self._reader.close()
                 except Exception: pass
+                self._reader = None
+                raise
+
+        return [
+            WalletTransaction(
+                lt=tx.lt,
+                hash=tx.cell.hash.hex(),
+                utime=tx.now,
+                comments=[comment for comment in map(self._parse_comment, tx.out_msgs) if comment is not None],
+                prev_lt=tx.prev_trans_lt,
+                prev_hash=tx.prev_trans_hash,
+            )
+            for tx in transactions
+        ]
+
+    @staticmethod
+    def _parse_comment(message) -> str | None:
+        """Текстовый комментарий исходящего сообщения (op = 0), если он есть."""
+        try:
+            body = message.body.begin_parse()
+            if body.remaining_bits < 32 or body.load_uint(32) != 0:
+                return None
+            return body.load_snake_string()
+        except Exception:
             return None
 
-ton_service = TonService(mnemonics=config.wallet_mnemonic.get_secret_value().split())
\ No newline at end of file
+    async def send_batch(self, transfers: list[PayoutTransfer]) -> BatchResult:
+        """
+        Отправляет несколько выплат минимальным числом внешних сообщений:
+        в одно сообщение упаковывается столько переводов, сколько позволяет версия кошелька.
+        Неудача затрагивает только выплаты своего сообщения: в failed — если сообщение
+        точно не принято сетью, в unknown — если это не удалось проверить.
+        """
+        result = BatchResult()
+        valid: list[PayoutTransfer] = []
+        for transfer in transfers:
+            try:
+                Address(transfer.address)
+                valid.append(transfer)
+            except Exception as e:
+                logging.error(f"Invalid address in payout #{transfer.payout_id}: {transfer.address} ({e})")
+                result.failed.append(transfer.payout_id)
+        if not valid:
+            return result
+
+        async with self._lock:
+            try:
+                wallet = await self._ensure_wallet()
+                state = await self.get_account_state(self._client, wallet.address)
+                balance = state.balance if state and hasattr(state, 'balance') else 0
+            except Exception as e:
+                logging.error(f"Batch payout aborted before sending: {e}", exc_info=True)
+                await self._drop_client()
+                result.failed.extend(t.payout_id for t in valid)
+                return result
+
+            chunk_size = MAX_MESSAGES_PER_TRANSFER.get(type(wallet), 1)
+            for start in range(0, len(valid), chunk_size):
+                chunk = valid[start:start + chunk_size]
+                chunk_ids = [t.payout_id for t in chunk]
+                amounts = [int(t.amount_ton * 1e9) for t in chunk]
+                seqno = None
+
+                # Пачка не дробится по балансу: лучше вернуть ее в очередь целиком
+                if sum(amounts) > balance:
+                    logging.error(f"Insufficient balance for payouts {chunk_ids}. Needed: {sum(amounts) / 1e9}, have: {balance / 1e9}")
+                    result.failed.extend(chunk_ids)
+                    continue
+
+                try:
+                    wallet = await self._ensure_wallet()
+                    seqno = await wallet.get_seqno()
+                    messages = [
+                        wallet.create_wallet_internal_message(
+                            destination=Address(t.address),
+                            value=amount,
+                            body=t.comment,
+                        )
+                        for t, amount in zip(chunk, amounts)
+                    ]
+                    # valid_until задаем сами: по умолчанию pytoniq при seqno 0 ставит 2**32-1,
+                    # и тогда отказ от сообщения по истечении message_ttl ничего не гарантирует
+                    transfer_msg = wallet.raw_create_transfer_msg(
+                        private_key=wallet.private_key,
+                        seqno=seqno,
+                        wallet_id=wallet.wallet_id,
+                        messages=messages,
+                        valid_until=int(time.time()) + int(self.message_ttl),
+                    )
+                    await wallet.send_external(body=transfer_msg)
+                    logging.info(f"Batch transfer with {len(messages)} payouts sent. Seqno: {seqno}")
+                    if not await self._wait_for_seqno(wallet, seqno):
+                        raise TimeoutError(f"Seqno {seqno} was not confirmed")
+                    balance -= sum(amounts)
+                    result.sent.extend(chunk_ids)
+                except Exception as e:
+                    logging.error(f"Batch transfer for payouts {chunk_ids} failed: {e}", exc_info=True)
+                    await self._drop_client()
+                    landed = False if seqno is None else await self._landed_after_failure(seqno)
+                    if landed:
+                        balance -= sum(amounts)
+                        result.sent.extend(chunk_ids)
+                    elif landed is None:
+                        result.unknown.extend(chunk_ids)
+                    else:
+                        result.failed.extend(chunk_ids)
+        return result
+
+
+ton_service = TonService(mnemonics=config.wallet_mnemonic.get_secret_value().split())
@@ -0,0 +1,189 @@
+# bot/services/tx_tracker.py
+
+import asyncio
+import datetime
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.config import config
+from bot.db.models import PayoutJobStatus
+from bot.db.repository import Repository, utc_now
+from bot.services.message_dispatcher import message_dispatcher
+from bot.services.outbox_relay import outbox_relay
+from bot.services.ton_service import ton_service, WalletTransaction
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+with open(BASE_DIR / 'texts.json', 'r', encoding='utf-8') as f:
+    texts = json.load(f)
+
+# Комментарий перевода, см. ton_service.payout_comment
+PAYOUT_COMMENT_RE = re.compile(r"Payout #(\d+)")
+
+# (limit, from_lt, from_hash) -> страница транзакций кошелька от новых к старым
+FetchTransactions = Callable[[int, int | None, bytes | None], Awaitable[list[WalletTransaction]]]
+
+
+class TxTracker:
+    """
+    Подтверждение выплат по блокчейну.
+
+    Один поллер на все отправленные выплаты: за проход читается история
+    горячего кошелька постранично (только за период, пока есть неподтвержденные
+    выплаты), исходящие сообщения сопоставляются с выплатами по комментарию,
+    и найденные хэши записываются одним запросом. Выплаты из прохода, не найденные
+    за missing_after, помечаются tx_missing, администраторы получают уведомление;
+    если проход уперся в max_pages и не дошел до их отправки, они ждут следующего.
+
+    Тем же проходом разрешаются выплаты, отправка которых закончилась неизвестным
+    исходом (задание прервано или "delivery unknown"): найденная в блокчейне
+    закрывается как выплаченная, а не найденная спустя missing_after после конца
+    попытки — сообщение к тому времени уже протухло (valid_until) — снимается
+    с пачки и возвращается в очередь, где ее можно отправить снова или отменить.
+
+    Источник транзакций подменяется через fetch — например, симулированной цепочкой.
+    """
+
+    def __init__(
+        self,
+        fetch: FetchTransactions = ton_service.get_outgoing_transactions,
+        interval: float = 15,
+        page_size: int = 50,
+        max_pages: int = 20,
+        batch_size: int = 500,
+        missing_after: float = 900,
+        clock_skew: float = 300,
+    ):
+        self.fetch = fetch
+        self.interval = interval
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.batch_size = batch_size
+        self.missing_after = missing_after
+        # Запас назад от sent_at: транзакция попадает в блок раньше, чем выплата помечается отправленной
+        self.clock_skew = clock_skew
+
+        self._session_maker: async_sessionmaker | None = None
+        self._task: asyncio.Task | None = None
+
+    def bind(self, session_maker: async_sessionmaker) -> None:
+        """Подключает БД без запуска фонового опроса (poll_once можно вызывать вручную)."""
+        self._session_maker = session_maker
+
+    def start(self, session_maker: async_sessionmaker) -> None:
+        self.bind(session_maker)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def poll_once(self) -> tuple[list[int], list[int]]:
+        """Один проход. Возвращает (подтвержденные, ненайденные) id выплат."""
+        async with self._session_maker() as session:
+            repo = Repository(session)
+            payouts = await repo.get_unconfirmed_payouts(self.batch_size)
+            unresolved = await repo.get_unresolved_payout_jobs(self.batch_size)
+        if not payouts and not unresolved:
+            return [], []
+
+        wanted = {payout.id: payout for payout in payouts}
+        # Выплаты с неизвестным исходом ищутся с начала последней попытки отправки
+        unresolved_jobs = {job.payout_id: job for job in unresolved}
+        oldest_sent = min([payout.sent_at for payout in payouts] + [job.run_after for job in unresolved])
+        scan_until = oldest_sent.replace(tzinfo=datetime.timezone.utc).timestamp() - self.clock_skew
+
+        found: dict[int, WalletTransaction] = {}
+        # Ненайденной выплату можно считать, только если история просмотрена до scan_until
+        scan_complete = False
+        from_lt, from_hash = None, None
+        for _ in range(self.max_pages):
+            transactions = await self.fetch(self.page_size, from_lt, from_hash)
+            for tx in transactions:
+                for comment in tx.comments:
+                    match = PAYOUT_COMMENT_RE.search(comment)
+                    if match and (int(match.group(1)) in wanted or int(match.group(1)) in unresolved_jobs):
+                        found[int(match.group(1))] = tx
+            # Короткая страница — история кошелька закончилась
+            if len(found) == len(wanted) + len(unresolved_jobs) or len(transactions) < self.page_size:
+                scan_complete = True
+                break
+            last = transactions[-1]
+            if last.utime < scan_until or not last.prev_lt:
+                scan_complete = True
+                break
+            if last.prev_lt >= last.lt or last.prev_lt == from_lt:
+                # Провайдер вернул ту же или более новую страницу — дальше проход зациклился бы
+                logging.error(f"Transaction history does not go back past lt={last.lt} (prev_lt={last.prev_lt}), stopping scan")
+                break
+            from_lt, from_hash = last.prev_lt, last.prev_hash
+
+        confirmations = [
+            {
+                "id": payout_id,
+                "tx_hash": tx.hash,
+                "confirmed_at": datetime.datetime.fromtimestamp(tx.utime, datetime.timezone.utc).replace(tzinfo=None),
+            }
+            for payout_id, tx in found.items()
+        ]
+        missing_before = utc_now() - datetime.timedelta(seconds=self.missing_after)
+        async with self._session_maker() as session:
+            repo = Repository(session)
+            # Перевод с неизвестным исходом дошел — выплата считается выплаченной
+            landed = [job for job in unresolved if job.payout_id in found]
+            for job in landed:
+                await repo.confirm_payout_batch([job.payout_id], admin_tg_id=job.admin_tg_id)
+            await repo.finish_payout_jobs([job.id for job in landed], PayoutJobStatus.DONE)
+            await repo.record_payout_transactions(confirmations)
+            for payout_id, tx in found.items():
+                payout = wanted[payout_id] if payout_id in wanted else unresolved_jobs[payout_id].payout
+                await repo.enqueue_notification(
+                    payout.user.tg_id, texts['user_notifications']['payout_confirmed_user'].format(amount=payout.amount, tx_hash=tx.hash)
+                )
+            not_found = [payout_id for payout_id in wanted if payout_id not in found] if scan_complete else []
+            missing = await repo.flag_missing_payouts(not_found, sent_before=missing_before)
+            released = [
+                job.payout_id for job in unresolved
+                if scan_complete and job.payout_id not in found and (job.finished_at or job.run_after) < missing_before
+            ]
+            await repo.release_payouts(released)
+            await session.commit()
+
+        if found:
+            outbox_relay.wake()
+        if missing:
+            logging.error(f"Payouts not found on chain: {missing}")
+            text = texts['admin_panel']['payout_missing_admin'].format(ids=", ".join(f"#{payout_id}" for payout_id in missing))
+            for admin_id in config.admin_ids:
+                message_dispatcher.send_message(admin_id, text)
+        if released:
+            logging.warning(f"Payouts with unknown delivery not found on chain, returned to the queue: {released}")
+            text = texts['admin_panel']['payout_released_admin'].format(ids=", ".join(f"#{payout_id}" for payout_id in released))
+            for admin_id in config.admin_ids:
+                message_dispatcher.send_message(admin_id, text)
+        return list(found), missing
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                confirmed, missing = await self.poll_once()
+                if confirmed:
+                    logging.info(f"Confirmed payouts on chain: {confirmed}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Transaction tracker poll failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+# Создаем один экземпляр сервиса для всего приложения
+tx_tracker = TxTracker()
@@ -0,0 +1,150 @@
+# bot/services/update_queue.py
+
+import asyncio
+import collections
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+
+@dataclass
+class QueuedUpdate:
+    bot: Bot
+    update: dict[str, Any]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def update_chat_key(update: dict[str, Any]) -> int:
+    """
+    Ключ упорядочивания апдейта: id чата, а если чата нет — id пользователя.
+    Разбирается сырой JSON, чтобы не валидировать апдейт дважды.
+    """
+    for name, payload in update.items():
+        if name == "update_id" or not isinstance(payload, dict):
+            continue
+        for path in (("chat",), ("message", "chat"), ("from",), ("user",)):
+            node = payload
+            for part in path:
+                node = node.get(part) if isinstance(node, dict) else None
+            if isinstance(node, dict) and "id" in node:
+                return int(node["id"])
+    return update.get("update_id", 0)
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Вебхук с быстрым ответом: апдейт кладется в очередь, и Telegram сразу получает 200,
+    поэтому медленные хендлеры не вызывают таймаутов и повторных доставок.
+
+    Очередь разбита на шарды по чату, у каждого шарда один обработчик: апдейты одного
+    чата обрабатываются строго по порядку, разных чатов — параллельно (до workers штук).
+    Размер очереди ограничен: когда шард заполнен, отвечаем 503, и Telegram
+    повторит доставку позже — это и есть обратное давление.
+    Порядок гарантируется в пределах процесса; при нескольких воркерах
+    апдейты одного чата могут попасть в разные процессы.
+
+    Пока хендлер ждет, стоит весь его шард, поэтому хендлеры не спят:
+    отложенные правки и удаления сообщений отдаются message_dispatcher (delay=...).
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        workers: int = 32,
+        max_queue: int = 10_000,
+        drain_timeout: float = 20,
+        **kwargs: Any,
+    ):
+        super().__init__(dispatcher=dispatcher, bot=bot, **kwargs)
+        self.workers = workers
+        self.shard_size = max(1, max_queue // workers)
+        self.drain_timeout = drain_timeout
+
+        self._shards = [collections.deque() for _ in range(workers)]
+        self._wakeups = [asyncio.Event() for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight = 0
+        self._avg_wait = 0.0
+        self._counters = collections.Counter()
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        # Регистрируемся раньше setup_application: очередь дорабатывается до остановки сервисов бота
+        app.on_startup.append(self._start)
+        app.on_shutdown.append(self._drain)
+        super().register(app, path=path, **kwargs)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+
+        update = await request.json(loads=bot.session.json_loads)
+        index = update_chat_key(update) % self.workers
+        shard = self._shards[index]
+        if len(shard) >= self.shard_size:
+            self._counters["rejected"] += 1
+            logging.warning(f"Update queue shard {index} is full, asking Telegram to retry update {update.get('update_id')}")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        shard.append(QueuedUpdate(bot=bot, update=update))
+        self._counters["accepted"] += 1
+        self._wakeups[index].set()
+        return web.json_response({})
+
+    def queued(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def stats(self) -> dict[str, Any]:
+        """Глубина очереди и время ожидания — для метрик и мониторинга."""
+        now = time.monotonic()
+        return {
+            "queued": self.queued(),
+            "busiest_shard": max(len(shard) for shard in self._shards),
+            "oldest_wait_seconds": round(max((now - shard[0].enqueued_at for shard in self._shards if shard), default=0.0), 3),
+            "avg_wait_seconds": round(self._avg_wait, 3),
+            "in_flight": self._in_flight,
+            **{name: self._counters[name] for name in ("accepted", "rejected", "processed", "failed")},
+        }
+
+    async def _start(self, app: web.Application) -> None:
+        self._tasks = [asyncio.create_task(self._consume(index)) for index in range(self.workers)]
+
+    async def _drain(self, app: web.Application) -> None:
+        """Дает обработать уже принятые апдейты (не дольше drain_timeout) и останавливает обработчики."""
+        deadline = time.monotonic() + self.drain_timeout
+        while (self.queued() or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.queued():
+            logging.warning(f"Dropping {self.queued()} queued updates on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _consume(self, index: int) -> None:
+        shard, wakeup = self._shards[index], self._wakeups[index]
+        while True:
+            if not shard:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            item = shard.popleft()
+            wait = time.monotonic() - item.enqueued_at
+            # Скользящее среднее ожидания в очереди
+            self._avg_wait = self._avg_wait * 0.95 + wait * 0.05
+            self._in_flight += 1
+            try:
+                await self.dispatcher.feed_raw_update(item.bot, item.update, **self.data)
+                self._counters["processed"] += 1
+            except Exception as e:
+                self._counters["failed"] += 1
+                logging.error(f"Failed to process update {item.update.get('update_id')}: {e}", exc_info=True)
+            finally:
+                self._in_flight -= 1
@@ -0,0 +1,89 @@
+# bot/services/user_cache.py
+
+import dataclasses
+import json
+import logging
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from bot.config import config
+from bot.db.repository import Repository
+
+USER_CONTEXT_KEY = "user_ctx:{tg_id}"
+
+
+@dataclass(frozen=True)
+class UserContext:
+    """Поля пользователя, которые нужны хендлерам чаще всего."""
+    id: int
+    tg_id: int
+    username: str | None
+    wallet: str | None
+    balance: float
+    is_banned: bool
+    is_blocked: bool
+
+
+class UserCache:
+    """
+    Кэш контекста пользователя в Redis с коротким TTL.
+
+    Источник правды — таблица users. Запись в кэш делается при промахе,
+    а код, меняющий пользователя, после коммита вызывает invalidate(tg_id),
+    чтобы следующий апдейт перечитал строку. TTL ограничивает устаревание,
+    если инвалидация где-то не дошла (например, Redis был недоступен).
+
+    Кэш только для отображения и маршрутизации: операции с деньгами
+    (создание заявки на выплату) читают пользователя из БД под транзакцией.
+    """
+
+    def __init__(self, ttl: int = 60):
+        self.ttl = ttl
+        self.redis: Redis | None = None
+
+    def start(self, redis: Redis) -> None:
+        self.redis = redis
+
+    async def get(self, repo: Repository, tg_id: int) -> UserContext | None:
+        """Контекст из Redis, при промахе — из БД. Незарегистрированные пользователи не кэшируются."""
+        key = USER_CONTEXT_KEY.format(tg_id=tg_id)
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(key)
+                if cached is not None:
+                    return UserContext(**json.loads(cached))
+            except Exception as e:
+                logging.warning(f"User cache read failed for {tg_id}: {e}")
+
+        user = await repo.get_user_by_tg_id(tg_id)
+        if user is None:
+            return None
+        context = UserContext(
+            id=user.id,
+            tg_id=user.tg_id,
+            username=user.username,
+            wallet=user.wallet,
+            balance=user.balance,
+            is_banned=user.is_banned,
+            is_blocked=user.is_blocked,
+        )
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, json.dumps(dataclasses.asdict(context)), ex=self.ttl)
+            except Exception as e:
+                logging.warning(f"User cache write failed for {tg_id}: {e}")
+        return context
+
+    async def invalidate(self, *tg_ids: int) -> None:
+        """Вызывается ПОСЛЕ коммита: иначе параллельный апдейт может закэшировать старую строку."""
+        if self.redis is None or not tg_ids:
+            return
+        try:
+            await self.redis.delete(*(USER_CONTEXT_KEY.format(tg_id=tg_id) for tg_id in tg_ids))
+        except Exception as e:
+            logging.warning(f"User cache invalidation failed for {len(tg_ids)} users: {e}")
+
+
+# Создаем один экземпляр сервиса для всего приложения
+user_cache = UserCache(ttl=config.user_cache_ttl)
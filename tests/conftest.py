@@ -0,0 +1,38 @@
+# tests/conftest.py
+
+import os
+
+# bot.config читает настройки при импорте — задаем тестовые значения раньше, чем тесты импортируют bot
+for name, value in {
+    "BOT_TOKEN": "123456:test-token",
+    "WEBHOOK_SECRET": "test-secret",
+    "WEBHOOK_DOMAIN": "https://example.com",
+    "WEBHOOK_PATH": "/webhook",
+    "WEBAPP_PORT": "8080",
+    "WEBAPP_HOST": "127.0.0.1",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "ADMIN_IDS": "1",
+    "CHANNEL_ID": "@test",
+    "WALLET_MNEMONIC": " ".join(["word"] * 24),
+    "MIN_PAYOUT_AMOUNT": "1",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.db.models import Base
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    """Пустая БД на SQLite в памяти."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
@@ -0,0 +1,125 @@
+# tests/test_coingecko_service.py
+
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+from benchmarks.simulate_coingecko import StubCoinGecko
+from bot.services.coingecko_service import CoinGeckoService
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def stub():
+    # Свежий stub на каждый тест: счетчик запросов и поведение не переносятся
+    stub = StubCoinGecko()
+    await stub.server.start_server()
+    yield stub
+    await stub.server.close()
+
+
+async def test_ttl_cache(stub: StubCoinGecko):
+    service = CoinGeckoService(stub.base_url, ttl=60)
+    try:
+        rates = [await service.get_ton_to_usd_rate() for _ in range(5)]
+    finally:
+        await service.stop()
+    assert rates == [stub.price] * 5
+    assert stub.requests == 1
+
+
+async def test_single_flight(stub: StubCoinGecko):
+    stub.delay = 0.1
+    service = CoinGeckoService(stub.base_url, ttl=60)
+    try:
+        rates = await asyncio.gather(*(service.get_ton_to_usd_rate() for _ in range(50)))
+    finally:
+        await service.stop()
+    assert rates == [stub.price] * 50
+    assert stub.requests == 1
+
+
+async def test_cancelled_waiter(stub: StubCoinGecko):
+    """Отмена одного ожидающего не отменяет общий запрос для остальных."""
+    stub.delay = 0.1
+    service = CoinGeckoService(stub.base_url, ttl=60)
+    try:
+        cancelled = asyncio.create_task(service.get_ton_to_usd_rate())
+        waiter = asyncio.create_task(service.get_ton_to_usd_rate())
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        rate = await waiter
+    finally:
+        await service.stop()
+    assert rate == stub.price
+    assert stub.requests == 1
+
+
+async def test_stale_while_revalidate(stub: StubCoinGecko):
+    service = CoinGeckoService(stub.base_url, ttl=0.25, max_stale=10)
+    try:
+        first = await service.get_ton_to_usd_rate()
+        await asyncio.sleep(0.3)
+        stub.price, stub.delay = 3.0, 0.2
+
+        started = time.monotonic()
+        stale = await service.get_ton_to_usd_rate()
+        stale_latency = time.monotonic() - started
+
+        # Фоновое обновление закончилось ~0.2 с назад — курс снова свежий, запроса нет
+        await asyncio.sleep(0.3)
+        fresh = await service.get_ton_to_usd_rate()
+    finally:
+        await service.stop()
+    # Устаревший курс отдан сразу, не дожидаясь медленного API
+    assert first == 2.5
+    assert stale == 2.5
+    assert stale_latency < 0.1
+    assert fresh == 3.0
+    assert stub.requests == 2
+
+
+async def test_stale_on_failure(stub: StubCoinGecko):
+    """Пока кэш не старше max_stale, отказ API не виден; потом — 0.0."""
+    service = CoinGeckoService(stub.base_url, ttl=0.05, max_stale=0.3)
+    try:
+        await service.get_ton_to_usd_rate()
+        stub.failing = True
+        await asyncio.sleep(0.1)
+        stale = await service.get_ton_to_usd_rate()
+        await asyncio.sleep(0.3)
+        expired = await service.get_ton_to_usd_rate()
+    finally:
+        await service.stop()
+    assert stale == stub.price
+    assert expired == 0.0
+
+
+async def test_cold_failure(stub: StubCoinGecko):
+    stub.failing = True
+    service = CoinGeckoService(stub.base_url, ttl=60)
+    try:
+        rate = await service.get_ton_to_usd_rate()
+    finally:
+        await service.stop()
+    assert rate == 0.0
+    assert stub.requests == 1
+
+
+async def test_background_refresh(stub: StubCoinGecko):
+    """Фоновая задача держит курс свежим — вызов после start() не ходит в API."""
+    service = CoinGeckoService(stub.base_url, ttl=60, refresh_interval=0.05)
+    try:
+        await service.start()
+        await asyncio.sleep(0.25)
+        requests_before = stub.requests
+        rate = await service.get_ton_to_usd_rate()
+        requests_after = stub.requests
+    finally:
+        await service.stop()
+    assert rate == stub.price
+    assert requests_before >= 3
+    assert requests_after == requests_before
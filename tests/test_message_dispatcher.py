@@ -0,0 +1,53 @@
+# tests/test_message_dispatcher.py
+
+import asyncio
+import time
+
+import pytest
+
+from bot.services.message_dispatcher import MessageDispatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingBot:
+    """Вместо Bot: записывает вызовы и время, когда они пришли."""
+
+    def __init__(self):
+        self.calls: list[tuple[str, float]] = []
+
+    def __getattr__(self, method: str):
+        async def call(**kwargs) -> bool:
+            self.calls.append((method, time.monotonic()))
+            return True
+
+        return call
+
+
+async def test_delayed_operation_does_not_hold_the_queue():
+    bot = RecordingBot()
+    dispatcher = MessageDispatcher()
+    dispatcher.start(bot)
+    try:
+        started = time.monotonic()
+        deleted = dispatcher.delete_message(1, 10, delay=0.3)
+        sent = dispatcher.send_message(1, "after delete was scheduled")
+        await asyncio.wait_for(asyncio.gather(deleted, sent), timeout=2)
+    finally:
+        await dispatcher.stop()
+
+    assert [method for method, _ in bot.calls] == ["send_message", "delete_message"]
+    send_at, delete_at = (at - started for _, at in bot.calls)
+    assert send_at < 0.1
+    assert delete_at >= 0.3
+
+
+async def test_stop_delivers_pending_delayed_operations():
+    bot = RecordingBot()
+    dispatcher = MessageDispatcher()
+    dispatcher.start(bot)
+    edited = dispatcher.edit_message_text(1, 10, "restored prompt", delay=0.2)
+    await dispatcher.stop(drain_timeout=2)
+
+    assert edited.done() and edited.result() is True
+    assert [method for method, _ in bot.calls] == ["edit_message_text"]
@@ -0,0 +1,133 @@
+# tests/test_ton_service.py
+
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.simulate_ton_service import (
+    DROP,
+    FAIL_AFTER,
+    FAIL_BEFORE,
+    NANOTONS,
+    FakeChain,
+    FakeWallet,
+    TransferMessage,
+    make_service,
+    transfers,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_all_sent():
+    chain = FakeChain()
+    result = await make_service(chain).send_batch(transfers(10))
+    assert result.sent == list(range(1, 11))
+    assert not result.failed
+    assert not result.unknown
+    assert len(chain.accepted) == 3
+
+
+async def test_valid_until():
+    """Внешнее сообщение протухает через message_ttl, а не живет вечно."""
+    chain = FakeChain()
+    started = int(time.time())
+    await make_service(chain).send_batch(transfers(1))
+    assert len(chain.valid_until) == 1
+    assert started <= chain.valid_until[0] <= int(time.time()) + 1
+
+
+async def test_invalid_address():
+    chain = FakeChain()
+    batch = transfers(3)
+    batch[1].address = "not-an-address"
+    result = await make_service(chain).send_batch(batch)
+    assert result.sent == [1, 3]
+    assert result.failed == [2]
+
+
+async def test_insufficient_balance():
+    chain = FakeChain(balance=5 * NANOTONS)
+    result = await make_service(chain).send_batch(transfers(8))
+    # Первое сообщение (4 TON) проходит, на второе баланса уже нет
+    assert result.sent == [1, 2, 3, 4]
+    assert result.failed == [5, 6, 7, 8]
+    assert len(chain.accepted) == 1
+
+
+async def test_fail_before_send():
+    chain = FakeChain(outcomes=[FAIL_BEFORE])
+    result = await make_service(chain).send_batch(transfers(6))
+    assert result.failed == [1, 2, 3, 4]
+    assert result.sent == [5, 6]
+    assert chain.seqno == 1
+
+
+async def test_fail_after_send():
+    chain = FakeChain(outcomes=[FAIL_AFTER])
+    result = await make_service(chain).send_batch(transfers(6))
+    # Сеть приняла сообщение — повторять нельзя, выплаты отправлены
+    assert result.sent == [1, 2, 3, 4, 5, 6]
+    assert not result.failed
+    assert chain.seqno == 2
+
+
+async def test_never_accepted():
+    chain = FakeChain(outcomes=[DROP])
+    result = await make_service(chain).send_batch(transfers(4))
+    assert result.failed == [1, 2, 3, 4]
+    assert not result.sent
+
+
+async def test_state_unreadable(monkeypatch: pytest.MonkeyPatch):
+    chain = FakeChain(outcomes=[FAIL_BEFORE])
+    service = make_service(chain)
+    original = FakeWallet.send_external
+
+    async def fail_and_hide_state(wallet: FakeWallet, body: TransferMessage) -> None:
+        chain.seqno_unreadable = True
+        await original(wallet, body)
+
+    monkeypatch.setattr(FakeWallet, "send_external", fail_and_hide_state)
+    result = await service.send_batch(transfers(2))
+    assert result.unknown == [1, 2]
+    assert not result.sent
+    assert not result.failed
+
+
+async def test_wait_for_seqno():
+    chain = FakeChain()
+    service = make_service(chain)
+    wallet = await service._ensure_wallet()
+
+    async def accept_later() -> None:
+        await asyncio.sleep(0.05)
+        chain.seqno += 1
+
+    task = asyncio.create_task(accept_later())
+    advanced = await service._wait_for_seqno(wallet, 0)
+    await task
+    stuck = await service._wait_for_seqno(wallet, chain.seqno)
+    assert advanced
+    assert not stuck
+
+
+async def test_landed_after_failure():
+    chain = FakeChain(seqno=3)
+    service = make_service(chain)
+    await service._ensure_wallet()
+    landed = await service._landed_after_failure(2)
+    not_landed = await service._landed_after_failure(3)
+    chain.seqno_unreadable = True
+    unknown = await service._landed_after_failure(3)
+    assert landed is True
+    assert not_landed is False
+    assert unknown is None
+
+
+async def test_reconnect():
+    chain = FakeChain(failing_connects=2)
+    result = await make_service(chain).send_batch(transfers(2))
+    assert result.sent == [1, 2]
+    assert chain.connects == 3
@@ -0,0 +1,187 @@
+# tests/test_tx_tracker.py
+
+import argparse
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from benchmarks.simulate_tx_tracker import SimulatedChain, epoch, run
+from bot.db.models import Payout, PayoutJob, PayoutJobStatus, PayoutStatus, User
+from bot.db.repository import PAYOUT_QUEUED_BATCH, Repository, utc_now
+from bot.services.ton_service import WalletTransaction, payout_comment
+from bot.services.tx_tracker import TxTracker
+
+pytestmark = pytest.mark.asyncio
+
+
+async def add_payouts(session_maker, sent_ats: list[datetime.datetime]) -> list[int]:
+    async with session_maker() as session:
+        user = User(tg_id=1, username="test")
+        session.add(user)
+        await session.flush()
+        payouts = [
+            Payout(user_id=user.id, amount=1.0, wallet="UQtest", status=PayoutStatus.PAID, sent_at=sent_at)
+            for sent_at in sent_ats
+        ]
+        session.add_all(payouts)
+        await session.commit()
+        return [payout.id for payout in payouts]
+
+
+async def get_payouts(session_maker) -> dict[int, Payout]:
+    async with session_maker() as session:
+        return {payout.id: payout for payout in (await session.execute(select(Payout))).scalars()}
+
+
+def make_tracker(session_maker, fetch, **kwargs) -> TxTracker:
+    tracker = TxTracker(fetch=fetch, **{"page_size": 10, "missing_after": 900, **kwargs})
+    tracker.bind(session_maker)
+    return tracker
+
+
+async def test_simulation():
+    args = argparse.Namespace(payouts=200, lost=5, page_size=20, seed=3)
+    assert await run(args)
+
+
+async def test_confirms_payouts_and_flags_lost(session_maker):
+    now = utc_now()
+    old = now - datetime.timedelta(hours=1)
+    landed_id, lost_id = await add_payouts(session_maker, [now, old])
+    chain = SimulatedChain()
+    tx = chain.land([payout_comment(landed_id)], utime=epoch(now))
+    chain.relink()
+
+    confirmed, missing = await make_tracker(session_maker, chain.fetch).poll_once()
+
+    assert confirmed == [landed_id]
+    assert missing == [lost_id]
+    payouts = await get_payouts(session_maker)
+    assert payouts[landed_id].tx_hash == tx.hash
+    assert payouts[lost_id].tx_missing
+
+
+async def test_short_page_ends_scan(session_maker):
+    now = utc_now()
+    [lost_id] = await add_payouts(session_maker, [now - datetime.timedelta(hours=1)])
+    chain = SimulatedChain()
+    for _ in range(3):
+        chain.land(["top-up"], utime=epoch(now))
+    chain.relink()
+    # Цепочка не заканчивается prev_lt=0 — конец истории виден только по короткой странице
+    chain.transactions[-1].prev_lt = chain.transactions[-1].lt - 1
+
+    _, missing = await make_tracker(session_maker, chain.fetch, max_pages=5).poll_once()
+
+    assert missing == [lost_id]
+    assert chain.calls == 1
+
+
+async def test_truncated_scan_does_not_flag(session_maker):
+    now = utc_now()
+    [lost_id] = await add_payouts(session_maker, [now - datetime.timedelta(hours=1)])
+    chain = SimulatedChain()
+    for _ in range(30):
+        chain.land(["top-up"], utime=epoch(now))
+    chain.relink()
+
+    confirmed, missing = await make_tracker(session_maker, chain.fetch, max_pages=1).poll_once()
+
+    assert confirmed == [] and missing == []
+    assert not (await get_payouts(session_maker))[lost_id].tx_missing
+
+
+async def test_non_advancing_history_stops_scan(session_maker):
+    now = utc_now()
+    await add_payouts(session_maker, [now - datetime.timedelta(hours=1)])
+    calls = 0
+
+    async def fetch(limit: int, from_lt: int | None, from_hash: bytes | None) -> list[WalletTransaction]:
+        # Провайдер на любой from_lt отдает одну и ту же страницу
+        nonlocal calls
+        calls += 1
+        return [
+            WalletTransaction(lt=2000 - i, hash=f"{i:064x}", utime=epoch(now), comments=["top-up"], prev_lt=1990, prev_hash=b"")
+            for i in range(limit)
+        ]
+
+    confirmed, missing = await make_tracker(session_maker, fetch, max_pages=20).poll_once()
+
+    assert confirmed == [] and missing == []
+    assert calls == 2
+
+
+async def add_unresolved_payout(session_maker, started: datetime.datetime, finished: datetime.datetime) -> int:
+    """Выплата, отправка которой закончилась неизвестным исходом: задание FAILED, пачка не снята."""
+    async with session_maker() as session:
+        user = User(tg_id=2, username="unresolved", balance=0.0)
+        session.add(user)
+        await session.flush()
+        payout = Payout(user_id=user.id, amount=1.0, wallet="UQtest", batch_id="a" * 32)
+        session.add(payout)
+        await session.flush()
+        session.add(PayoutJob(
+            payout_id=payout.id, admin_tg_id=1, chat_id=1, message_id=1, status=PayoutJobStatus.FAILED,
+            attempts=1, run_after=started, last_error="delivery unknown", finished_at=finished,
+        ))
+        await session.commit()
+        return payout.id
+
+
+async def test_unresolved_payout_found_on_chain(session_maker):
+    now = utc_now()
+    payout_id = await add_unresolved_payout(session_maker, started=now - datetime.timedelta(minutes=2), finished=now)
+    chain = SimulatedChain()
+    tx = chain.land([payout_comment(payout_id)], utime=epoch(now - datetime.timedelta(minutes=1)))
+    chain.relink()
+
+    confirmed, _ = await make_tracker(session_maker, chain.fetch).poll_once()
+
+    assert confirmed == [payout_id]
+    payout = (await get_payouts(session_maker))[payout_id]
+    assert payout.status == PayoutStatus.PAID
+    assert payout.tx_hash == tx.hash
+    async with session_maker() as session:
+        job = (await session.execute(select(PayoutJob))).scalar_one()
+    assert job.status == PayoutJobStatus.DONE
+
+
+async def test_unresolved_payout_released_after_missing_after(session_maker):
+    now = utc_now()
+    payout_id = await add_unresolved_payout(
+        session_maker, started=now - datetime.timedelta(hours=1), finished=now - datetime.timedelta(minutes=50),
+    )
+    chain = SimulatedChain()
+    chain.land(["top-up"], utime=epoch(now))
+    chain.relink()
+
+    confirmed, missing = await make_tracker(session_maker, chain.fetch).poll_once()
+
+    assert confirmed == [] and missing == []
+    # Снятую с пачки выплату можно отменить...
+    async with session_maker() as session:
+        cancelled = await Repository(session).cancel_payout(payout_id, admin_tg_id=1)
+        assert cancelled.status == PayoutStatus.CANCELLED
+        await session.rollback()
+    # ...или снова поставить в очередь: проваленное задание запускается заново
+    async with session_maker() as session:
+        repo = Repository(session)
+        payouts = await repo.claim_pending_payouts(PAYOUT_QUEUED_BATCH, 10)
+        await repo.enqueue_payout_jobs(payouts, admin_tg_id=1, chat_id=1, message_id=2)
+        await session.commit()
+        [job] = await repo.claim_payout_jobs(10)
+    assert [payout.id for payout in payouts] == [payout_id]
+    assert job.payout_id == payout_id and job.attempts == 1 and job.message_id == 2
+
+
+async def test_recent_unresolved_payout_stays_locked(session_maker):
+    now = utc_now()
+    payout_id = await add_unresolved_payout(session_maker, started=now - datetime.timedelta(minutes=2), finished=now)
+    chain = SimulatedChain()
+    chain.land(["top-up"], utime=epoch(now))
+    chain.relink()
+
+    await make_tracker(session_maker, chain.fetch).poll_once()
+
+    assert (await get_payouts(session_maker))[payout_id].batch_id is not None